@@ -9,6 +9,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = "your-secret-key"  # Change this in production!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
+STREAM_TOKEN_EXPIRE_SECONDS = 60
+STREAM_SCOPE = "stream"
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -26,6 +28,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_stream_token(user_id: int) -> str:
+    # EventSource can only authenticate through the URL, which ends up in access
+    # logs; this token opens a notification stream and nothing else, for a minute
+    return create_access_token({"user_id": user_id, "scope": STREAM_SCOPE},
+                               timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS))
+
 def decode_access_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -0,0 +1,362 @@
+"""Content-addressed store for uploaded files.
+
+Each distinct file is kept once, under the SHA-256 of its content, at
+blobs/ab/cd/<sha256> in the storage backend (UPLOAD_DIR or a bucket, see
+`storage`): two levels of hash prefix keep every directory to a few
+thousand entries however many files there are.
+Documents, assignments and submissions that upload the same bytes point at
+the same `blobs` row and file. crud counts the references in
+`blobs.ref_count` in the same transaction as each insert or delete. Files
+are only ever removed once a transaction has ended: the blob of a last
+reference is collected after the delete commits, and a file placed by a
+transaction that rolls back is collected unless a committed row uses it.
+`stats` reports how much space that saves; `check` compares ref_count with
+the rows that actually point at each blob; `gc` collects any unreferenced
+blob a crashed worker left behind.
+
+`migrate` brings older local files into this layout: blobs stored flat in
+uploads/blobs/ before sharding, and files uploaded before the blob store
+(uploads/<name>, uploads/assignments/<name>, uploads/submissions/<name>),
+which are hashed and adopted as blobs. It works in batches, rewriting
+file_path as it goes. Each file is hard-linked into place before the rows
+move to it and the old name is removed only after they have, so downloads
+keep working while it runs. An interrupted run can simply be started again.
+
+Usage (from backend/):
+    python -m app.blobs stats                      # dedup ratio and bytes saved
+    python -m app.blobs check                      # exit status 1 on drift
+    python -m app.blobs check --fix                # reset drifted counts
+    python -m app.blobs gc                         # remove blobs nothing references
+    python -m app.blobs migrate [--batch-size 500] # move files into the sharded layout
+    python -m app.blobs migrate --dry-run          # count what would move
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, event, func, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import files, models, storage
+
+blobs = models.Blob.__table__
+REFERENCING_TABLES = [models.Document.__table__, models.Assignment.__table__, models.Submission.__table__]
+LAYOUT_BATCH_SIZE = int(os.getenv("BLOB_MIGRATION_BATCH_SIZE", "500"))
+
+logger = logging.getLogger(__name__)
+
+def blob_dir() -> Path:
+    return files.UPLOAD_DIR / "blobs"
+
+def blob_key(sha256: str) -> str:
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+def blob_path(sha256: str) -> Path:
+    """Where the blob lives with local storage"""
+    return files.UPLOAD_DIR / blob_key(sha256)
+
+def _flat_path(sha256: str) -> Path:
+    # Where blobs were stored before sharding, until `migrate` moves them
+    return blob_dir() / sha256
+
+async def upload(staged: files.StoredUpload):
+    """Send a staged upload to the storage backend, off the event loop and before any transaction"""
+    await run_in_threadpool(storage.backend.upload, staged, blob_key(staged.sha256))
+
+_PLACED_KEY = "placed_blobs"
+_RELEASED_KEY = "released_blobs"
+
+def place(db: Session, staged: files.StoredUpload) -> str:
+    """Make sure the blob holds the staged upload; returns the file_path to record.
+    The blob is collected again if `db` rolls back and nothing else uses it."""
+    db.info.setdefault(_PLACED_KEY, {})[staged.sha256] = staged
+    return storage.backend.place(staged, blob_key(staged.sha256))
+
+def release(db: Session, sha256: str):
+    """Collect the blob once `db` commits; its last reference has just been dropped"""
+    db.info.setdefault(_RELEASED_KEY, set()).add(sha256)
+
+def _remove_local(sha256: str):
+    # Includes copies from before sharding or from before a switch of backend
+    storage.LOCAL.delete(blob_key(sha256))
+    _flat_path(sha256).unlink(missing_ok=True)
+
+def collect(engine: Engine, sha256: str) -> bool:
+    """Remove a blob, its row and its file, unless something references it; True if it went"""
+    with engine.begin() as conn:
+        released = conn.execute(delete(blobs).where(blobs.c.sha256 == sha256, blobs.c.ref_count <= 0)).rowcount
+        if not released and conn.execute(select(blobs.c.sha256).where(blobs.c.sha256 == sha256)).first():
+            return False
+        # Removed while the transaction holds the row, so an upload of the same
+        # content waits for it and then finds the file gone and puts it back
+        _remove_local(sha256)
+    if storage.backend is not storage.LOCAL:
+        storage.backend.delete(blob_key(sha256))
+    return True
+
+def _collect_all(session: Session, shas):
+    for sha256 in shas:
+        try:
+            collect(session.get_bind(), sha256)
+        except Exception:
+            # The data is committed either way; `gc` finds what was left behind
+            logger.exception("Failed to collect blob %s", sha256)
+
+def _confirm_all(placed):
+    for sha256, staged in placed.items():
+        try:
+            storage.backend.confirm(staged, blob_key(sha256))
+        except Exception:
+            logger.exception("Failed to confirm blob %s", sha256)
+
+@event.listens_for(Session, "after_commit")
+def _collect_released(session: Session):
+    _confirm_all(session.info.pop(_PLACED_KEY, {}))
+    _collect_all(session, session.info.pop(_RELEASED_KEY, ()))
+
+@event.listens_for(Session, "after_rollback")
+def _collect_placed(session: Session):
+    session.info.pop(_RELEASED_KEY, None)
+    _collect_all(session, session.info.pop(_PLACED_KEY, ()))
+
+def collect_garbage(engine: Engine) -> int:
+    """Collect every blob left with no references, e.g. by a worker that died after a commit"""
+    with engine.connect() as conn:
+        shas = conn.execute(select(blobs.c.sha256).where(blobs.c.ref_count <= 0)).scalars().all()
+    return sum(collect(engine, sha256) for sha256 in shas)
+
+@dataclass
+class BlobStats:
+    blobs: int
+    references: int
+    stored_bytes: int
+    # What the same uploads would take if every reference had its own copy
+    logical_bytes: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.logical_bytes - self.stored_bytes
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.logical_bytes / self.stored_bytes if self.stored_bytes else 1.0
+
+def blob_stats(engine: Engine) -> BlobStats:
+    with engine.connect() as conn:
+        row = conn.execute(select(
+            func.count(),
+            func.coalesce(func.sum(blobs.c.ref_count), 0),
+            func.coalesce(func.sum(blobs.c.size), 0),
+            func.coalesce(func.sum(blobs.c.size * blobs.c.ref_count), 0),
+        ).where(blobs.c.ref_count > 0)).one()
+    return BlobStats(*row)
+
+@dataclass
+class RefCountDrift:
+    sha256: str
+    stored: int
+    actual: int
+
+def _actual_references():
+    references = union_all(*(select(table.c.blob_sha256.label("sha256")).where(table.c.blob_sha256.isnot(None))
+                             for table in REFERENCING_TABLES)).subquery()
+    return select(references.c.sha256, func.count().label("actual")).group_by(references.c.sha256).subquery()
+
+def check_ref_counts(engine: Engine) -> List[RefCountDrift]:
+    """Blobs whose ref_count differs from the number of rows pointing at them"""
+    actual = _actual_references()
+    counted = func.coalesce(actual.c.actual, 0)
+    query = (select(blobs.c.sha256, blobs.c.ref_count, counted)
+             .select_from(blobs.outerjoin(actual, actual.c.sha256 == blobs.c.sha256))
+             .where(blobs.c.ref_count != counted)
+             .order_by(blobs.c.sha256))
+    with engine.connect() as conn:
+        return [RefCountDrift(*row) for row in conn.execute(query)]
+
+def fix_ref_counts(engine: Engine, drift: List[RefCountDrift]):
+    with engine.begin() as conn:
+        for d in drift:
+            conn.execute(update(blobs).where(blobs.c.sha256 == d.sha256).values(ref_count=d.actual))
+
+@dataclass
+class LayoutReport:
+    blobs_moved: int = 0
+    files_adopted: int = 0
+    rows_rewritten: int = 0
+    batches: int = 0
+    missing: List[str] = field(default_factory=list)
+
+def _link(source: Path, target: Path):
+    """Give `source`'s file the name `target` as well; a copy where a hard link is not possible"""
+    if target.exists():
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        partial = target.with_name(target.name + ".part")
+        shutil.copyfile(source, partial)
+        os.replace(partial, target)
+
+def _hash_file(path: Path) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(files.UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def _unlink_unreferenced(engine: Engine, paths: List[Path]):
+    # Two legacy rows may share a name; keep the file until neither uses it
+    with engine.connect() as conn:
+        for path in paths:
+            if not any(conn.execute(select(1).where(table.c.file_path == str(path)).limit(1)).first()
+                       for table in REFERENCING_TABLES):
+                path.unlink(missing_ok=True)
+
+def _reshard_blobs(engine: Engine, report: LayoutReport, batch_size: int):
+    after = ""
+    while True:
+        with engine.begin() as conn:
+            shas = conn.execute(select(blobs.c.sha256).where(blobs.c.sha256 > after)
+                                .order_by(blobs.c.sha256).limit(batch_size)).scalars().all()
+            if not shas:
+                return
+            moved = []
+            for sha256 in shas:
+                target, flat = blob_path(sha256), _flat_path(sha256)
+                if flat.exists():
+                    _link(flat, target)
+                    moved.append(flat)
+                for table in REFERENCING_TABLES:
+                    report.rows_rewritten += conn.execute(
+                        update(table).where(table.c.blob_sha256 == sha256, table.c.file_path != str(target))
+                        .values(file_path=str(target))).rowcount
+        # Old names go only once the rows pointing away from them are committed
+        for flat in moved:
+            flat.unlink(missing_ok=True)
+        report.blobs_moved += len(moved)
+        report.batches += 1
+        after = shas[-1]
+
+def _reference(conn: Connection, sha256: str, size: int):
+    dialect = conn.dialect.name
+    upsert = (postgresql_insert if dialect == "postgresql" else sqlite_insert)(blobs).values(
+        sha256=sha256, size=size, ref_count=1)
+    conn.execute(upsert.on_conflict_do_update(index_elements=["sha256"],
+                                              set_={"ref_count": blobs.c.ref_count + 1}))
+
+def _adopt_legacy_files(engine: Engine, report: LayoutReport, batch_size: int):
+    for table in REFERENCING_TABLES:
+        after_id = 0
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(select(table.c.id, table.c.file_path)
+                                    .where(table.c.blob_sha256.is_(None), table.c.id > after_id)
+                                    .order_by(table.c.id).limit(batch_size)).all()
+            if not rows:
+                break
+            # Hash and link before opening the write transaction, so it is held only for the updates
+            found = []
+            for row_id, file_path in rows:
+                source = Path(file_path)
+                if not source.is_file():
+                    report.missing.append(f"{table.name} {row_id}: {file_path}")
+                    continue
+                sha256, size = _hash_file(source)
+                _link(source, blob_path(sha256))
+                found.append((row_id, source, sha256, size))
+            adopted = []
+            with engine.begin() as conn:
+                for row_id, source, sha256, size in found:
+                    # Guarded on the null reference so a row adopted or deleted meanwhile is left alone
+                    claimed = conn.execute(
+                        update(table).where(table.c.id == row_id, table.c.blob_sha256.is_(None))
+                        .values(blob_sha256=sha256, file_path=str(blob_path(sha256)), file_size=size)).rowcount
+                    if claimed:
+                        _reference(conn, sha256, size)
+                        adopted.append(source)
+            _unlink_unreferenced(engine, adopted)
+            report.files_adopted += len(adopted)
+            report.rows_rewritten += len(adopted)
+            report.batches += 1
+            after_id = rows[-1][0]
+
+def migrate_layout(engine: Engine, batch_size: int = LAYOUT_BATCH_SIZE) -> LayoutReport:
+    """Move every stored file into the sharded blob layout and point its rows at it"""
+    report = LayoutReport()
+    _reshard_blobs(engine, report, batch_size)
+    _adopt_legacy_files(engine, report, batch_size)
+    return report
+
+def count_unmigrated(engine: Engine) -> Tuple[int, int]:
+    """Blobs still stored flat, and rows whose file predates the blob store"""
+    with engine.connect() as conn:
+        shas = conn.execute(select(blobs.c.sha256)).scalars()
+        flat = sum(1 for sha256 in shas if _flat_path(sha256).exists())
+        legacy = sum(conn.execute(select(func.count()).select_from(table)
+                                  .where(table.c.blob_sha256.is_(None))).scalar()
+                     for table in REFERENCING_TABLES)
+    return flat, legacy
+
+def main(argv=None):
+    from .database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.blobs", description="Report on the upload blob store")
+    parser.add_argument("command", choices=["stats", "check", "gc", "migrate"])
+    parser.add_argument("--fix", action="store_true", help="with check: reset drifted reference counts")
+    parser.add_argument("--batch-size", type=int, default=LAYOUT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="with migrate: only count what would move")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    models.Base.metadata.create_all(bind=engine)
+    if args.command == "stats":
+        stats = blob_stats(engine)
+        print(f"{stats.references} reference(s) to {stats.blobs} blob(s)")
+        print(f"stored {stats.stored_bytes} bytes for {stats.logical_bytes} uploaded")
+        print(f"dedup ratio {stats.dedup_ratio:.2f}, {stats.bytes_saved} bytes saved")
+        return 0
+
+    if args.command == "gc":
+        print(f"Removed {collect_garbage(engine)} unreferenced blob(s)")
+        return 0
+
+    if args.command == "migrate":
+        if args.dry_run:
+            flat, legacy = count_unmigrated(engine)
+            print(f"{flat} blob(s) to move into the sharded layout, {legacy} older upload(s) to adopt")
+            return 0
+        report = migrate_layout(engine, batch_size=args.batch_size)
+        print(f"Moved {report.blobs_moved} blob(s) and adopted {report.files_adopted} older upload(s); "
+              f"rewrote file_path on {report.rows_rewritten} row(s) in {report.batches} batch(es)")
+        for missing in report.missing:
+            print(f"missing file, left as is: {missing}")
+        return 1 if report.missing else 0
+
+    drift = check_ref_counts(engine)
+    for d in drift:
+        print(f"blob {d.sha256}: ref_count stored={d.stored} actual={d.actual}")
+    if not drift:
+        print("blob reference counts match the referencing rows")
+        return 0
+    if not args.fix:
+        print(f"{len(drift)} drifted blob(s); run with --fix to reset them")
+        return 1
+    fix_ref_counts(engine, drift)
+    print(f"Reset ref_count for {len(drift)} blob(s); run gc to remove any left unreferenced")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,12 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
+from sqlalchemy import func, insert, select, update, and_, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from . import blobs, models, schemas, pagination, realtime
+from .pagination import ListSpec
 from .auth import get_password_hash
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
+from datetime import date, datetime, timedelta, timezone
 
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.email == email).first()
@@ -19,6 +24,7 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
         manager_id=user.manager_id
     )
     db.add(db_user)
+    _bump_team_stats(db, user.manager_id, team_size=1)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -33,15 +39,131 @@ def create_feedback(db: Session, feedback: schemas.FeedbackCreate, manager_id: i
         is_anonymous=feedback.is_anonymous
     )
     db.add(db_feedback)
+    db.flush()
+    db.refresh(db_feedback)  # created_at comes from the database
+    _bump_sentiment_rollup(db, manager_id, db_feedback.created_at, db_feedback.sentiment, 1)
+    _bump_team_stats(db, manager_id, **{_sentiment_column(db_feedback.sentiment): 1, "unacknowledged_feedback": 1})
     db.commit()
     db.refresh(db_feedback)
     return db_feedback
 
-def get_feedback_for_employee(db: Session, employee_id: int) -> List[models.Feedback]:
-    return db.query(models.Feedback).filter(models.Feedback.employee_id == employee_id).all()
-
-def get_feedback_for_manager(db: Session, manager_id: int) -> List[models.Feedback]:
-    return db.query(models.Feedback).filter(models.Feedback.manager_id == manager_id).all()
+FEEDBACK_LIST = ListSpec(
+    id=models.Feedback.id, time=models.Feedback.created_at, default_sort="-created_at",
+    sorts={"created_at": models.Feedback.created_at},
+    filters={"sentiment": models.Feedback.sentiment, "acknowledged": models.Feedback.acknowledged,
+             "employee_id": models.Feedback.employee_id},
+)
+
+def get_feedback_for_employee(db: Session, employee_id: int,
+                              page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    query = db.query(models.Feedback).filter(models.Feedback.employee_id == employee_id)
+    return pagination.paginate(query, page, FEEDBACK_LIST)
+
+def get_feedback_timeline(db: Session, employee_id: int, limit: Optional[int] = None,
+                          before: Optional[Tuple[datetime, int]] = None, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, summary: bool = False) -> list:
+    """Feedback received by an employee, newest first, optionally within [start, end).
+    `before` is the (created_at, id) of the last row already seen. With `summary`
+    only id, sentiment, created_at and acknowledged are selected, as rows."""
+    if summary:
+        query = db.query(models.Feedback.id, models.Feedback.sentiment,
+                         models.Feedback.created_at, models.Feedback.acknowledged)
+    else:
+        query = db.query(models.Feedback)
+    query = query.filter(models.Feedback.employee_id == employee_id)
+    if start is not None:
+        query = query.filter(models.Feedback.created_at >= start)
+    if end is not None:
+        query = query.filter(models.Feedback.created_at < end)
+    if before is not None:
+        created_at, feedback_id = before
+        query = query.filter(or_(
+            models.Feedback.created_at < created_at,
+            and_(models.Feedback.created_at == created_at, models.Feedback.id < feedback_id)
+        ))
+    query = query.order_by(models.Feedback.created_at.desc(), models.Feedback.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_feedback_for_manager(db: Session, manager_id: int,
+                             page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    query = db.query(models.Feedback).filter(models.Feedback.manager_id == manager_id)
+    return pagination.paginate(query, page, FEEDBACK_LIST)
+
+def get_team_size(db: Session, manager_id: int) -> int:
+    return db.query(func.count(models.User.id)).filter(models.User.manager_id == manager_id).scalar()
+
+def get_feedback_sentiment_counts(db: Session, manager_id: int, start: Optional[datetime] = None,
+                                  end: Optional[datetime] = None) -> Dict[str, int]:
+    """Feedback written by a manager per sentiment, optionally within [start, end),
+    counted in the database; every sentiment is present, zero if unused"""
+    query = db.query(models.Feedback.sentiment, func.count(models.Feedback.id)).filter(
+        models.Feedback.manager_id == manager_id
+    )
+    if start is not None:
+        query = query.filter(models.Feedback.created_at >= start)
+    if end is not None:
+        query = query.filter(models.Feedback.created_at < end)
+    counts = {s.value: 0 for s in models.SentimentEnum}
+    for sentiment, count in query.group_by(models.Feedback.sentiment):
+        counts[sentiment.value] = count
+    return counts
+
+def _utc_day(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+def _increment(db: Session, model, keys: dict, deltas: dict):
+    """Add `deltas` to the counter row of `model` identified by `keys`, creating
+    it if needed, with one upsert in the caller's transaction"""
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    dialect = db.get_bind().dialect.name
+    upsert = (postgresql_insert if dialect == "postgresql" else sqlite_insert)(model).values(**keys, **deltas)
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: getattr(model, column) + upsert.excluded[column] for column in deltas},
+    ))
+
+def _bump_sentiment_rollup(db: Session, manager_id: int, created_at: datetime,
+                           sentiment: models.SentimentEnum, delta: int):
+    """Add `delta` to the manager's rollup row for that day and sentiment"""
+    _increment(db, models.FeedbackSentimentDaily,
+               {"manager_id": manager_id, "day": _utc_day(created_at), "sentiment": sentiment},
+               {"feedback_count": delta})
+
+def _bump_team_stats(db: Session, manager_id: Optional[int], **deltas):
+    if manager_id is not None:
+        _increment(db, models.TeamStats, {"manager_id": manager_id}, deltas)
+
+def _sentiment_column(sentiment) -> str:
+    return f"feedback_{models.SentimentEnum(sentiment).value}"
+
+def get_team_stats(db: Session, manager_id: int) -> dict:
+    """The manager's dashboard counters from the team_stats projection"""
+    stats = db.query(models.TeamStats).filter(models.TeamStats.manager_id == manager_id).first()
+    values = {column.name: getattr(stats, column.name) if stats else 0
+              for column in models.TeamStats.__table__.columns if column.name != "manager_id"}
+    # Every team member owes one submission per active assignment
+    expected = values["active_assignments"] * values["team_size"]
+    values["pending_submissions"] = max(expected - values["active_assignment_submissions"], 0)
+    return values
+
+def get_sentiment_rollup(db: Session, manager_id: int, start: Optional[date] = None,
+                         end: Optional[date] = None) -> List[models.FeedbackSentimentDaily]:
+    """Daily sentiment counts for a manager in [start, end), oldest first"""
+    query = db.query(models.FeedbackSentimentDaily).filter(
+        models.FeedbackSentimentDaily.manager_id == manager_id,
+        models.FeedbackSentimentDaily.feedback_count > 0
+    )
+    if start is not None:
+        query = query.filter(models.FeedbackSentimentDaily.day >= start)
+    if end is not None:
+        query = query.filter(models.FeedbackSentimentDaily.day < end)
+    return query.order_by(models.FeedbackSentimentDaily.day).all()
 
 def get_feedback_by_id(db: Session, feedback_id: int) -> Optional[models.Feedback]:
     return db.query(models.Feedback).filter(models.Feedback.id == feedback_id).first()
@@ -58,8 +180,14 @@ def update_feedback(db: Session, feedback: models.Feedback, updates: schemas.Fee
         feedback.strengths = update_data["strengths"]
     if "areas_to_improve" in update_data:
         feedback.areas_to_improve = update_data["areas_to_improve"]
-    if "sentiment" in update_data:
-        feedback.sentiment = update_data["sentiment"]
+    was_acknowledged = bool(feedback.acknowledged)
+    if "sentiment" in update_data and models.SentimentEnum(update_data["sentiment"]) != feedback.sentiment:
+        new_sentiment = models.SentimentEnum(update_data["sentiment"])
+        _bump_sentiment_rollup(db, feedback.manager_id, feedback.created_at, feedback.sentiment, -1)
+        _bump_sentiment_rollup(db, feedback.manager_id, feedback.created_at, new_sentiment, 1)
+        _bump_team_stats(db, feedback.manager_id, **{_sentiment_column(feedback.sentiment): -1,
+                                                     _sentiment_column(new_sentiment): 1})
+        feedback.sentiment = new_sentiment
     
     # Handle the acknowledgment status
     if is_content_update:
@@ -68,33 +196,165 @@ def update_feedback(db: Session, feedback: models.Feedback, updates: schemas.Fee
     elif "acknowledged" in update_data:
         # This case handles the acknowledgment from the employee
         feedback.acknowledged = update_data["acknowledged"]
+    if bool(feedback.acknowledged) != was_acknowledged:
+        _bump_team_stats(db, feedback.manager_id, unacknowledged_feedback=1 if was_acknowledged else -1)
 
     db.commit()
     db.refresh(feedback)
     return feedback
 
+def _adjust_unread_counts(db: Session, user_ids: List[int], delta: int):
+    db.execute(
+        update(models.User)
+        .where(models.User.id.in_(user_ids))
+        .values(unread_notification_count=models.User.unread_notification_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
 def create_notification(db: Session, user_id: int, message: str) -> models.Notification:
     db_notification = models.Notification(user_id=user_id, message=message)
     db.add(db_notification)
-    db.commit()
+    _adjust_unread_counts(db, [user_id], 1)
+    db.flush()
     db.refresh(db_notification)
+    realtime.publish_after_commit(db, [realtime.notification_event(
+        db_notification.id, user_id, message, db_notification.created_at)])
+    db.commit()
     return db_notification
 
-def get_notifications_for_user(db: Session, user_id: int) -> List[models.Notification]:
-    return db.query(models.Notification).filter(models.Notification.user_id == user_id).order_by(models.Notification.created_at.desc()).all()
+def create_notifications(db: Session, user_ids: List[int], message: str, commit: bool = True,
+                         digest_key: Optional[str] = None, digest_message: Optional[str] = None,
+                         digest_window: Optional[timedelta] = None) -> int:
+    """Fan out one notification to many users with a single INSERT.
+
+    With a `digest_key`, a recipient who still has an unread notification with
+    that key from within `digest_window` gets that notification updated to count
+    this event too, worded with `digest_message` (formatted with `count`) and
+    moved to the top; it keeps its id."""
+    recipients = list(dict.fromkeys(user_ids))
+    if not recipients:
+        if commit:
+            db.commit()
+        return 0
+
+    open_digests = {}
+    if digest_key is not None and digest_window is not None:
+        since = datetime.now(timezone.utc) - digest_window
+        open_digests = {n.user_id: n for n in get_open_digests(db, digest_key, recipients, since)}
+
+    returning = (models.Notification.id, models.Notification.user_id, models.Notification.message,
+                 models.Notification.event_count, models.Notification.created_at)
+    # An open digest is updated in place so its id stays valid for clients holding it.
+    # One UPDATE per distinct previous count (usually one); the row must still be
+    # unread and at that count, so a concurrent read or a racing digest makes the
+    # recipient fall through to a fresh notification instead of skewing the counters.
+    updated = []
+    by_count: Dict[int, List[int]] = {}
+    for notification in open_digests.values():
+        by_count.setdefault(notification.event_count, []).append(notification.id)
+    for previous_count, notification_ids in by_count.items():
+        count = previous_count + 1
+        updated += db.execute(
+            update(models.Notification)
+            .where(models.Notification.id.in_(notification_ids),
+                   models.Notification.is_read == False,
+                   models.Notification.event_count == previous_count)
+            .values(message=digest_message.format(count=count) if digest_message else message,
+                    event_count=count, created_at=func.now())
+            .returning(*returning)
+            .execution_options(synchronize_session=False)
+        ).all()
+    digested = {row.user_id for row in updated}
+
+    rows = [{"user_id": user_id, "message": message, "digest_key": digest_key, "event_count": 1}
+            for user_id in recipients if user_id not in digested]
+    created = db.execute(insert(models.Notification).returning(*returning), rows).all() if rows else []
+    if rows:
+        _adjust_unread_counts(db, [row["user_id"] for row in rows], 1)
+    # Pushed to live subscribers only once the transaction commits; an updated
+    # digest keeps its id and names it in `replaces`
+    realtime.publish_after_commit(db, [
+        realtime.notification_event(row.id, row.user_id, row.message, row.created_at,
+                                    event_count=row.event_count, replaces=row.id if row.user_id in digested else None)
+        for row in list(updated) + list(created)
+    ])
+    if commit:
+        db.commit()
+    return len(recipients)
+
+def get_open_digests(db: Session, digest_key: str, user_ids: List[int], since: datetime) -> List[models.Notification]:
+    """Unread notifications with `digest_key` created after `since`, for the given users"""
+    return db.query(models.Notification).filter(
+        models.Notification.digest_key == digest_key,
+        models.Notification.user_id.in_(user_ids),
+        models.Notification.is_read == False,
+        models.Notification.created_at >= since
+    ).all()
+
+def get_notifications_for_user(db: Session, user_id: int, limit: Optional[int] = None,
+                               before: Optional[Tuple[datetime, int]] = None,
+                               unread_only: bool = False) -> List[models.Notification]:
+    """Newest first. `before` is the (created_at, id) of the last row already seen."""
+    query = db.query(models.Notification).filter(models.Notification.user_id == user_id)
+    if unread_only:
+        query = query.filter(models.Notification.is_read == False)
+    if before is not None:
+        created_at, notification_id = before
+        query = query.filter(or_(
+            models.Notification.created_at < created_at,
+            and_(models.Notification.created_at == created_at, models.Notification.id < notification_id)
+        ))
+    query = query.order_by(models.Notification.created_at.desc(), models.Notification.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_notifications_since(db: Session, user_id: int, after_id: int, limit: int = 100) -> List[models.Notification]:
+    """Oldest first; used to replay what a stream client missed after `after_id`"""
+    return db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.id > after_id
+    ).order_by(models.Notification.id.asc()).limit(limit).all()
 
 def mark_notification_as_read(db: Session, notification_id: int, user_id: int) -> Optional[models.Notification]:
-    db_notification = db.query(models.Notification).filter(
+    # Conditional UPDATE so concurrent requests cannot decrement the counter twice
+    marked = db.query(models.Notification).filter(
         models.Notification.id == notification_id,
-        models.Notification.user_id == user_id
-    ).first()
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == False
+    ).update({"is_read": True}, synchronize_session=False)
     
-    if db_notification:
-        db_notification.is_read = True
+    if marked:
+        _adjust_unread_counts(db, [user_id], -1)
         db.commit()
-        db.refresh(db_notification)
     
-    return db_notification
+    return db.query(models.Notification).filter(
+        models.Notification.id == notification_id,
+        models.Notification.user_id == user_id
+    ).first()
+
+def mark_notifications_as_read(db: Session, user_id: int, notification_ids: Optional[List[int]] = None,
+                               up_to: Optional[Tuple[datetime, int]] = None) -> int:
+    """Mark a user's unread notifications as read with one UPDATE: all of them,
+    only `notification_ids`, or every one at or before `up_to`, the (created_at, id)
+    of the newest notification the user has seen. Returns the number updated."""
+    query = db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == False
+    )
+    if notification_ids is not None:
+        query = query.filter(models.Notification.id.in_(notification_ids))
+    if up_to is not None:
+        created_at, notification_id = up_to
+        query = query.filter(or_(
+            models.Notification.created_at < created_at,
+            and_(models.Notification.created_at == created_at, models.Notification.id <= notification_id)
+        ))
+    updated = query.update({"is_read": True}, synchronize_session=False)
+    if updated:
+        _adjust_unread_counts(db, [user_id], -updated)
+        db.commit()
+    return updated
 
 # Peer Feedback CRUD operations
 def create_peer_feedback(db: Session, feedback: schemas.PeerFeedbackCreate, from_employee_id: int) -> models.PeerFeedback:
@@ -111,8 +371,19 @@ def create_peer_feedback(db: Session, feedback: schemas.PeerFeedbackCreate, from
     db.refresh(db_feedback)
     return db_feedback
 
-def get_peer_feedback_for_employee(db: Session, employee_id: int) -> List[models.PeerFeedback]:
-    return db.query(models.PeerFeedback).filter(models.PeerFeedback.to_employee_id == employee_id).all()
+PEER_FEEDBACK_LIST = ListSpec(
+    id=models.PeerFeedback.id, time=models.PeerFeedback.created_at, default_sort="-created_at",
+    sorts={"created_at": models.PeerFeedback.created_at},
+    filters={"sentiment": models.PeerFeedback.sentiment, "acknowledged": models.PeerFeedback.acknowledged,
+             "is_anonymous": models.PeerFeedback.is_anonymous},
+)
+
+def get_peer_feedback_for_employee(db: Session, employee_id: int,
+                                   page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    query = db.query(models.PeerFeedback).options(joinedload(models.PeerFeedback.from_employee)).filter(
+        models.PeerFeedback.to_employee_id == employee_id
+    )
+    return pagination.paginate(query, page, PEER_FEEDBACK_LIST)
 
 def get_peer_feedback_by_id(db: Session, feedback_id: int) -> Optional[models.PeerFeedback]:
     return db.query(models.PeerFeedback).filter(models.PeerFeedback.id == feedback_id).first()
@@ -152,6 +423,13 @@ def get_employees_by_manager(db: Session, manager_id: int) -> List[models.User]:
         models.User.role == models.RoleEnum.employee
     ).all()
 
+def get_employee_ids_by_manager(db: Session, manager_id: int) -> List[int]:
+    """Get the ids of all employees for a given manager, for notification fan-out"""
+    return [row.id for row in db.query(models.User.id).filter(
+        models.User.manager_id == manager_id,
+        models.User.role == models.RoleEnum.employee
+    )]
+
 # Comment CRUD operations
 def create_comment(db: Session, comment: schemas.CommentCreate, employee_id: int) -> models.Comment:
     db_comment = models.Comment(
@@ -164,8 +442,19 @@ def create_comment(db: Session, comment: schemas.CommentCreate, employee_id: int
     db.refresh(db_comment)
     return db_comment
 
-def get_comments_for_feedback(db: Session, feedback_id: int) -> List[models.Comment]:
-    return db.query(models.Comment).filter(models.Comment.feedback_id == feedback_id).order_by(models.Comment.created_at.asc()).all()
+COMMENT_LIST = ListSpec(
+    id=models.Comment.id, time=models.Comment.created_at, default_sort="created_at",
+    sorts={"created_at": models.Comment.created_at},
+    filters={"employee_id": models.Comment.employee_id},
+)
+
+def get_comments_for_feedback(db: Session, feedback_id: int,
+                              page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Oldest first by default, like a conversation"""
+    query = db.query(models.Comment).options(joinedload(models.Comment.employee)).filter(
+        models.Comment.feedback_id == feedback_id
+    )
+    return pagination.paginate(query, page, COMMENT_LIST)
 
 def get_comment_by_id(db: Session, comment_id: int) -> Optional[models.Comment]:
     return db.query(models.Comment).filter(models.Comment.id == comment_id).first()
@@ -198,20 +487,21 @@ def create_announcement(db: Session, announcement: schemas.AnnouncementCreate, m
     db.add(db_announcement)
     db.commit()
     db.refresh(db_announcement)
-
-    # Create notifications for employees
-    employees = get_employees_by_manager(db, manager_id)
-    for employee in employees:
-        create_notification(db, employee.id, f"New announcement: '{announcement.title}'")
-
     return db_announcement
 
-def get_announcements_for_team(db: Session, manager_id: int) -> List[models.Announcement]:
-    """Get all active announcements for a manager's team"""
-    return db.query(models.Announcement).filter(
+ANNOUNCEMENT_LIST = ListSpec(
+    id=models.Announcement.id, time=models.Announcement.created_at, default_sort="-created_at",
+    sorts={"created_at": models.Announcement.created_at, "title": models.Announcement.title},
+)
+
+def get_announcements_for_team(db: Session, manager_id: int,
+                               page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Get the active announcements for a manager's team"""
+    query = db.query(models.Announcement).filter(
         models.Announcement.manager_id == manager_id,
         models.Announcement.is_active == True
-    ).order_by(models.Announcement.created_at.desc()).all()
+    )
+    return pagination.paginate(query, page, ANNOUNCEMENT_LIST)
 
 def get_announcement_by_id(db: Session, announcement_id: int) -> Optional[models.Announcement]:
     return db.query(models.Announcement).filter(models.Announcement.id == announcement_id).first()
@@ -242,46 +532,90 @@ def delete_announcement(db: Session, announcement_id: int, manager_id: int) -> b
         return True
     return False
 
-def get_announcements_for_employee(db: Session, employee_id: int) -> List[models.Announcement]:
-    """Get all active announcements for an employee based on their manager"""
+def get_announcements_for_employee(db: Session, employee_id: int,
+                                   page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Get the active announcements for an employee based on their manager"""
     employee = get_user_by_id(db, employee_id)
     if not employee or not employee.manager_id:
-        return []
+        return pagination.Page()
     
-    return db.query(models.Announcement).filter(
+    query = db.query(models.Announcement).options(joinedload(models.Announcement.manager)).filter(
         models.Announcement.manager_id == employee.manager_id,
         models.Announcement.is_active == True
-    ).order_by(models.Announcement.created_at.desc()).all()
+    )
+    return pagination.paginate(query, page, ANNOUNCEMENT_LIST)
 
 # Document CRUD operations
+def _file_columns(db: Session, data: dict) -> dict:
+    """Column values for a row's file. A staged upload (data["upload"]) becomes
+    one more reference to the blob of its content, created if new, and its file
+    is moved into place in the caller's transaction (and collected again if
+    that rolls back)."""
+    upload = data.get("upload")
+    if upload is None:
+        return {"file_path": data["file_path"], "file_size": data["file_size"]}
+    dialect = db.get_bind().dialect.name
+    upsert = (postgresql_insert if dialect == "postgresql" else sqlite_insert)(models.Blob).values(
+        sha256=upload.sha256, size=upload.size, ref_count=1)
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=["sha256"], set_={"ref_count": models.Blob.ref_count + 1}))
+    # Placed while the upsert holds the blob row, so a concurrent release of the
+    # last reference cannot remove the file between this and the commit
+    file_path = blobs.place(db, upload)
+    return {"file_path": file_path, "file_size": upload.size, "blob_sha256": upload.sha256}
+
+def _release_file(db: Session, row):
+    """Drop the row's reference to its blob; with the last one the blob is
+    collected once the caller, who deletes the row, commits"""
+    if row.blob_sha256 is None:
+        return
+    db.flush()
+    remaining = db.execute(
+        update(models.Blob).where(models.Blob.sha256 == row.blob_sha256)
+        .values(ref_count=models.Blob.ref_count - 1).returning(models.Blob.ref_count)
+    ).scalar()
+    if remaining is not None and remaining <= 0:
+        # The row stays at zero until then, so a failed commit leaves both it and the file
+        blobs.release(db, row.blob_sha256)
+
 def create_document(db: Session, document_data: dict, employee_id: int) -> models.Document:
     db_document = models.Document(
         employee_id=employee_id,
         title=document_data["title"],
         description=document_data.get("description"),
         filename=document_data["filename"],
-        file_path=document_data["file_path"],
-        file_size=document_data["file_size"],
         mime_type=document_data.get("mime_type", "application/pdf"),
-        is_public=document_data.get("is_public", False)
+        is_public=document_data.get("is_public", False),
+        **_file_columns(db, document_data)
     )
     db.add(db_document)
     db.commit()
     db.refresh(db_document)
     return db_document
 
-def get_documents_for_employee(db: Session, employee_id: int) -> List[models.Document]:
-    """Get all documents uploaded by an employee"""
-    return db.query(models.Document).filter(
-        models.Document.employee_id == employee_id
-    ).order_by(models.Document.created_at.desc()).all()
-
-def get_public_documents_for_team(db: Session, manager_id: int) -> List[models.Document]:
-    """Get all public documents from employees in a manager's team"""
-    return db.query(models.Document).join(models.User).filter(
+DOCUMENT_LIST = ListSpec(
+    id=models.Document.id, time=models.Document.created_at, default_sort="-created_at",
+    sorts={"created_at": models.Document.created_at, "title": models.Document.title},
+    filters={"is_public": models.Document.is_public, "mime_type": models.Document.mime_type,
+             "employee_id": models.Document.employee_id},
+)
+
+def get_documents_for_employee(db: Session, employee_id: int,
+                               page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Get the documents uploaded by an employee"""
+    query = db.query(models.Document).filter(models.Document.employee_id == employee_id)
+    return pagination.paginate(query, page, DOCUMENT_LIST)
+
+def get_public_documents_for_team(db: Session, manager_id: int,
+                                  page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Get the public documents from employees in a manager's team"""
+    query = db.query(models.Document).join(models.Document.employee).options(
+        contains_eager(models.Document.employee)
+    ).filter(
         models.User.manager_id == manager_id,
         models.Document.is_public == True
-    ).order_by(models.Document.created_at.desc()).all()
+    )
+    return pagination.paginate(query, page, DOCUMENT_LIST)
 
 def get_document_by_id(db: Session, document_id: int) -> Optional[models.Document]:
     return db.query(models.Document).filter(models.Document.id == document_id).first()
@@ -308,6 +642,7 @@ def delete_document(db: Session, document_id: int, employee_id: int) -> bool:
     
     if document:
         db.delete(document)
+        _release_file(db, document)
         db.commit()
         return True
     return False
@@ -319,33 +654,54 @@ def create_assignment(db: Session, assignment_data: dict, manager_id: int) -> mo
         title=assignment_data["title"],
         description=assignment_data.get("description"),
         filename=assignment_data["filename"],
-        file_path=assignment_data["file_path"],
-        file_size=assignment_data["file_size"],
         mime_type=assignment_data.get("mime_type", "application/pdf"),
-        due_date=assignment_data.get("due_date")
+        due_date=assignment_data.get("due_date"),
+        **_file_columns(db, assignment_data)
     )
     db.add(db_assignment)
+    _bump_team_stats(db, manager_id, active_assignments=1)
     db.commit()
     db.refresh(db_assignment)
     return db_assignment
 
-def get_assignments_for_team(db: Session, manager_id: int) -> List[models.Assignment]:
-    """Get all active assignments for a manager's team"""
-    return db.query(models.Assignment).filter(
+ASSIGNMENT_LIST = ListSpec(
+    id=models.Assignment.id, time=models.Assignment.created_at, default_sort="-created_at",
+    sorts={"created_at": models.Assignment.created_at, "title": models.Assignment.title},
+)
+
+def get_assignments_for_team(db: Session, manager_id: int,
+                             page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Get the active assignments for a manager's team"""
+    query = db.query(models.Assignment).filter(
+        models.Assignment.manager_id == manager_id,
+        models.Assignment.is_active == True
+    )
+    return pagination.paginate(query, page, ASSIGNMENT_LIST)
+
+def get_assignments_with_submission_counts(db: Session, manager_id: int,
+                                           page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Active assignments for a manager's team, each as an (assignment, submission count) row, in one query"""
+    submission_count = select(func.count(models.Submission.id)).where(
+        models.Submission.assignment_id == models.Assignment.id
+    ).correlate(models.Assignment).scalar_subquery()
+    query = db.query(models.Assignment, submission_count).filter(
         models.Assignment.manager_id == manager_id,
         models.Assignment.is_active == True
-    ).order_by(models.Assignment.created_at.desc()).all()
+    )
+    return pagination.paginate(query, page, ASSIGNMENT_LIST)
 
-def get_assignments_for_employee(db: Session, employee_id: int) -> List[models.Assignment]:
-    """Get all active assignments for an employee based on their manager"""
+def get_assignments_for_employee(db: Session, employee_id: int,
+                                 page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Get the active assignments for an employee based on their manager"""
     employee = get_user_by_id(db, employee_id)
     if not employee or not employee.manager_id:
-        return []
+        return pagination.Page()
     
-    return db.query(models.Assignment).filter(
+    query = db.query(models.Assignment).options(joinedload(models.Assignment.manager)).filter(
         models.Assignment.manager_id == employee.manager_id,
         models.Assignment.is_active == True
-    ).order_by(models.Assignment.created_at.desc()).all()
+    )
+    return pagination.paginate(query, page, ASSIGNMENT_LIST)
 
 def get_assignment_by_id(db: Session, assignment_id: int) -> Optional[models.Assignment]:
     return db.query(models.Assignment).filter(models.Assignment.id == assignment_id).first()
@@ -359,13 +715,19 @@ def update_assignment(db: Session, assignment: models.Assignment, updates: schem
         assignment.description = update_data["description"]
     if "due_date" in update_data:
         assignment.due_date = update_data["due_date"]
-    if "is_active" in update_data:
+    if "is_active" in update_data and bool(update_data["is_active"]) != bool(assignment.is_active):
+        sign = 1 if update_data["is_active"] else -1
+        _bump_team_stats(db, assignment.manager_id, active_assignments=sign,
+                         active_assignment_submissions=sign * count_submissions(db, assignment.id))
         assignment.is_active = update_data["is_active"]
     
     db.commit()
     db.refresh(assignment)
     return assignment
 
+def count_submissions(db: Session, assignment_id: int) -> int:
+    return db.query(func.count(models.Submission.id)).filter(models.Submission.assignment_id == assignment_id).scalar()
+
 def delete_assignment(db: Session, assignment_id: int, manager_id: int) -> bool:
     assignment = db.query(models.Assignment).filter(
         models.Assignment.id == assignment_id,
@@ -373,7 +735,11 @@ def delete_assignment(db: Session, assignment_id: int, manager_id: int) -> bool:
     ).first()
     
     if assignment:
+        if assignment.is_active:
+            _bump_team_stats(db, manager_id, active_assignments=-1,
+                             active_assignment_submissions=-count_submissions(db, assignment.id))
         db.delete(assignment)
+        _release_file(db, assignment)
         db.commit()
         return True
     return False
@@ -386,20 +752,30 @@ def create_submission(db: Session, submission_data: dict, employee_id: int) -> m
         title=submission_data["title"],
         description=submission_data.get("description"),
         filename=submission_data["filename"],
-        file_path=submission_data["file_path"],
-        file_size=submission_data["file_size"],
-        mime_type=submission_data.get("mime_type", "application/pdf")
+        mime_type=submission_data.get("mime_type", "application/pdf"),
+        **_file_columns(db, submission_data)
     )
     db.add(db_submission)
+    assignment = get_assignment_by_id(db, submission_data["assignment_id"])
+    if assignment and assignment.is_active:
+        _bump_team_stats(db, assignment.manager_id, active_assignment_submissions=1)
     db.commit()
     db.refresh(db_submission)
     return db_submission
 
-def get_submissions_for_assignment(db: Session, assignment_id: int) -> List[models.Submission]:
-    """Get all submissions for a specific assignment (for managers)"""
-    return db.query(models.Submission).filter(
+SUBMISSION_LIST = ListSpec(
+    id=models.Submission.id, time=models.Submission.submitted_at, default_sort="-submitted_at",
+    sorts={"submitted_at": models.Submission.submitted_at, "title": models.Submission.title},
+    filters={"employee_id": models.Submission.employee_id, "assignment_id": models.Submission.assignment_id},
+)
+
+def get_submissions_for_assignment(db: Session, assignment_id: int,
+                                   page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Get the submissions for a specific assignment (for managers)"""
+    query = db.query(models.Submission).options(joinedload(models.Submission.employee)).filter(
         models.Submission.assignment_id == assignment_id
-    ).order_by(models.Submission.submitted_at.desc()).all()
+    )
+    return pagination.paginate(query, page, SUBMISSION_LIST)
 
 def get_submission_by_employee_and_assignment(db: Session, employee_id: int, assignment_id: int) -> Optional[models.Submission]:
     """Get a specific employee's submission for a specific assignment"""
@@ -408,11 +784,11 @@ def get_submission_by_employee_and_assignment(db: Session, employee_id: int, ass
         models.Submission.assignment_id == assignment_id
     ).first()
 
-def get_submissions_by_employee(db: Session, employee_id: int) -> List[models.Submission]:
-    """Get all submissions made by an employee"""
-    return db.query(models.Submission).filter(
-        models.Submission.employee_id == employee_id
-    ).order_by(models.Submission.submitted_at.desc()).all()
+def get_submissions_by_employee(db: Session, employee_id: int,
+                                page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Get the submissions made by an employee"""
+    query = db.query(models.Submission).filter(models.Submission.employee_id == employee_id)
+    return pagination.paginate(query, page, SUBMISSION_LIST)
 
 def get_submission_by_id(db: Session, submission_id: int) -> Optional[models.Submission]:
     return db.query(models.Submission).filter(models.Submission.id == submission_id).first()
@@ -436,7 +812,11 @@ def delete_submission(db: Session, submission_id: int, employee_id: int) -> bool
     ).first()
     
     if submission:
+        assignment = get_assignment_by_id(db, submission.assignment_id)
+        if assignment and assignment.is_active:
+            _bump_team_stats(db, assignment.manager_id, active_assignment_submissions=-1)
         db.delete(submission)
+        _release_file(db, submission)
         db.commit()
         return True
     return False
@@ -452,10 +832,19 @@ def create_assignment_comment(db: Session, comment: schemas.AssignmentCommentCre
     db.refresh(db_comment)
     return db_comment
 
-def get_comments_for_assignment(db: Session, assignment_id: int) -> List[models.AssignmentComment]:
-    return db.query(models.AssignmentComment).filter(
+ASSIGNMENT_COMMENT_LIST = ListSpec(
+    id=models.AssignmentComment.id, time=models.AssignmentComment.created_at, default_sort="created_at",
+    sorts={"created_at": models.AssignmentComment.created_at},
+    filters={"employee_id": models.AssignmentComment.employee_id},
+)
+
+def get_comments_for_assignment(db: Session, assignment_id: int,
+                                page: Optional[pagination.PageRequest] = None) -> pagination.Page:
+    """Oldest first by default, like a conversation"""
+    query = db.query(models.AssignmentComment).options(joinedload(models.AssignmentComment.employee)).filter(
         models.AssignmentComment.assignment_id == assignment_id
-    ).order_by(models.AssignmentComment.created_at.asc()).all()
+    )
+    return pagination.paginate(query, page, ASSIGNMENT_COMMENT_LIST)
 
 def get_assignment_comment_by_id(db: Session, comment_id: int) -> Optional[models.AssignmentComment]:
     return db.query(models.AssignmentComment).filter(models.AssignmentComment.id == comment_id).first()
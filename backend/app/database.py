@@ -1,20 +1,87 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from .models import Base
+from . import migrations
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./feedback.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./feedback.db")
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Connection pool tuning (ignored for SQLite, which uses a per-thread pool)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Apply pending schema migrations on startup; disable to run `python -m app.migrations` yourself
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+# SQLite performance profile, applied to every new connection. WAL lets readers
+# run alongside the single writer, and NORMAL sync is durable in WAL mode.
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "true").lower() in ("1", "true", "yes")
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, i.e. 64MB
+    "temp_store": "MEMORY",
+}
+
+def normalize_database_url(url: str) -> str:
+    """Hosting providers (Render, Railway, Heroku) hand out postgres:// URLs,
+    which SQLAlchemy no longer accepts. Bare PostgreSQL URLs are pinned to the
+    psycopg (v3) driver listed in requirements.txt."""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+def is_sqlite_url(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def build_engine(url: str, sqlite_tuning: bool = SQLITE_TUNING, **engine_kwargs) -> Engine:
+    """Create an engine for `url` with pool settings suited to its backend."""
+    url = normalize_database_url(url)
+    if is_sqlite_url(url):
+        options = {"connect_args": {"check_same_thread": False}}
+        database = make_url(url).database
+        if not database or database == ":memory:":
+            # Every connection to :memory: is a fresh database, so share one
+            options["poolclass"] = StaticPool
+    else:
+        options = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        }
+    options.update(engine_kwargs)
+    engine = create_engine(url, **options)
+    if sqlite_tuning and is_sqlite_url(url):
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    return engine
+
+engine = build_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    if AUTO_MIGRATE:
+        migrations.upgrade(engine)
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
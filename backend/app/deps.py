@@ -1,20 +1,22 @@
-from fastapi import Depends, HTTPException, status
+from datetime import datetime
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from .database import get_db
-from . import models, crud, schemas, auth
-from jose import JWTError
+from . import models, crud, schemas, auth, pagination
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+def _user_for_token(db: Session, token: str, scopes=(None,)) -> models.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     payload = auth.decode_access_token(token)
-    if payload is None:
+    if payload is None or payload.get("scope") not in scopes:
         raise credentials_exception
     user_id: int = payload.get("user_id")
     if user_id is None:
@@ -24,6 +26,29 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
         raise credentials_exception
     return user
 
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+    return _user_for_token(db, token)
+
+def get_stream_user(db: Session, token: str) -> models.User:
+    """The user behind a token from get_stream_token: a full access token from
+    the Authorization header or a stream token from the query string."""
+    return _user_for_token(db, token, scopes=(None, auth.STREAM_SCOPE))
+
+def get_stream_token(header_token: str = Depends(optional_oauth2_scheme), token: str = Query(None)) -> str:
+    # EventSource cannot set an Authorization header, so streams also accept
+    # ?token=, but only a short-lived stream token (POST /notifications/stream-token):
+    # query strings are logged, and a full access token there would outlive the log
+    if header_token:
+        return header_token
+    payload = auth.decode_access_token(token) if token else None
+    if not payload or payload.get("scope") != auth.STREAM_SCOPE:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated" if not token else "Query tokens must be stream tokens",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return token
+
 def get_current_manager(current_user: models.User = Depends(get_current_user)) -> models.User:
     if current_user.role != schemas.RoleEnum.manager:
         raise HTTPException(status_code=403, detail="Manager access required")
@@ -32,4 +57,21 @@ def get_current_manager(current_user: models.User = Depends(get_current_user)) -
 def get_current_employee(current_user: models.User = Depends(get_current_user)) -> models.User:
     if current_user.role != schemas.RoleEnum.employee:
         raise HTTPException(status_code=403, detail="Employee access required")
-    return current_user 
\ No newline at end of file
+    return current_user
+
+PAGE_PARAMS = {"limit", "cursor", "sort", "since", "until"}
+
+def get_page(
+    request: Request,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    sort: Optional[str] = Query(None, description="Field to sort by, '-field' for descending"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> pagination.PageRequest:
+    # Other query parameters are handed on as filters; the list's ListSpec applies those
+    # it filters on (e.g. ?sentiment=positive) and ignores the rest, as FastAPI would
+    filters = {name: value for name, value in request.query_params.items() if name not in PAGE_PARAMS}
+    if since and until and pagination.as_utc(since) >= pagination.as_utc(until):
+        raise HTTPException(status_code=400, detail="since must be before until")
+    return pagination.PageRequest(limit=limit, cursor=cursor, sort=sort, since=since, until=until, filters=filters)
@@ -0,0 +1,180 @@
+"""Storing uploads on disk and serving them back.
+
+Uploads are copied out of the request in chunks on a worker thread, so a
+large file never stalls the event loop. The size limit and the file signature
+are checked as the bytes go by and a SHA-256 is computed on the way. The data
+is staged in a temporary file that the blob store renames into place once the
+upload is accepted (see `blobs`); a rejected or failed upload leaves nothing
+behind in the upload directory.
+
+Downloads go out as a FileResponse, which streams the file in chunks (or hands
+it to the server with the ASGI pathsend extension where the server supports
+it) instead of reading it into memory. FileResponse already answers `Range`
+with 206 Partial Content, 416 and `If-Range`; this module adds the validators
+a client revalidates with, so a PDF viewer that seeks or a resumed download
+gets 304 when the file has not changed.
+"""
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import BinaryIO, Union
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, JSONResponse, Response
+
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# Room for the multipart boundaries and the form fields sent next to the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Leading bytes a file of each type must start with; types without a fixed signature are not checked
+SIGNATURES = {
+    "application/pdf": (b"%PDF-",),
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/gif": (b"GIF87a", b"GIF89a"),
+}
+
+@dataclass
+class StoredUpload:
+    # The staged temporary file until the blob store moves it
+    path: Path
+    size: int
+    sha256: str
+
+def safe_filename(filename: str) -> str:
+    """The client's file name without any directory part, so it cannot escape the upload directory"""
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    return name if name not in ("", ".", "..") else "upload"
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB")
+
+def _stage(source: BinaryIO, directory: Path, media_type: str, max_bytes: int) -> StoredUpload:
+    directory.mkdir(parents=True, exist_ok=True)
+    # Staged next to its final place, so the rename never crosses filesystems
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                if size == 0 and media_type in SIGNATURES and not chunk.startswith(SIGNATURES[media_type]):
+                    raise HTTPException(status_code=400, detail="File content does not match its type")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+            if size == 0:
+                raise HTTPException(status_code=400, detail="File is empty")
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return StoredUpload(path=Path(temp_path), size=size, sha256=digest.hexdigest())
+
+async def stage_upload(file: UploadFile, directory: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> StoredUpload:
+    """Copy an uploaded file to a temporary file in `directory`, enforcing the size limit and the type's signature"""
+    # Starlette counts the bytes it spooled; a body already known to be too big is refused without copying
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+    try:
+        return await run_in_threadpool(_stage, file.file, Path(directory), file.content_type, max_bytes)
+    except OSError:
+        raise HTTPException(status_code=500, detail="Failed to save file")
+
+def discard(upload: StoredUpload):
+    """Remove a staged upload that was not moved into place; harmless once it has been"""
+    upload.path.unlink(missing_ok=True)
+
+class UploadSizeLimit:
+    """ASGI middleware refusing a body whose Content-Length already exceeds the upload limit.
+
+    Starlette spools a multipart body to disk before the endpoint runs, so
+    without this an oversized upload is received in full only to be rejected.
+    Chunked bodies carry no length and are cut off by `stage_upload` instead.
+    """
+
+    def __init__(self, app, max_body: int = MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            length = Headers(scope=scope).get("content-length", "")
+            if length.isdigit() and int(length) > self.max_body:
+                response = JSONResponse(status_code=413, content={
+                    "detail": f"File too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+# Uploads are replaced rather than edited, but an ETag check is one stat() so clients always revalidate
+CACHE_CONTROL = "private, no-cache"
+
+class DownloadResponse(FileResponse):
+    # Larger reads mean fewer event loop round trips per download on servers without pathsend
+    chunk_size = 256 * 1024
+
+def content_disposition(filename: str) -> str:
+    """An attachment header for `filename`, RFC 5987-encoded when it is not plain ASCII"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+def file_response(request: Request, path: Union[str, Path], filename: str, media_type: str) -> Response:
+    """Send a stored file as an attachment, honouring Range and conditional requests"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if stat.st_size == 0:
+        raise HTTPException(status_code=404, detail="File is empty")
+
+    response = DownloadResponse(
+        path,
+        media_type=media_type,
+        filename=filename,
+        stat_result=stat,
+        headers={"Cache-Control": CACHE_CONTROL},
+    )
+    etag = response.headers["etag"]
+    if request.method in ("GET", "HEAD") and _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers={
+            "ETag": etag,
+            "Last-Modified": response.headers["last-modified"],
+            "Cache-Control": CACHE_CONTROL,
+        })
+    return response
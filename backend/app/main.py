@@ -1,17 +1,17 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List
-from . import models, schemas, crud, auth, deps, database
-from datetime import timedelta, datetime
+from typing import List, Optional
+from . import models, schemas, crud, auth, blobs, deps, database, files, notifications, pagination, realtime, storage
+from datetime import date, timedelta, datetime
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 import io
+import asyncio
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
-import os
-import shutil
 from fastapi import UploadFile, File, Form
 from pathlib import Path
 
@@ -25,21 +25,40 @@ origins = [
     "https://feedbacksystem-86zx.onrender.com",  # The live backend URL
 ]
 
+# Added before CORS so CORS wraps it and a 413 still reaches the browser
+app.add_middleware(files.UploadSizeLimit)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins, 
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Read-Cursor", "ETag", "Last-Modified", "Content-Range", "Accept-Ranges"],
 )
 
+@app.exception_handler(pagination.PageError)
+def invalid_page(request: Request, exc: pagination.PageError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+def _page(response: Response, page: pagination.Page) -> pagination.Page:
+    # List endpoints return one page; the client passes X-Next-Cursor back as ?cursor=
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page
+
 def startup():
     database.init_db()
+    notifications.dispatcher.start()
 
 @app.on_event("startup")
 def on_startup():
     startup()
 
+@app.on_event("shutdown")
+def on_shutdown():
+    notifications.dispatcher.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "Feedback System API"}
@@ -78,7 +97,7 @@ def submit_feedback(feedback: schemas.FeedbackCreate, current_user: models.User
     return crud.create_feedback(db, feedback, manager_id=current_user.id)
 
 @app.get("/feedback/employee/{employee_id}", response_model=List[schemas.FeedbackResponse])
-def get_feedback_for_employee(employee_id: int, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
+def get_feedback_for_employee(employee_id: int, response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
     # Employee can only see their own feedback; manager can see their team
     if current_user.role == schemas.RoleEnum.employee and current_user.id != employee_id:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -86,7 +105,7 @@ def get_feedback_for_employee(employee_id: int, current_user: models.User = Depe
         employee = crud.get_user_by_id(db, employee_id)
         if not employee or employee.manager_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized")
-    return crud.get_feedback_for_employee(db, employee_id)
+    return _page(response, crud.get_feedback_for_employee(db, employee_id, page))
 
 @app.patch("/feedback/{feedback_id}", response_model=schemas.FeedbackResponse)
 def update_feedback(feedback_id: int, updates: schemas.FeedbackUpdate, current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
@@ -111,13 +130,127 @@ def request_feedback(current_user: models.User = Depends(deps.get_current_employ
         raise HTTPException(status_code=400, detail="You do not have a manager assigned.")
     
     message = f"Employee '{current_user.name}' has requested feedback."
-    crud.create_notification(db, user_id=current_user.manager_id, message=message)
+    notifications.dispatcher.dispatch(db, message, user_ids=[current_user.manager_id])
+    db.commit()
     
     return {"message": "Feedback request sent successfully."}
 
+@app.get("/metrics/notifications")
+def notification_metrics(current_user: models.User = Depends(deps.get_current_manager)):
+    return {
+        **notifications.dispatcher.metrics(),
+        "stream_subscribers": realtime.hub.subscriber_count(),
+        "stream_events_published": realtime.hub.published,
+    }
+
 @app.get("/notifications", response_model=List[schemas.NotificationResponse])
-def read_notifications(current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
-    return crud.get_notifications_for_user(db, user_id=current_user.id)
+def read_notifications(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    current_user: models.User = Depends(deps.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    # Keyset pagination: pass the X-Next-Cursor response header back as `cursor` for the next page
+    try:
+        before = pagination.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    items = crud.get_notifications_for_user(db, user_id=current_user.id, limit=limit + 1,
+                                            before=before, unread_only=unread_only)
+    if items and not cursor:
+        # The newest row the client is about to see; POST it back to /notifications/read
+        # as up_to_cursor to mark what was shown without touching anything that arrives later
+        response.headers["X-Read-Cursor"] = pagination.encode_cursor(items[0].created_at, items[0].id)
+    if len(items) > limit:
+        items = items[:limit]
+        response.headers["X-Next-Cursor"] = pagination.encode_cursor(items[-1].created_at, items[-1].id)
+    return items
+
+@app.get("/notifications/unread-count", response_model=schemas.UnreadCountResponse)
+def unread_notification_count(request: Request, current_user: models.User = Depends(deps.get_current_user)):
+    # The counter lives on the user row already loaded for auth, so the whole
+    # request is that one primary-key lookup, 304 or not. The ETag carries the
+    # count, so it cannot be checked without reading it; a 304 saves the body
+    # and the client's list reload, not the lookup.
+    count = current_user.unread_notification_count
+    etag = f'W/"unread-{current_user.id}-{count}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse({"unread_count": count}, headers=headers)
+
+@app.post("/notifications/stream-token", response_model=schemas.StreamTokenResponse)
+def create_stream_token(current_user: models.User = Depends(deps.get_current_user)):
+    # For EventSource, which can only authenticate through the URL
+    return {"token": auth.create_stream_token(current_user.id), "expires_in": auth.STREAM_TOKEN_EXPIRE_SECONDS}
+
+@app.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[int] = None,
+    token: str = Depends(deps.get_stream_token),
+    db: Session = Depends(database.get_db)
+):
+    # Server-Sent Events; browsers send Last-Event-ID on reconnect, which also
+    # works as a query parameter for the first connection
+    header_id = request.headers.get("last-event-id")
+    if header_id:
+        try:
+            last_event_id = int(header_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    def open_stream():
+        # Authenticate, replay and release the connection in one worker thread:
+        # idle streams must not hold a pooled connection, and handing it back
+        # from another thread hop deadlocks once thousands of clients connect
+        try:
+            user_id = deps.get_stream_user(db, token).id
+            # Subscribe before reading the backlog so nothing committed in between is lost
+            subscription = realtime.hub.subscribe_from_thread(user_id, loop)
+            missed = []
+            if last_event_id is not None:
+                try:
+                    missed = crud.get_notifications_since(db, user_id, last_event_id, realtime.STREAM_REPLAY_LIMIT)
+                except Exception:
+                    realtime.hub.unsubscribe(subscription)
+                    raise
+            replay = [realtime.notification_event(n.id, n.user_id, n.message, n.created_at, n.is_read, n.event_count)
+                      for n in missed]
+            return subscription, replay
+        finally:
+            db.close()
+
+    loop = asyncio.get_running_loop()
+    subscription, replay = await run_in_threadpool(open_stream)
+    return StreamingResponse(
+        realtime.event_stream(subscription, replay, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+MAX_BULK_READ_IDS = 1000
+
+@app.post("/notifications/read", response_model=schemas.NotificationBulkReadResponse)
+def mark_read_bulk(selection: schemas.NotificationBulkRead, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
+    selected = [selection.all, selection.ids is not None, selection.up_to_cursor is not None]
+    if sum(selected) != 1:
+        raise HTTPException(status_code=400, detail="Specify exactly one of 'all', 'ids' or 'up_to_cursor'")
+    if selection.ids is not None and len(selection.ids) > MAX_BULK_READ_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_READ_IDS} ids per request")
+
+    up_to = None
+    if selection.up_to_cursor is not None:
+        try:
+            up_to = pagination.decode_cursor(selection.up_to_cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    updated = crud.mark_notifications_as_read(db, current_user.id, notification_ids=selection.ids, up_to=up_to)
+    return {"updated": updated}
 
 @app.post("/notifications/{notification_id}/read", response_model=schemas.NotificationResponse)
 def mark_read(notification_id: int, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
@@ -128,33 +261,115 @@ def mark_read(notification_id: int, current_user: models.User = Depends(deps.get
 
 # --- Dashboard Endpoints ---
 @app.get("/dashboard/manager")
-def manager_dashboard(current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
-    team = db.query(models.User).filter(models.User.manager_id == current_user.id).all()
-    feedbacks = crud.get_feedback_for_manager(db, current_user.id)
-    sentiment_counts = {s.value: 0 for s in schemas.SentimentEnum}
-    for fb in feedbacks:
-        sentiment_counts[fb.sentiment.value] += 1
+def manager_dashboard(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: models.User = Depends(deps.get_current_manager),
+    db: Session = Depends(database.get_db)
+):
+    # All-time figures come from the team_stats row; the optional range
+    # [start_date, end_date) recounts the feedback figures in SQL
+    if start_date and end_date and start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    stats = crud.get_team_stats(db, current_user.id)
+    if start_date or end_date:
+        sentiment_counts = crud.get_feedback_sentiment_counts(db, current_user.id, start=pagination.as_utc(start_date), end=pagination.as_utc(end_date))
+    else:
+        sentiment_counts = {s.value: stats[f"feedback_{s.value}"] for s in models.SentimentEnum}
     return {
-        "team_size": len(team),
-        "feedback_count": len(feedbacks),
-        "sentiment_trends": sentiment_counts
+        "team_size": stats["team_size"],
+        "feedback_count": sum(sentiment_counts.values()),
+        "sentiment_trends": sentiment_counts,
+        "unacknowledged_feedback": stats["unacknowledged_feedback"],
+        "active_assignments": stats["active_assignments"],
+        "pending_submissions": stats["pending_submissions"]
     }
 
+def _period_start(day: date, bucket: schemas.TrendBucketEnum) -> date:
+    if bucket == schemas.TrendBucketEnum.week:
+        return day - timedelta(days=day.weekday())
+    if bucket == schemas.TrendBucketEnum.month:
+        return day.replace(day=1)
+    return day
+
+def _next_period(start: date, bucket: schemas.TrendBucketEnum) -> date:
+    if bucket == schemas.TrendBucketEnum.week:
+        return start + timedelta(weeks=1)
+    if bucket == schemas.TrendBucketEnum.month:
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+MAX_TREND_POINTS = 1000
+
+@app.get("/dashboard/manager/trends", response_model=schemas.SentimentTrendResponse)
+def manager_sentiment_trends(
+    bucket: schemas.TrendBucketEnum = schemas.TrendBucketEnum.week,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: models.User = Depends(deps.get_current_manager),
+    db: Session = Depends(database.get_db)
+):
+    # Served from the daily rollup, never from feedbacks; days are UTC and end_date is exclusive
+    if start_date and end_date and start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    rows = crud.get_sentiment_rollup(db, current_user.id, start=start_date, end=end_date)
+
+    totals = {}
+    for row in rows:
+        period = _period_start(row.day, bucket)
+        totals.setdefault(period, {s.value: 0 for s in schemas.SentimentEnum})[row.sentiment.value] += row.feedback_count
+
+    # Zero-fill so charts get a continuous axis
+    series = []
+    if totals or (start_date and end_date):
+        period = _period_start(start_date or min(totals), bucket)
+        last = end_date - timedelta(days=1) if end_date else max(totals)
+        while period <= last:
+            series.append({"period_start": period, **totals.get(period, {})})
+            if len(series) > MAX_TREND_POINTS:
+                raise HTTPException(status_code=400, detail=f"Range too long; at most {MAX_TREND_POINTS} points per request")
+            period = _next_period(period, bucket)
+    return {"bucket": bucket, "series": series}
+
 @app.get("/dashboard/employee")
-def employee_dashboard(current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
-    feedbacks = crud.get_feedback_for_employee(db, current_user.id)
-    return {
-        "feedback_timeline": [
-            {
-                "id": fb.id,
-                "sentiment": fb.sentiment.value,
-                "created_at": fb.created_at,
-                "acknowledged": fb.acknowledged,
-                "strengths": fb.strengths,
-                "areas_to_improve": fb.areas_to_improve,
-            } for fb in feedbacks
-        ]
-    }
+def employee_dashboard(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    summary: bool = False,
+    current_user: models.User = Depends(deps.get_current_employee),
+    db: Session = Depends(database.get_db)
+):
+    # Newest first in pages of `limit`; follow X-Next-Cursor for older entries.
+    # summary=true leaves out the strengths / areas_to_improve text entirely.
+    if start_date and end_date and start_date >= end_date:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    try:
+        before = pagination.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    feedbacks = crud.get_feedback_timeline(db, current_user.id, limit=limit + 1, before=before,
+                                           start=pagination.as_utc(start_date), end=pagination.as_utc(end_date), summary=summary)
+    if len(feedbacks) > limit:
+        feedbacks = feedbacks[:limit]
+        response.headers["X-Next-Cursor"] = pagination.encode_cursor(feedbacks[-1].created_at, feedbacks[-1].id)
+
+    timeline = []
+    for fb in feedbacks:
+        entry = {
+            "id": fb.id,
+            "sentiment": fb.sentiment.value,
+            "created_at": fb.created_at,
+            "acknowledged": fb.acknowledged,
+        }
+        if not summary:
+            entry["strengths"] = fb.strengths
+            entry["areas_to_improve"] = fb.areas_to_improve
+        timeline.append(entry)
+    return {"feedback_timeline": timeline}
 
 def generate_feedback_pdf(employee_name: str, feedbacks: List[models.Feedback]) -> io.BytesIO:
     buffer = io.BytesIO()
@@ -258,8 +473,8 @@ def submit_peer_feedback(feedback: schemas.PeerFeedbackCreate, current_user: mod
     return response_data
 
 @app.get("/peer-feedback/received", response_model=List[schemas.PeerFeedbackResponse])
-def get_received_peer_feedback(current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
-    feedbacks = crud.get_peer_feedback_for_employee(db, current_user.id)
+def get_received_peer_feedback(response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
+    feedbacks = _page(response, crud.get_peer_feedback_for_employee(db, current_user.id, page))
     
     # Convert to response format, handling anonymous feedback
     response_feedbacks = []
@@ -307,12 +522,17 @@ def create_comment(comment: schemas.CommentCreate, current_user: models.User = D
     if not feedback or feedback.employee_id != current_user.id:
         raise HTTPException(status_code=404, detail="Feedback not found or not authorized")
     
-    db_comment = crud.create_comment(db, comment, current_user.id)
-    
-    # Send notification to the manager with comment preview
+    # Notify the manager with a comment preview; staged on the session, so it
+    # commits together with the comment
     comment_preview = comment.content[:100] + "..." if len(comment.content) > 100 else comment.content
     notification_message = f"Employee '{current_user.name}' has commented on feedback #{feedback.id}: \"{comment_preview}\""
-    crud.create_notification(db, user_id=feedback.manager_id, message=notification_message)
+    notifications.dispatcher.dispatch(
+        db, notification_message, user_ids=[feedback.manager_id],
+        digest_key=f"feedback:{feedback.id}:comments",
+        digest_message=f"{{count}} new comments on feedback #{feedback.id}"
+    )
+    
+    db_comment = crud.create_comment(db, comment, current_user.id)
     
     # Format response
     return {
@@ -326,7 +546,7 @@ def create_comment(comment: schemas.CommentCreate, current_user: models.User = D
     }
 
 @app.get("/comments/feedback/{feedback_id}", response_model=List[schemas.CommentResponse])
-def get_comments_for_feedback(feedback_id: int, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
+def get_comments_for_feedback(feedback_id: int, response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
     # Verify the feedback exists and user has access
     feedback = crud.get_feedback_by_id(db, feedback_id)
     if not feedback:
@@ -338,12 +558,12 @@ def get_comments_for_feedback(feedback_id: int, current_user: models.User = Depe
     if current_user.role == schemas.RoleEnum.manager and feedback.manager_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    comments = crud.get_comments_for_feedback(db, feedback_id)
+    comments = _page(response, crud.get_comments_for_feedback(db, feedback_id, page))
     
     # Format response
     response_comments = []
     for comment in comments:
-        employee = crud.get_user_by_id(db, comment.employee_id)
+        employee = comment.employee
         response_comments.append({
             "id": comment.id,
             "feedback_id": comment.feedback_id,
@@ -362,14 +582,14 @@ def update_comment(comment_id: int, updates: schemas.CommentUpdate, current_user
     if not comment or comment.employee_id != current_user.id:
         raise HTTPException(status_code=404, detail="Comment not found or not authorized")
     
-    updated_comment = crud.update_comment(db, comment, updates)
-    
     # Send notification to the manager about the comment update
     feedback = crud.get_feedback_by_id(db, comment.feedback_id)
     if feedback:
         comment_preview = updates.content[:100] + "..." if len(updates.content) > 100 else updates.content
         notification_message = f"Employee '{current_user.name}' has updated their comment on feedback #{feedback.id}: \"{comment_preview}\""
-        crud.create_notification(db, user_id=feedback.manager_id, message=notification_message)
+        notifications.dispatcher.dispatch(db, notification_message, user_ids=[feedback.manager_id])
+    
+    updated_comment = crud.update_comment(db, comment, updates)
     
     # Format response
     return {
@@ -391,27 +611,26 @@ def delete_comment(comment_id: int, current_user: models.User = Depends(deps.get
     # Get feedback info before deleting the comment
     feedback = crud.get_feedback_by_id(db, comment.feedback_id)
     
+    # Send notification to the manager about the comment deletion; dropped with
+    # the transaction if the delete does not go through
+    if feedback:
+        notification_message = f"Employee '{current_user.name}' has deleted their comment on feedback #{feedback.id}."
+        notifications.dispatcher.dispatch(db, notification_message, user_ids=[feedback.manager_id])
+    
     success = crud.delete_comment(db, comment_id, current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Comment not found or not authorized")
     
-    # Send notification to the manager about the comment deletion
-    if feedback:
-        notification_message = f"Employee '{current_user.name}' has deleted their comment on feedback #{feedback.id}."
-        crud.create_notification(db, user_id=feedback.manager_id, message=notification_message)
-    
     return {"message": "Comment deleted successfully"}
 
 # --- Announcement Endpoints ---
 @app.post("/announcements/", response_model=schemas.AnnouncementResponse)
 def create_announcement(announcement: schemas.AnnouncementCreate, current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
-    db_announcement = crud.create_announcement(db, announcement, manager_id=current_user.id)
+    # Notify the team; the job commits together with the announcement
+    notification_message = f"New announcement from {current_user.name}: {announcement.title}"
+    notifications.dispatcher.dispatch(db, notification_message, team_of=current_user.id)
     
-    # Send notifications to all team members about the new announcement
-    team_members = db.query(models.User).filter(models.User.manager_id == current_user.id).all()
-    for member in team_members:
-        notification_message = f"New announcement from {current_user.name}: {announcement.title}"
-        crud.create_notification(db, user_id=member.id, message=notification_message)
+    db_announcement = crud.create_announcement(db, announcement, manager_id=current_user.id)
     
     # Format response
     return {
@@ -426,8 +645,8 @@ def create_announcement(announcement: schemas.AnnouncementCreate, current_user:
     }
 
 @app.get("/announcements/team", response_model=List[schemas.AnnouncementResponse])
-def get_team_announcements(current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
-    announcements = crud.get_announcements_for_team(db, current_user.id)
+def get_team_announcements(response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
+    announcements = _page(response, crud.get_announcements_for_team(db, current_user.id, page))
     
     # Format response
     response_announcements = []
@@ -446,13 +665,13 @@ def get_team_announcements(current_user: models.User = Depends(deps.get_current_
     return response_announcements
 
 @app.get("/announcements/my", response_model=List[schemas.AnnouncementResponse])
-def get_my_announcements(current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
-    announcements = crud.get_announcements_for_employee(db, current_user.id)
+def get_my_announcements(response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
+    announcements = _page(response, crud.get_announcements_for_employee(db, current_user.id, page))
     
     # Format response
     response_announcements = []
     for announcement in announcements:
-        manager = crud.get_user_by_id(db, announcement.manager_id)
+        manager = announcement.manager
         response_announcements.append({
             "id": announcement.id,
             "manager_id": announcement.manager_id,
@@ -499,14 +718,12 @@ def update_announcement(announcement_id: int, updates: schemas.AnnouncementUpdat
     if not announcement or announcement.manager_id != current_user.id:
         raise HTTPException(status_code=404, detail="Announcement not found or not authorized")
     
-    updated_announcement = crud.update_announcement(db, announcement, updates)
-    
     # Send notifications to team members if the announcement was updated
     if "title" in updates.dict(exclude_unset=True) or "content" in updates.dict(exclude_unset=True):
-        team_members = db.query(models.User).filter(models.User.manager_id == current_user.id).all()
-        for member in team_members:
-            notification_message = f"Announcement updated by {current_user.name}: {updated_announcement.title}"
-            crud.create_notification(db, user_id=member.id, message=notification_message)
+        notification_message = f"Announcement updated by {current_user.name}: {updates.title or announcement.title}"
+        notifications.dispatcher.dispatch(db, notification_message, team_of=current_user.id)
+    
+    updated_announcement = crud.update_announcement(db, announcement, updates)
     
     return {
         "id": updated_announcement.id,
@@ -533,10 +750,6 @@ def delete_announcement(announcement_id: int, current_user: models.User = Depend
 
 # --- Document Endpoints ---
 
-# Create uploads directory if it doesn't exist
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
 @app.post("/documents/upload", response_model=schemas.DocumentResponse)
 async def upload_document(
     file: UploadFile = File(...),
@@ -550,39 +763,31 @@ async def upload_document(
     if not file.content_type == "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Validate file size (max 10MB)
-    if file.size > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File size must be less than 10MB")
-    
-    # Create unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{current_user.id}_{timestamp}_{file.filename}"
-    file_path = UPLOAD_DIR / filename
-    
-    # Save file
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to save file")
+    # Stage the file; checks size and signature as it copies. Storage is keyed
+    # by content, so the name is only what downloads are offered as
+    filename = files.safe_filename(file.filename)
+    stored = await files.stage_upload(file, blobs.blob_dir())
     
     # Create document record
     document_data = {
         "title": title,
         "description": description,
         "filename": filename,
-        "file_path": str(file_path),
-        "file_size": file.size,
+        "upload": stored,
         "mime_type": file.content_type,
         "is_public": is_public
     }
     
-    db_document = crud.create_document(db, document_data, current_user.id)
-    
-    # Send notification to manager if document is public
-    if is_public and current_user.manager_id:
-        notification_message = f"Employee '{current_user.name}' has uploaded a new document: {title}"
-        crud.create_notification(db, user_id=current_user.manager_id, message=notification_message)
+    try:
+        await blobs.upload(stored)
+        # Send notification to manager if document is public; it commits with the document
+        if is_public and current_user.manager_id:
+            notification_message = f"Employee '{current_user.name}' has uploaded a new document: {title}"
+            await run_in_threadpool(notifications.dispatcher.dispatch, db, notification_message,
+                                    user_ids=[current_user.manager_id])
+        db_document = await run_in_threadpool(crud.create_document, db, document_data, current_user.id)
+    finally:
+        files.discard(stored)
     
     return {
         "id": db_document.id,
@@ -599,8 +804,8 @@ async def upload_document(
     }
 
 @app.get("/documents/my", response_model=List[schemas.DocumentResponse])
-def get_my_documents(current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
-    documents = crud.get_documents_for_employee(db, current_user.id)
+def get_my_documents(response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
+    documents = _page(response, crud.get_documents_for_employee(db, current_user.id, page))
     
     response_documents = []
     for document in documents:
@@ -621,12 +826,12 @@ def get_my_documents(current_user: models.User = Depends(deps.get_current_employ
     return response_documents
 
 @app.get("/documents/team", response_model=List[schemas.DocumentResponse])
-def get_team_documents(current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
-    documents = crud.get_public_documents_for_team(db, current_user.id)
+def get_team_documents(response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
+    documents = _page(response, crud.get_public_documents_for_team(db, current_user.id, page))
     
     response_documents = []
     for document in documents:
-        employee = crud.get_user_by_id(db, document.employee_id)
+        employee = document.employee
         response_documents.append({
             "id": document.id,
             "employee_id": document.employee_id,
@@ -676,7 +881,7 @@ def get_document(document_id: int, current_user: models.User = Depends(deps.get_
     }
 
 @app.get("/documents/{document_id}/download")
-def download_document(document_id: int, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
+def download_document(document_id: int, request: Request, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
     document = crud.get_document_by_id(db, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -692,33 +897,9 @@ def download_document(document_id: int, current_user: models.User = Depends(deps
         if not employee or employee.manager_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to download this document")
     
-    # Check if file exists
-    file_path = Path(document.file_path)
-    if not file_path.exists():
-        print(f"File not found: {file_path}")
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    try:
-        # Read file content
-        with open(file_path, "rb") as file:
-            content = file.read()
-        
-        if not content:
-            raise HTTPException(status_code=404, detail="File is empty")
-        
-        print(f"File read successfully: {file_path}, size: {len(content)} bytes")
-        
-        return StreamingResponse(
-            io.BytesIO(content),
-            media_type=document.mime_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={document.filename}",
-                "Content-Length": str(len(content))
-            }
-        )
-    except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to read file")
+    # The body streams for as long as the client reads; hand the pooled connection back first
+    db.close()
+    return storage.download(request, document.file_path, document.filename, document.mime_type)
 
 @app.patch("/documents/{document_id}", response_model=schemas.DocumentResponse)
 def update_document(document_id: int, updates: schemas.DocumentUpdate, current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
@@ -726,12 +907,12 @@ def update_document(document_id: int, updates: schemas.DocumentUpdate, current_u
     if not document or document.employee_id != current_user.id:
         raise HTTPException(status_code=404, detail="Document not found or not authorized")
     
-    updated_document = crud.update_document(db, document, updates)
-    
     # Send notification to manager if document is now public
     if updates.is_public and not document.is_public and current_user.manager_id:
-        notification_message = f"Employee '{current_user.name}' has made their document public: {updated_document.title}"
-        crud.create_notification(db, user_id=current_user.manager_id, message=notification_message)
+        notification_message = f"Employee '{current_user.name}' has made their document public: {updates.title or document.title}"
+        notifications.dispatcher.dispatch(db, notification_message, user_ids=[current_user.manager_id])
+    
+    updated_document = crud.update_document(db, document, updates)
     
     return {
         "id": updated_document.id,
@@ -753,9 +934,9 @@ def delete_document(document_id: int, current_user: models.User = Depends(deps.g
     if not document or document.employee_id != current_user.id:
         raise HTTPException(status_code=404, detail="Document not found or not authorized")
     
-    # Delete file from filesystem
+    # Files uploaded before the blob store belong to this row alone; crud releases blobs
     file_path = Path(document.file_path)
-    if file_path.exists():
+    if document.blob_sha256 is None and file_path.exists():
         try:
             file_path.unlink()
         except Exception as e:
@@ -783,26 +964,6 @@ async def upload_assignment(
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="File type not allowed")
     
-    # Validate file size (10MB limit)
-    if file.size > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB")
-    
-    # Create uploads directory if it doesn't exist
-    upload_dir = Path("uploads/assignments")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{timestamp}_{file.filename}"
-    file_path = upload_dir / filename
-    
-    # Save file
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
-    
     # Parse due date if provided
     parsed_due_date = None
     if due_date:
@@ -811,24 +972,29 @@ async def upload_assignment(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid due date format")
     
+    # Stage the file; checks size and signature as it copies. Storage is keyed
+    # by content, so the name is only what downloads are offered as
+    filename = files.safe_filename(file.filename)
+    stored = await files.stage_upload(file, blobs.blob_dir())
+    
     # Create assignment record
     assignment_data = {
         "title": title,
         "description": description,
         "filename": filename,
-        "file_path": str(file_path),
-        "file_size": file.size,
+        "upload": stored,
         "mime_type": file.content_type,
         "due_date": parsed_due_date
     }
     
-    db_assignment = crud.create_assignment(db, assignment_data, current_user.id)
-    
-    # Create notifications for all employees in the team
-    employees = crud.get_employees_by_manager(db, current_user.id)
-    for employee in employees:
-        notification_message = f"New assignment uploaded: '{title}'"
-        crud.create_notification(db, user_id=employee.id, message=notification_message)
+    try:
+        await blobs.upload(stored)
+        # Notify all employees in the team; the job commits with the assignment
+        await run_in_threadpool(notifications.dispatcher.dispatch, db, f"New assignment uploaded: '{title}'",
+                                team_of=current_user.id)
+        db_assignment = await run_in_threadpool(crud.create_assignment, db, assignment_data, current_user.id)
+    finally:
+        files.discard(stored)
     
     return {
         "id": db_assignment.id,
@@ -847,14 +1013,11 @@ async def upload_assignment(
     }
 
 @app.get("/assignments/team", response_model=List[schemas.AssignmentResponse])
-def get_team_assignments(current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
-    assignments = crud.get_assignments_for_team(db, current_user.id)
+def get_team_assignments(response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
+    assignments = _page(response, crud.get_assignments_with_submission_counts(db, current_user.id, page))
     
     response_assignments = []
-    for assignment in assignments:
-        # Count submissions for this assignment
-        submissions = crud.get_submissions_for_assignment(db, assignment.id)
-        
+    for assignment, submission_count in assignments:
         response_assignments.append({
             "id": assignment.id,
             "manager_id": assignment.manager_id,
@@ -868,18 +1031,18 @@ def get_team_assignments(current_user: models.User = Depends(deps.get_current_ma
             "created_at": assignment.created_at,
             "updated_at": assignment.updated_at,
             "is_active": assignment.is_active,
-            "submission_count": len(submissions)
+            "submission_count": submission_count
         })
     
     return response_assignments
 
 @app.get("/assignments/my", response_model=List[schemas.AssignmentResponse])
-def get_my_assignments(current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
-    assignments = crud.get_assignments_for_employee(db, current_user.id)
+def get_my_assignments(response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
+    assignments = _page(response, crud.get_assignments_for_employee(db, current_user.id, page))
     
     response_assignments = []
     for assignment in assignments:
-        manager = crud.get_user_by_id(db, assignment.manager_id)
+        manager = assignment.manager
         response_assignments.append({
             "id": assignment.id,
             "manager_id": assignment.manager_id,
@@ -913,7 +1076,7 @@ def get_assignment(assignment_id: int, current_user: models.User = Depends(deps.
             raise HTTPException(status_code=403, detail="Not authorized to view this assignment")
     
     manager = crud.get_user_by_id(db, assignment.manager_id)
-    submissions = crud.get_submissions_for_assignment(db, assignment.id)
+    is_manager = current_user.role == schemas.RoleEnum.manager
     
     return {
         "id": assignment.id,
@@ -928,11 +1091,11 @@ def get_assignment(assignment_id: int, current_user: models.User = Depends(deps.
         "created_at": assignment.created_at,
         "updated_at": assignment.updated_at,
         "is_active": assignment.is_active,
-        "submission_count": len(submissions) if current_user.role == schemas.RoleEnum.manager else 0
+        "submission_count": crud.count_submissions(db, assignment.id) if is_manager else 0
     }
 
 @app.get("/assignments/{assignment_id}/download")
-def download_assignment(assignment_id: int, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
+def download_assignment(assignment_id: int, request: Request, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
     assignment = crud.get_assignment_by_id(db, assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
@@ -945,25 +1108,9 @@ def download_assignment(assignment_id: int, current_user: models.User = Depends(
         if assignment.manager_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to download this assignment")
     
-    # Check if file exists
-    file_path = Path(assignment.file_path)
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    try:
-        with open(file_path, "rb") as file:
-            content = file.read()
-        
-        return StreamingResponse(
-            io.BytesIO(content),
-            media_type=assignment.mime_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={assignment.filename}",
-                "Content-Length": str(len(content))
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to read file")
+    # The body streams for as long as the client reads; hand the pooled connection back first
+    db.close()
+    return storage.download(request, assignment.file_path, assignment.filename, assignment.mime_type)
 
 @app.patch("/assignments/{assignment_id}", response_model=schemas.AssignmentResponse)
 def update_assignment(assignment_id: int, updates: schemas.AssignmentUpdate, current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
@@ -973,7 +1120,6 @@ def update_assignment(assignment_id: int, updates: schemas.AssignmentUpdate, cur
     
     updated_assignment = crud.update_assignment(db, assignment, updates)
     manager = crud.get_user_by_id(db, assignment.manager_id)
-    submissions = crud.get_submissions_for_assignment(db, assignment.id)
     
     return {
         "id": updated_assignment.id,
@@ -988,7 +1134,7 @@ def update_assignment(assignment_id: int, updates: schemas.AssignmentUpdate, cur
         "created_at": updated_assignment.created_at,
         "updated_at": updated_assignment.updated_at,
         "is_active": updated_assignment.is_active,
-        "submission_count": len(submissions)
+        "submission_count": crud.count_submissions(db, assignment.id)
     }
 
 @app.delete("/assignments/{assignment_id}")
@@ -997,9 +1143,9 @@ def delete_assignment(assignment_id: int, current_user: models.User = Depends(de
     if not assignment or assignment.manager_id != current_user.id:
         raise HTTPException(status_code=404, detail="Assignment not found or not authorized")
     
-    # Delete file from filesystem
+    # Files uploaded before the blob store belong to this row alone; crud releases blobs
     file_path = Path(assignment.file_path)
-    if file_path.exists():
+    if assignment.blob_sha256 is None and file_path.exists():
         try:
             file_path.unlink()
         except Exception as e:
@@ -1027,12 +1173,9 @@ async def upload_submission(
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail="File type not allowed")
     
-    # Validate file size (10MB limit)
-    if file.size > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB")
-    
-    # Verify assignment exists and employee has access
-    assignment = crud.get_assignment_by_id(db, assignment_id)
+    # Verify assignment exists and employee has access; this handler is async,
+    # so queries go through the thread pool like the insert below
+    assignment = await run_in_threadpool(crud.get_assignment_by_id, db, assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
@@ -1040,25 +1183,15 @@ async def upload_submission(
         raise HTTPException(status_code=403, detail="Not authorized to submit to this assignment")
     
     # Check if employee already submitted
-    existing_submission = crud.get_submission_by_employee_and_assignment(db, current_user.id, assignment_id)
+    existing_submission = await run_in_threadpool(crud.get_submission_by_employee_and_assignment,
+                                                  db, current_user.id, assignment_id)
     if existing_submission:
         raise HTTPException(status_code=400, detail="You have already submitted for this assignment")
     
-    # Create uploads directory if it doesn't exist
-    upload_dir = Path("uploads/submissions")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Generate unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{timestamp}_{file.filename}"
-    file_path = upload_dir / filename
-    
-    # Save file
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    # Stage the file; checks size and signature as it copies. Storage is keyed
+    # by content, so the name is only what downloads are offered as
+    filename = files.safe_filename(file.filename)
+    stored = await files.stage_upload(file, blobs.blob_dir())
     
     # Create submission record
     submission_data = {
@@ -1066,16 +1199,19 @@ async def upload_submission(
         "title": title,
         "description": description,
         "filename": filename,
-        "file_path": str(file_path),
-        "file_size": file.size,
+        "upload": stored,
         "mime_type": file.content_type
     }
     
-    db_submission = crud.create_submission(db, submission_data, current_user.id)
-    
-    # Create notification for manager
-    notification_message = f"Employee '{current_user.name}' has submitted work for assignment: '{assignment.title}'"
-    crud.create_notification(db, user_id=assignment.manager_id, message=notification_message)
+    try:
+        await blobs.upload(stored)
+        # Notify the manager; the job commits with the submission
+        notification_message = f"Employee '{current_user.name}' has submitted work for assignment: '{assignment.title}'"
+        await run_in_threadpool(notifications.dispatcher.dispatch, db, notification_message,
+                                user_ids=[assignment.manager_id])
+        db_submission = await run_in_threadpool(crud.create_submission, db, submission_data, current_user.id)
+    finally:
+        files.discard(stored)
     
     return {
         "id": db_submission.id,
@@ -1092,17 +1228,17 @@ async def upload_submission(
     }
 
 @app.get("/submissions/assignment/{assignment_id}", response_model=List[schemas.SubmissionResponse])
-def get_submissions_for_assignment(assignment_id: int, current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
+def get_submissions_for_assignment(assignment_id: int, response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_manager), db: Session = Depends(database.get_db)):
     # Verify assignment exists and manager has access
     assignment = crud.get_assignment_by_id(db, assignment_id)
     if not assignment or assignment.manager_id != current_user.id:
         raise HTTPException(status_code=404, detail="Assignment not found or not authorized")
     
-    submissions = crud.get_submissions_for_assignment(db, assignment_id)
+    submissions = _page(response, crud.get_submissions_for_assignment(db, assignment_id, page))
     
     response_submissions = []
     for submission in submissions:
-        employee = crud.get_user_by_id(db, submission.employee_id)
+        employee = submission.employee
         response_submissions.append({
             "id": submission.id,
             "assignment_id": submission.assignment_id,
@@ -1120,8 +1256,8 @@ def get_submissions_for_assignment(assignment_id: int, current_user: models.User
     return response_submissions
 
 @app.get("/submissions/my", response_model=List[schemas.SubmissionResponse])
-def get_my_submissions(current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
-    submissions = crud.get_submissions_by_employee(db, current_user.id)
+def get_my_submissions(response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
+    submissions = _page(response, crud.get_submissions_by_employee(db, current_user.id, page))
     
     response_submissions = []
     for submission in submissions:
@@ -1172,7 +1308,7 @@ def get_submission(submission_id: int, current_user: models.User = Depends(deps.
     }
 
 @app.get("/submissions/{submission_id}/download")
-def download_submission(submission_id: int, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
+def download_submission(submission_id: int, request: Request, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
     submission = crud.get_submission_by_id(db, submission_id)
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
@@ -1186,25 +1322,9 @@ def download_submission(submission_id: int, current_user: models.User = Depends(
         if not assignment or assignment.manager_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to download this submission")
     
-    # Check if file exists
-    file_path = Path(submission.file_path)
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    try:
-        with open(file_path, "rb") as file:
-            content = file.read()
-        
-        return StreamingResponse(
-            io.BytesIO(content),
-            media_type=submission.mime_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={submission.filename}",
-                "Content-Length": str(len(content))
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to read file")
+    # The body streams for as long as the client reads; hand the pooled connection back first
+    db.close()
+    return storage.download(request, submission.file_path, submission.filename, submission.mime_type)
 
 @app.patch("/submissions/{submission_id}", response_model=schemas.SubmissionResponse)
 def update_submission(submission_id: int, updates: schemas.SubmissionUpdate, current_user: models.User = Depends(deps.get_current_employee), db: Session = Depends(database.get_db)):
@@ -1235,9 +1355,9 @@ def delete_submission(submission_id: int, current_user: models.User = Depends(de
     if not submission or submission.employee_id != current_user.id:
         raise HTTPException(status_code=404, detail="Submission not found or not authorized")
     
-    # Delete file from filesystem
+    # Files uploaded before the blob store belong to this row alone; crud releases blobs
     file_path = Path(submission.file_path)
-    if file_path.exists():
+    if submission.blob_sha256 is None and file_path.exists():
         try:
             file_path.unlink()
         except Exception as e:
@@ -1267,26 +1387,27 @@ def create_assignment_comment(comment: schemas.AssignmentCommentCreate, current_
         if current_user.id != assignment.manager_id:
             raise HTTPException(status_code=403, detail="Not authorized to comment on this assignment")
     
-    # Create the comment
-    db_comment = crud.create_assignment_comment(db, comment, current_user.id)
-    
-    # Create notifications for team members
+    # Create notifications for team members, committed together with the comment;
+    # a busy thread folds into one digest per recipient
+    digest = {
+        "digest_key": f"assignment:{assignment.id}:comments",
+        "digest_message": f"{{count}} new comments on assignment '{assignment.title}'",
+    }
     if current_user.role == schemas.RoleEnum.employee:
-        # If employee commented, notify manager and other team members
-        manager = crud.get_user_by_id(db, assignment.manager_id)
-        if manager:
-            crud.create_notification(db, manager.id, f"New comment on assignment '{assignment.title}' by {current_user.name}")
-        
-        # Notify other team members
-        team_members = crud.get_employees_by_manager(db, assignment.manager_id)
-        for member in team_members:
-            if member.id != current_user.id:  # Don't notify self
-                crud.create_notification(db, member.id, f"New comment on assignment '{assignment.title}' by {current_user.name}")
+        # If employee commented, notify manager and other team members (but not self)
+        notifications.dispatcher.dispatch(
+            db, f"New comment on assignment '{assignment.title}' by {current_user.name}",
+            user_ids=[assignment.manager_id], team_of=assignment.manager_id, exclude=[current_user.id], **digest
+        )
     else:
         # If manager commented, notify all team members
-        team_members = crud.get_employees_by_manager(db, current_user.id)
-        for member in team_members:
-            crud.create_notification(db, member.id, f"Manager {current_user.name} commented on assignment '{assignment.title}'")
+        notifications.dispatcher.dispatch(
+            db, f"Manager {current_user.name} commented on assignment '{assignment.title}'",
+            team_of=current_user.id, **digest
+        )
+    
+    # Create the comment
+    db_comment = crud.create_assignment_comment(db, comment, current_user.id)
     
     # Return comment with user name
     return {
@@ -1300,7 +1421,7 @@ def create_assignment_comment(comment: schemas.AssignmentCommentCreate, current_
     }
 
 @app.get("/assignment-comments/assignment/{assignment_id}", response_model=List[schemas.AssignmentCommentResponse])
-def get_comments_for_assignment(assignment_id: int, current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
+def get_comments_for_assignment(assignment_id: int, response: Response, page: pagination.PageRequest = Depends(deps.get_page), current_user: models.User = Depends(deps.get_current_user), db: Session = Depends(database.get_db)):
     # Verify assignment exists and user has access
     assignment = crud.get_assignment_by_id(db, assignment_id)
     if not assignment:
@@ -1315,10 +1436,10 @@ def get_comments_for_assignment(assignment_id: int, current_user: models.User =
             raise HTTPException(status_code=403, detail="Not authorized to view this assignment")
     
     # Get comments with employee names
-    comments = crud.get_comments_for_assignment(db, assignment_id)
+    comments = _page(response, crud.get_comments_for_assignment(db, assignment_id, page))
     result = []
     for comment in comments:
-        employee = crud.get_user_by_id(db, comment.employee_id)
+        employee = comment.employee
         result.append({
             "id": comment.id,
             "assignment_id": comment.assignment_id,
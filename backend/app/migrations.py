@@ -0,0 +1,311 @@
+"""Versioned schema migrations.
+
+New tables are still created by `Base.metadata.create_all`; migrations carry the
+changes create_all cannot make on an existing database (new indexes, new
+columns, backfills). Each migration runs once and is recorded in the
+`schema_migrations` table. Steps are not wrapped in a single transaction, since
+concurrent index builds and batched backfills must commit as they go, so every
+step has to be safe to re-run.
+
+Usage (from backend/):
+    python -m app.migrations upgrade   # apply pending migrations
+    python -m app.migrations status    # list applied / pending migrations
+
+`database.init_db()` also runs `upgrade` on startup unless AUTO_MIGRATE=false.
+"""
+
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+
+# Arbitrary key shared by every worker so only one of them migrates at a time
+POSTGRES_LOCK_KEY = 804_221_001
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[["MigrationContext"], None]
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, name: str):
+    """Register the decorated function as migration `version`."""
+    def decorator(fn):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return decorator
+
+def model_index(name: str) -> Index:
+    """Look up an index declared on the models by name."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(f"No index named {name} on the models")
+
+class MigrationContext:
+    """Online-friendly, idempotent schema operations for migrations."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+    def has_table(self, table_name: str) -> bool:
+        return inspect(self.engine).has_table(table_name)
+
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        return any(c["name"] == column_name for c in inspect(self.engine).get_columns(table_name))
+
+    def create_index(self, index: Index):
+        """Create `index` if it does not exist. On PostgreSQL the index is
+        built CONCURRENTLY so writes to the table are not blocked."""
+        if not self.is_postgres:
+            index.create(bind=self.engine, checkfirst=True)
+            return
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # A failed concurrent build leaves an INVALID index behind that
+            # IF NOT EXISTS would otherwise treat as done
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": index.name}).first()
+            if invalid:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+            ddl = CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect)
+            statement = str(ddl).replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1) \
+                                .replace("CREATE UNIQUE INDEX", "CREATE UNIQUE INDEX CONCURRENTLY", 1)
+            conn.execute(text(statement))
+
+    def drop_index(self, index_name: str):
+        if self.is_postgres:
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"'))
+        else:
+            with self.engine.begin() as conn:
+                conn.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+
+    def add_column(self, table_name: str, column: Column):
+        """Add `column` to an existing table unless it is already there.
+        Give new NOT NULL columns a server_default so existing rows are valid."""
+        if self.has_column(table_name, column.name):
+            return
+        table = Table(table_name, MetaData(), column)
+        spec = CreateColumn(table.c[column.name]).compile(dialect=self.engine.dialect)
+        with self.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {spec}"))
+
+    def backfill(self, table_name: str, set_clause: str, where: Optional[str] = None,
+                 batch_size: Optional[int] = None, params: Optional[dict] = None) -> int:
+        """Run `UPDATE table_name SET set_clause` in primary key ranges of
+        `batch_size`, committing after each batch so no lock is held for long.
+        Returns the number of rows updated."""
+        batch_size = batch_size or BACKFILL_BATCH_SIZE
+        with self.engine.connect() as conn:
+            low, high = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {table_name}")).one()
+        if low is None:
+            return 0
+
+        statement = f"UPDATE {table_name} SET {set_clause} WHERE id >= :batch_start AND id < :batch_end"
+        if where:
+            statement += f" AND ({where})"
+        updated = 0
+        for start in range(low, high + 1, batch_size):
+            with self.engine.begin() as conn:
+                result = conn.execute(text(statement), {**(params or {}), "batch_start": start, "batch_end": start + batch_size})
+                updated += result.rowcount
+        return updated
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": POSTGRES_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": POSTGRES_LOCK_KEY})
+
+def applied_versions(engine: Engine) -> set:
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to `target` (default: all). Returns the
+    versions that were applied."""
+    applied_now = []
+    with _migration_lock(engine):
+        applied = applied_versions(engine)
+        context = MigrationContext(engine)
+        for m in MIGRATIONS:
+            if m.version in applied or (target is not None and m.version > target):
+                continue
+            logger.info("Applying migration %04d_%s", m.version, m.name)
+            m.apply(context)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(schema_migrations.insert().values(version=m.version, name=m.name))
+            except IntegrityError:
+                # Another SQLite worker finished the same (idempotent) migration first
+                pass
+            applied_now.append(m.version)
+    return applied_now
+
+# --- Migrations ---
+
+@migration(1, "query_indexes")
+def create_query_indexes(ctx: MigrationContext):
+    for name in (
+        "ix_users_manager_id_role",
+        "ix_feedbacks_employee_id",
+        "ix_feedbacks_manager_id",
+        "ix_peer_feedbacks_to_employee_id",
+        "ix_comments_feedback_id_created_at",
+        "ix_notifications_user_id_created_at",
+        "ix_announcements_manager_id_is_active_created_at",
+        "ix_documents_employee_id_created_at",
+        "ix_assignments_manager_id_is_active_created_at",
+        "ix_submissions_assignment_id_submitted_at",
+        "ix_submissions_employee_id_assignment_id",
+        "ix_assignment_comments_assignment_id_created_at",
+    ):
+        ctx.create_index(model_index(name))
+
+@migration(2, "notification_keyset_indexes")
+def create_notification_keyset_indexes(ctx: MigrationContext):
+    # Rebuild the feed index with id as the tie-breaker for (created_at, id) cursors
+    ctx.drop_index("ix_notifications_user_id_created_at")
+    ctx.create_index(model_index("ix_notifications_user_id_created_at"))
+    ctx.create_index(model_index("ix_notifications_user_id_is_read_created_at"))
+
+@migration(3, "user_unread_notification_count")
+def add_unread_notification_count(ctx: MigrationContext):
+    ctx.add_column("users", Column("unread_notification_count", Integer, nullable=False, server_default="0"))
+    ctx.backfill("users", "unread_notification_count = ("
+                          "SELECT COUNT(*) FROM notifications "
+                          "WHERE notifications.user_id = users.id AND NOT notifications.is_read)")
+
+@migration(4, "notification_digests")
+def add_notification_digests(ctx: MigrationContext):
+    ctx.add_column("notifications", Column("digest_key", String, nullable=True))
+    ctx.add_column("notifications", Column("event_count", Integer, nullable=False, server_default="1"))
+    ctx.create_index(model_index("ix_notifications_digest_key_user_id"))
+
+@migration(5, "feedback_dashboard_index")
+def create_feedback_dashboard_index(ctx: MigrationContext):
+    ctx.create_index(model_index("ix_feedbacks_manager_id_created_at_sentiment"))
+
+@migration(6, "feedback_sentiment_rollup")
+def backfill_feedback_sentiment_rollup(ctx: MigrationContext):
+    # The table itself comes from create_all; fill it from feedbacks written before it existed
+    from .rollups import rebuild_sentiment_rollup
+
+    with ctx.engine.connect() as conn:
+        populated = conn.execute(text("SELECT 1 FROM feedback_sentiment_daily LIMIT 1")).first()
+    if not populated:
+        rebuild_sentiment_rollup(ctx.engine)
+
+@migration(7, "feedback_timeline_index")
+def create_feedback_timeline_index(ctx: MigrationContext):
+    ctx.create_index(model_index("ix_feedbacks_employee_id_created_at"))
+
+@migration(8, "team_stats")
+def backfill_team_stats(ctx: MigrationContext):
+    # Same as 0006: the table comes from create_all, its rows from the source tables
+    from .rollups import rebuild_team_stats
+
+    with ctx.engine.connect() as conn:
+        populated = conn.execute(text("SELECT 1 FROM team_stats LIMIT 1")).first()
+    if not populated:
+        rebuild_team_stats(ctx.engine)
+
+@migration(9, "peer_feedback_list_index")
+def create_peer_feedback_list_index(ctx: MigrationContext):
+    # Received peer feedback is now read a page at a time, newest first
+    ctx.create_index(model_index("ix_peer_feedbacks_to_employee_id_created_at"))
+
+# Lists keyset-paginated on these columns; Timestamp binds them without fractional seconds
+LIST_TIMESTAMP_COLUMNS = [
+    ("peer_feedbacks", "created_at"), ("comments", "created_at"), ("announcements", "created_at"),
+    ("documents", "created_at"), ("assignments", "created_at"), ("submissions", "submitted_at"),
+    ("assignment_comments", "created_at"),
+]
+
+@migration(10, "list_timestamp_format")
+def normalize_list_timestamps(ctx: MigrationContext):
+    # Only SQLite stores text; trim any value written with fractional seconds so
+    # it compares equal to a cursor bound in the Timestamp format
+    if ctx.is_postgres:
+        return
+    for table_name, column in LIST_TIMESTAMP_COLUMNS:
+        if ctx.has_table(table_name):
+            ctx.backfill(table_name, f"{column} = substr({column}, 1, 19)", where=f"length({column}) > 19")
+
+@migration(11, "upload_blobs")
+def add_upload_blob_references(ctx: MigrationContext):
+    # The blobs table comes from create_all. Existing rows keep their own file
+    # and a null reference; `python -m app.blobs` counts only blob-backed rows
+    for table_name in ("documents", "assignments", "submissions"):
+        if ctx.has_table(table_name):
+            ctx.add_column(table_name, Column("blob_sha256", String(64), nullable=True))
+
+@migration(12, "notification_archive_digests")
+def add_notification_archive_digests(ctx: MigrationContext):
+    # Archived digests keep their key and the number of events they stood for
+    if ctx.has_table("notification_archive"):
+        ctx.add_column("notification_archive", Column("digest_key", String, nullable=True))
+        ctx.add_column("notification_archive", Column("event_count", Integer, nullable=False, server_default="1"))
+
+def main(argv=None):
+    from .database import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "upgrade"
+    if command == "upgrade":
+        Base.metadata.create_all(bind=engine)
+        applied = upgrade(engine)
+        print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+    elif command == "status":
+        applied = applied_versions(engine)
+        for m in MIGRATIONS:
+            state = "applied" if m.version in applied else "pending"
+            print(f"{m.version:04d}_{m.name:<40}{state}")
+    else:
+        print(f"Unknown command: {command} (expected 'upgrade' or 'status')")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
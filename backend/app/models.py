@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Boolean, func, Table
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Enum, Text, Boolean, func, Table, Index
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship, declarative_base
 import enum
 
 Base = declarative_base()
 
+# SQLite's CURRENT_TIMESTAMP has no fractional seconds, so bind datetimes in the
+# same format; otherwise keyset comparisons against stored values never match.
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class RoleEnum(str, enum.Enum):
     manager = "manager"
     employee = "employee"
@@ -21,6 +29,12 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     role = Column(Enum(RoleEnum), nullable=False)
     manager_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Denormalized for the notification badge; kept in step by crud in the same transaction
+    unread_notification_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_users_manager_id_role", manager_id, role),
+    )
 
     team_members = relationship("User", remote_side=[id])
     feedback_given = relationship("Feedback", back_populates="manager", foreign_keys='Feedback.manager_id')
@@ -31,31 +45,65 @@ class User(Base):
 class Feedback(Base):
     __tablename__ = "feedbacks"
     id = Column(Integer, primary_key=True, index=True)
-    employee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    manager_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    employee_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    manager_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     strengths = Column(Text, nullable=False)
     areas_to_improve = Column(Text, nullable=False)
     sentiment = Column(Enum(SentimentEnum), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     acknowledged = Column(Boolean, default=False)
     is_anonymous = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # Covers the dashboard's per-sentiment counts over a date range
+        Index("ix_feedbacks_manager_id_created_at_sentiment", manager_id, created_at, sentiment),
+        # The employee timeline, newest first with id as the keyset tie-breaker
+        Index("ix_feedbacks_employee_id_created_at", employee_id, created_at.desc(), id.desc()),
+    )
+
     employee = relationship("User", foreign_keys=[employee_id], back_populates="feedback_received")
     manager = relationship("User", foreign_keys=[manager_id], back_populates="feedback_given")
 
+class FeedbackSentimentDaily(Base):
+    """Rollup of feedback per manager, UTC day and sentiment for the trend charts.
+    Kept in step by crud.create_feedback / update_feedback; rebuilt by app.rollups."""
+    __tablename__ = "feedback_sentiment_daily"
+    manager_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    sentiment = Column(Enum(SentimentEnum), primary_key=True)
+    feedback_count = Column(Integer, nullable=False, default=0)
+
+class TeamStats(Base):
+    """Dashboard counters per manager, kept in step by the crud write functions.
+    `python -m app.rollups check` compares them with the raw tables."""
+    __tablename__ = "team_stats"
+    manager_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    team_size = Column(Integer, nullable=False, default=0, server_default="0")
+    feedback_positive = Column(Integer, nullable=False, default=0, server_default="0")
+    feedback_neutral = Column(Integer, nullable=False, default=0, server_default="0")
+    feedback_negative = Column(Integer, nullable=False, default=0, server_default="0")
+    unacknowledged_feedback = Column(Integer, nullable=False, default=0, server_default="0")
+    active_assignments = Column(Integer, nullable=False, default=0, server_default="0")
+    # Submissions to assignments that are still active; pending ones are derived from this
+    active_assignment_submissions = Column(Integer, nullable=False, default=0, server_default="0")
+
 class PeerFeedback(Base):
     __tablename__ = "peer_feedbacks"
     id = Column(Integer, primary_key=True, index=True)
     from_employee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    to_employee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    to_employee_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     strengths = Column(Text, nullable=False)
     areas_to_improve = Column(Text, nullable=False)
     sentiment = Column(Enum(SentimentEnum), nullable=False)
     is_anonymous = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     acknowledged = Column(Boolean, default=False)
 
+    __table_args__ = (
+        Index("ix_peer_feedbacks_to_employee_id_created_at", to_employee_id, created_at),
+    )
+
     from_employee = relationship("User", foreign_keys=[from_employee_id])
     to_employee = relationship("User", foreign_keys=[to_employee_id])
 
@@ -65,9 +113,13 @@ class Comment(Base):
     feedback_id = Column(Integer, ForeignKey("feedbacks.id"), nullable=False)
     employee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_comments_feedback_id_created_at", feedback_id, created_at),
+    )
+
     feedback = relationship("Feedback")
     employee = relationship("User")
 
@@ -77,22 +129,77 @@ class Notification(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     message = Column(String, nullable=False)
     is_read = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    # Set on digest notifications, e.g. "assignment:12:comments"; repeated events
+    # with the same key fold into one unread row that counts them
+    digest_key = Column(String, nullable=True)
+    event_count = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        Index("ix_notifications_user_id_created_at", user_id, created_at.desc(), id.desc()),
+        Index("ix_notifications_user_id_is_read_created_at", user_id, is_read, created_at.desc(), id.desc()),
+        Index("ix_notifications_digest_key_user_id", digest_key, user_id),
+    )
 
     user = relationship("User")
 
+class NotificationJob(Base):
+    """Durable record of a queued notification fan-out, replayed after a restart"""
+    __tablename__ = "notification_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    payload = Column(Text, nullable=False)  # JSON: message, user_ids, team_of, exclude
+    status = Column(String, nullable=False, default="pending")  # pending / delivered / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_notification_jobs_status_id", status, id),
+    )
+
+class NotificationArchive(Base):
+    """Read notifications moved out of `notifications` by the retention job"""
+    __tablename__ = "notification_archive"
+    id = Column(Integer, primary_key=True)  # id the row had in notifications
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    message = Column(String, nullable=False)
+    is_read = Column(Boolean, nullable=False, default=True)
+    created_at = Column(Timestamp)
+    digest_key = Column(String, nullable=True)
+    event_count = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_notification_archive_user_id_created_at", user_id, created_at),
+    )
+
 class Announcement(Base):
     __tablename__ = "announcements"
     id = Column(Integer, primary_key=True, index=True)
     manager_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     is_active = Column(Boolean, default=True)
 
+    __table_args__ = (
+        Index("ix_announcements_manager_id_is_active_created_at", manager_id, is_active, created_at),
+    )
+
     manager = relationship("User", foreign_keys=[manager_id])
 
+class Blob(Base):
+    """One stored file, named by the SHA-256 of its content and shared by every
+    document, assignment and submission that uploaded the same bytes.
+    crud keeps ref_count in step; the file goes when the last reference does."""
+    __tablename__ = "blobs"
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Document(Base):
     __tablename__ = "documents"
     id = Column(Integer, primary_key=True, index=True)
@@ -103,10 +210,16 @@ class Document(Base):
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String, nullable=False, default="application/pdf")
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Null for files uploaded before the blob store, which live at file_path on their own
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)
+    created_at = Column(Timestamp, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     is_public = Column(Boolean, default=False)
 
+    __table_args__ = (
+        Index("ix_documents_employee_id_created_at", employee_id, created_at),
+    )
+
     employee = relationship("User", foreign_keys=[employee_id])
 
 class Assignment(Base):
@@ -119,11 +232,16 @@ class Assignment(Base):
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String, nullable=False, default="application/pdf")
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)
+    created_at = Column(Timestamp, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     due_date = Column(DateTime(timezone=True), nullable=True)
     is_active = Column(Boolean, default=True)
 
+    __table_args__ = (
+        Index("ix_assignments_manager_id_is_active_created_at", manager_id, is_active, created_at),
+    )
+
     manager = relationship("User", foreign_keys=[manager_id])
     submissions = relationship("Submission", back_populates="assignment")
     comments = relationship("AssignmentComment", back_populates="assignment")
@@ -139,9 +257,15 @@ class Submission(Base):
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String, nullable=False, default="application/pdf")
-    submitted_at = Column(DateTime(timezone=True), server_default=func.now())
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)
+    submitted_at = Column(Timestamp, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_submissions_assignment_id_submitted_at", assignment_id, submitted_at),
+        Index("ix_submissions_employee_id_assignment_id", employee_id, assignment_id),
+    )
+
     assignment = relationship("Assignment", back_populates="submissions")
     employee = relationship("User", foreign_keys=[employee_id])
 
@@ -151,8 +275,12 @@ class AssignmentComment(Base):
     assignment_id = Column(Integer, ForeignKey("assignments.id"), nullable=False)
     employee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_assignment_comments_assignment_id_created_at", assignment_id, created_at),
+    )
+
     assignment = relationship("Assignment", back_populates="comments")
     employee = relationship("User", foreign_keys=[employee_id])
\ No newline at end of file
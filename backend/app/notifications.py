@@ -0,0 +1,280 @@
+"""Background notification delivery.
+
+Endpoints hand notification fan-out to `dispatcher.dispatch()` before they
+commit their own write, and the job is staged on the same session. In
+"background" mode (the default) the job goes onto an in-process queue once
+that session commits, and a worker thread resolves recipients and writes the
+notifications with retries, so request latency no longer grows with team size.
+With NOTIFICATION_DURABLE_JOBS=true each job is also stored in the
+`notification_jobs` table in the endpoint's transaction, so it exists exactly
+when the write it announces does, and is replayed on startup if the process
+died before delivering it. "sync" mode writes the notifications in the
+request's transaction instead, which the tests use. A rolled back transaction
+takes its jobs with it.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta, timezone
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import crud, models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_DELIVERY = os.getenv("NOTIFICATION_DELIVERY", "background")  # background / sync
+NOTIFICATION_DURABLE_JOBS = os.getenv("NOTIFICATION_DURABLE_JOBS", "false").lower() in ("1", "true", "yes")
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_BACKOFF = float(os.getenv("NOTIFICATION_RETRY_BACKOFF", "0.5"))  # seconds, doubled per attempt
+# Events sharing a digest key within this window fold into one notification; 0 disables
+NOTIFICATION_DIGEST_WINDOW_MINUTES = float(os.getenv("NOTIFICATION_DIGEST_WINDOW_MINUTES", "30"))
+
+@dataclass
+class FanOutJob:
+    message: str
+    user_ids: List[int] = field(default_factory=list)
+    team_of: Optional[int] = None  # also notify every employee of this manager
+    exclude: List[int] = field(default_factory=list)
+    digest_key: Optional[str] = None
+    digest_message: Optional[str] = None  # used once a digest counts more than one event; "{count}" is filled in
+    job_id: Optional[int] = None  # notification_jobs row, when durable
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+
+    def to_payload(self) -> str:
+        return json.dumps({"message": self.message, "user_ids": self.user_ids,
+                           "team_of": self.team_of, "exclude": self.exclude,
+                           "digest_key": self.digest_key, "digest_message": self.digest_message})
+
+    @classmethod
+    def from_record(cls, record: models.NotificationJob) -> "FanOutJob":
+        payload = json.loads(record.payload)
+        created_at = record.created_at
+        if created_at is None:
+            enqueued_at = time.time()
+        else:
+            # SQLite hands back naive UTC; .timestamp() would read it as local time
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            enqueued_at = created_at.timestamp()
+        return cls(job_id=record.id, attempts=record.attempts, enqueued_at=enqueued_at, **payload)
+
+    def recipients(self, db: Session) -> List[int]:
+        user_ids = list(self.user_ids)
+        if self.team_of is not None:
+            user_ids += crud.get_employee_ids_by_manager(db, self.team_of)
+        excluded = set(self.exclude)
+        return [user_id for user_id in user_ids if user_id not in excluded]
+
+    def write(self, db: Session, digest_window: Optional[timedelta], commit: bool = True) -> int:
+        return crud.create_notifications(db, self.recipients(db), self.message, commit=commit,
+                                         digest_key=self.digest_key, digest_message=self.digest_message,
+                                         digest_window=digest_window if self.digest_key else None)
+
+class NotificationDispatcher:
+    def __init__(self, session_factory: Callable[[], Session], mode: str = NOTIFICATION_DELIVERY,
+                 durable: bool = NOTIFICATION_DURABLE_JOBS, max_attempts: int = NOTIFICATION_MAX_ATTEMPTS,
+                 retry_backoff: float = NOTIFICATION_RETRY_BACKOFF,
+                 digest_window_minutes: float = NOTIFICATION_DIGEST_WINDOW_MINUTES):
+        self.session_factory = session_factory
+        self.mode = mode
+        self.durable = durable
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.digest_window = timedelta(minutes=digest_window_minutes) if digest_window_minutes > 0 else None
+        self._queue: "queue.Queue[Optional[FanOutJob]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pending_retries = 0
+        self._stats = {"enqueued": 0, "delivered": 0, "notifications_written": 0,
+                       "retried": 0, "failed": 0, "recovered": 0}
+        self._lag_total = 0.0
+        self._lag_last = 0.0
+        self._lag_max = 0.0
+
+    # --- Producer side ---
+
+    def dispatch(self, db: Session, message: str, user_ids: Iterable[int] = (),
+                 team_of: Optional[int] = None, exclude: Iterable[int] = (),
+                 digest_key: Optional[str] = None, digest_message: Optional[str] = None) -> None:
+        """Notify `user_ids` plus, if given, every employee of manager `team_of`.
+        Pass a `digest_key` for high-frequency events (comments) so repeats
+        within the digest window update one notification per recipient.
+
+        Nothing is committed here: the job is part of `db`'s transaction and
+        only reaches the worker once the caller commits."""
+        job = FanOutJob(message=message, user_ids=list(user_ids), team_of=team_of, exclude=list(exclude),
+                        digest_key=digest_key, digest_message=digest_message)
+        if self.mode == "sync" or not self.running:
+            job.write(db, self.digest_window, commit=False)
+            return
+        if self.durable:
+            record = models.NotificationJob(payload=job.to_payload())
+            db.add(record)
+            db.flush()
+            job.job_id = record.id
+        db.info.setdefault(_PENDING_KEY, []).append((self, job))
+
+    def _enqueue(self, job: FanOutJob):
+        self._count("enqueued")
+        self._queue.put(job)
+
+    # --- Lifecycle ---
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self):
+        if self.mode == "sync" or self.running:
+            return
+        self._worker = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._worker.start()
+        if self.durable:
+            self._recover()
+
+    def stop(self, timeout: float = 10.0):
+        """Deliver what is already queued, then stop the worker."""
+        if not self.running:
+            return
+        self.join(timeout)
+        self._queue.put(None)
+        self._worker.join(timeout)
+        self._worker = None
+
+    def join(self, timeout: float = 10.0) -> bool:
+        """Wait until the queue is empty and no retries are scheduled."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                idle = self._queue.unfinished_tasks == 0 and self._pending_retries == 0
+            if idle:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _recover(self):
+        db = self.session_factory()
+        try:
+            records = db.query(models.NotificationJob).filter(
+                models.NotificationJob.status == "pending"
+            ).order_by(models.NotificationJob.id).all()
+            for record in records:
+                self._count("recovered")
+                self._queue.put(FanOutJob.from_record(record))
+        finally:
+            db.close()
+
+    # --- Worker side ---
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._deliver(job)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, job: FanOutJob):
+        job.attempts += 1
+        db = self.session_factory()
+        try:
+            if job.job_id is not None:
+                # Claim the job so a second worker replaying it on startup skips it
+                claimed = db.query(models.NotificationJob).filter(
+                    models.NotificationJob.id == job.job_id,
+                    models.NotificationJob.status == "pending",
+                ).update({"status": "delivered", "attempts": job.attempts}, synchronize_session=False)
+                if not claimed:
+                    db.rollback()
+                    return
+            written = job.write(db, self.digest_window, commit=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._retry_or_fail(db, job, e)
+            return
+        finally:
+            db.close()
+
+        lag = time.time() - job.enqueued_at
+        with self._lock:
+            self._stats["delivered"] += 1
+            self._stats["notifications_written"] += written
+            self._lag_last = lag
+            self._lag_total += lag
+            self._lag_max = max(self._lag_max, lag)
+
+    def _retry_or_fail(self, db: Session, job: FanOutJob, error: Exception):
+        if job.attempts < self.max_attempts:
+            self._count("retried")
+            with self._lock:
+                self._pending_retries += 1
+            delay = self.retry_backoff * (2 ** (job.attempts - 1))
+            timer = threading.Timer(delay, self._requeue, args=(job,))
+            timer.daemon = True
+            timer.start()
+            return
+
+        logger.error("Notification job %s failed after %d attempts: %s", job.job_id, job.attempts, error)
+        self._count("failed")
+        if job.job_id is not None:
+            try:
+                db.query(models.NotificationJob).filter(models.NotificationJob.id == job.job_id).update(
+                    {"status": "failed", "attempts": job.attempts, "last_error": str(error)},
+                    synchronize_session=False,
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+
+    def _requeue(self, job: FanOutJob):
+        self._queue.put(job)
+        with self._lock:
+            self._pending_retries -= 1
+
+    # --- Metrics ---
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            delivered = self._stats["delivered"]
+            return {
+                "mode": self.mode,
+                "durable": self.durable,
+                "queue_depth": self._queue.qsize(),
+                "pending_retries": self._pending_retries,
+                **self._stats,
+                "delivery_lag_ms": {
+                    "last": round(self._lag_last * 1000, 1),
+                    "avg": round(self._lag_total / delivered * 1000, 1) if delivered else 0.0,
+                    "max": round(self._lag_max * 1000, 1),
+                },
+            }
+
+_PENDING_KEY = "pending_notification_jobs"
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_pending(session: Session):
+    for owner, job in session.info.pop(_PENDING_KEY, []):
+        owner._enqueue(job)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+dispatcher = NotificationDispatcher(SessionLocal)
@@ -0,0 +1,145 @@
+"""Opaque keyset cursors and the shared page/filter layer for list endpoints.
+
+A cursor encodes the sort key of the last row on a page, e.g. (created_at, id),
+so the next page is a range scan on the index instead of an OFFSET.
+
+List functions in crud describe what they allow with a ListSpec and hand their
+query to `paginate`, which applies filters, the time range, the sort order and
+the cursor in SQL and fetches one row more than the page to learn whether
+another page follows.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Boolean, Enum, Integer, and_, or_
+from sqlalchemy.engine import Row
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class PageError(ValueError):
+    """A cursor, sort or filter the list does not accept; endpoints answer 400"""
+
+def encode_cursor(created_at: Any, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat() if isinstance(created_at, datetime) else created_at, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_key(cursor: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return value, int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise PageError("Invalid cursor") from e
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Inverse of encode_cursor for (created_at, id) cursors. Raises ValueError for malformed cursors."""
+    created_at, row_id = _decode_key(cursor)
+    try:
+        return (datetime.fromisoformat(created_at) if created_at else None), row_id
+    except (TypeError, ValueError) as e:
+        raise PageError("Invalid cursor") from e
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored in UTC; a naive query value is taken to be UTC already
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+@dataclass
+class PageRequest:
+    """What the client asked for: `sort` is a field name, prefixed with '-' for
+    descending; `since`/`until` bound the list's time field as [since, until);
+    `filters` are candidate exact matches on field names, of which each list
+    applies the ones it filters on."""
+    limit: Optional[int] = DEFAULT_PAGE_SIZE
+    cursor: Optional[str] = None
+    sort: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    filters: Dict[str, str] = field(default_factory=dict)
+
+@dataclass
+class ListSpec:
+    """What a list allows. `sorts` maps field names to non-null columns and
+    `filters` maps field names to columns; `time` is the column since/until apply
+    to and `id` breaks ties so every row has a unique position."""
+    id: Any
+    time: Any
+    default_sort: str
+    sorts: Dict[str, Any]
+    filters: Dict[str, Any] = field(default_factory=dict)
+
+class Page(list):
+    """The rows of one page; `next_cursor` is None on the last page"""
+    next_cursor: Optional[str] = None
+
+def _filter_value(column, raw: str):
+    column_type = column.type
+    try:
+        if isinstance(column_type, Boolean):
+            lowered = raw.lower()
+            if lowered not in ("1", "true", "yes", "0", "false", "no"):
+                raise ValueError(raw)
+            return lowered in ("1", "true", "yes")
+        if isinstance(column_type, Enum) and column_type.enum_class is not None:
+            return column_type.enum_class(raw)
+        if isinstance(column_type, Integer):
+            return int(raw)
+    except ValueError as e:
+        raise PageError(f"Invalid value for filter '{column.key}': {raw}") from e
+    return raw
+
+def _sort_value(column, value):
+    if value is None:
+        raise PageError("Invalid cursor")
+    try:
+        if column.type.python_type is datetime:
+            return datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise PageError("Invalid cursor") from e
+    return value
+
+def paginate(query, page: Optional[PageRequest], spec: ListSpec) -> Page:
+    """Run `query` for one page. Without a PageRequest every row is returned
+    in the default order, for internal callers such as exports."""
+    page = page or PageRequest(limit=None)
+    sort = page.sort or spec.default_sort
+    descending = sort.startswith("-")
+    column = spec.sorts.get(sort.lstrip("-"))
+    if column is None:
+        raise PageError(f"Cannot sort by '{sort}'; use one of: {', '.join(sorted(spec.sorts))}")
+
+    for name, filter_column in spec.filters.items():
+        if name in page.filters:
+            query = query.filter(filter_column == _filter_value(filter_column, page.filters[name]))
+    if page.since is not None:
+        query = query.filter(spec.time >= as_utc(page.since))
+    if page.until is not None:
+        query = query.filter(spec.time < as_utc(page.until))
+
+    if page.cursor:
+        value, row_id = _decode_key(page.cursor)
+        value = _sort_value(column, value)
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, spec.id < row_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, spec.id > row_id)))
+    if descending:
+        query = query.order_by(column.desc(), spec.id.desc())
+    else:
+        query = query.order_by(column.asc(), spec.id.asc())
+
+    if page.limit is None:
+        return Page(query.all())
+    rows = query.limit(page.limit + 1).all()
+    result = Page(rows[:page.limit])
+    if len(rows) > page.limit:
+        last = result[-1]
+        entity = last[0] if isinstance(last, Row) else last
+        result.next_cursor = encode_cursor(getattr(entity, column.key), getattr(entity, spec.id.key))
+    return result
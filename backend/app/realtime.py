@@ -0,0 +1,145 @@
+"""In-process pub/sub hub for pushing notifications over Server-Sent Events.
+
+crud queues an event on the session for every notification it inserts; the
+events are published to the hub only after that session commits, so
+subscribers never see rows that were rolled back. Each SSE connection owns a
+bounded asyncio queue on its event loop; publishing is thread-safe because
+notifications are written from request threads and the background dispatcher.
+
+The hub is per process. Clients connected to another worker catch up through
+Last-Event-ID replay and the unread-count poll.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+SUBSCRIBER_QUEUE_SIZE = 100
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATION_STREAM_HEARTBEAT", "15"))
+STREAM_REPLAY_LIMIT = 500  # most rows replayed for one Last-Event-ID
+
+class Subscription:
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Set when the client fell too far behind; it should reconnect and replay
+        self.overflowed = False
+
+    def deliver(self, payload: dict):
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+class NotificationHub:
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        return self.subscribe_from_thread(user_id, asyncio.get_running_loop())
+
+    def subscribe_from_thread(self, user_id: int, loop: asyncio.AbstractEventLoop) -> Subscription:
+        """Subscribe on behalf of `loop` from a worker thread."""
+        subscription = Subscription(user_id, loop)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: int, payload: dict):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, payload)
+            except RuntimeError:
+                # The subscriber's event loop has already shut down
+                self.unsubscribe(subscription)
+        self.published += 1
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscriptions.values())
+
+hub = NotificationHub()
+
+def notification_event(notification_id: int, user_id: int, message: str,
+                       created_at: Optional[datetime], is_read: bool = False,
+                       event_count: int = 1, replaces: Optional[int] = None) -> dict:
+    """`replaces` is set when this event updates a notification the client may
+    already list (a digest counting one more event; same id), so the client
+    swaps the old entry out instead of adding one."""
+    return {
+        "id": notification_id,
+        "user_id": user_id,
+        "message": message,
+        "is_read": is_read,
+        "event_count": event_count,
+        "created_at": created_at.isoformat() if created_at else None,
+        "replaces": replaces,
+    }
+
+def sse_frame(payload: dict) -> str:
+    return f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+
+async def event_stream(subscription: Subscription, replay: List[dict],
+                       is_disconnected: Callable[[], Awaitable[bool]],
+                       heartbeat: float = STREAM_HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+    """Yield SSE frames: the replayed rows first, then live events, with a
+    comment line every `heartbeat` seconds so proxies keep the connection open.
+    Ends when the client goes away or falls too far behind."""
+    # Subscribed before replaying, so a replayed row may also arrive live, once.
+    # Match on (id, event_count) rather than a high-water id: commits from
+    # concurrent requests can reach the hub out of id order, and a digest
+    # update keeps its id but raises event_count.
+    replayed = set()
+    try:
+        for payload in replay:
+            replayed.add((payload["id"], payload.get("event_count", 1)))
+            yield sse_frame(payload)
+        while not subscription.overflowed:
+            try:
+                payload = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            key = (payload["id"], payload.get("event_count", 1))
+            if key in replayed:
+                replayed.discard(key)
+                continue
+            yield sse_frame(payload)
+    finally:
+        hub.unsubscribe(subscription)
+
+_PENDING_KEY = "pending_notification_events"
+
+def publish_after_commit(db: Session, events: List[dict]):
+    """Queue `events` (dicts with a user_id) to be published once `db` commits."""
+    db.info.setdefault(_PENDING_KEY, []).extend(events)
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session):
+    for payload in session.info.pop(_PENDING_KEY, []):
+        hub.publish(payload["user_id"], payload)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop(_PENDING_KEY, None)
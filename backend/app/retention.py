@@ -0,0 +1,160 @@
+"""Notification retention.
+
+Read notifications older than NOTIFICATION_RETENTION_DAYS are moved out of the
+`notifications` table, either into `notification_archive` or into a gzipped
+JSON-lines export. Rows are moved in primary key batches with a commit per
+batch, so no lock is held for long and the job can be stopped and re-run at
+any point. Unread notifications are never touched, so the per-user unread
+counters stay correct. Afterwards the database is compacted (VACUUM on
+SQLite, VACUUM ANALYZE on PostgreSQL) and the space reclaimed is reported.
+
+Usage (from backend/):
+    python -m app.retention                        # archive to notification_archive
+    python -m app.retention --days 30 --export notifications-2024.jsonl.gz
+    python -m app.retention --dry-run              # only count what would move
+
+Run it from cron or a scheduled job; it is not started by the API.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+RETENTION_BATCH_SIZE = int(os.getenv("NOTIFICATION_RETENTION_BATCH_SIZE", "1000"))
+
+notifications = models.Notification.__table__
+archive = models.NotificationArchive.__table__
+
+@dataclass
+class RetentionReport:
+    cutoff: datetime
+    rows_moved: int = 0
+    batches: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    compacted: bool = False
+
+    @property
+    def bytes_reclaimed(self) -> int:
+        return max(self.bytes_before - self.bytes_after, 0)
+
+def storage_bytes(engine: Engine) -> int:
+    """Size of the whole SQLite database file, or of the notifications table
+    (with its indexes and TOAST) on PostgreSQL."""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            return conn.execute(text("SELECT pg_total_relation_size('notifications')")).scalar()
+        page_count = conn.execute(text("PRAGMA page_count")).scalar()
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+        return page_count * page_size
+
+def compact(engine: Engine):
+    """Give the space freed by deleted rows back to the filesystem (SQLite) or
+    mark it reusable and refresh planner statistics (PostgreSQL). Neither
+    command may run inside a transaction."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("VACUUM (ANALYZE) notifications"))
+        else:
+            conn.execute(text("VACUUM"))
+            # In WAL mode the rewritten pages sit in the -wal file until a checkpoint
+            conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+def _expired_batch(conn: Connection, cutoff: datetime, after_id: int, batch_size: int):
+    return conn.execute(
+        select(notifications)
+        .where(notifications.c.id > after_id, notifications.c.is_read.is_(True), notifications.c.created_at < cutoff)
+        .order_by(notifications.c.id)
+        .limit(batch_size)
+    ).mappings().all()
+
+def count_expired(engine: Engine, cutoff: datetime) -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(notifications)
+            .where(notifications.c.is_read.is_(True), notifications.c.created_at < cutoff)
+        ).scalar()
+
+def archive_notifications(engine: Engine, days: int = NOTIFICATION_RETENTION_DAYS,
+                          batch_size: int = RETENTION_BATCH_SIZE, export_path: Optional[str] = None,
+                          compact_after: bool = True, now: Optional[datetime] = None) -> RetentionReport:
+    """Move read notifications older than `days` out of the notifications table.
+    With `export_path` they are appended to a gzipped JSON-lines file instead
+    of the archive table."""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+    report = RetentionReport(cutoff=cutoff, bytes_before=storage_bytes(engine))
+    export = gzip.open(export_path, "at", encoding="utf-8") if export_path else None
+    after_id = 0
+    try:
+        while True:
+            with engine.begin() as conn:
+                rows = _expired_batch(conn, cutoff, after_id, batch_size)
+                if not rows:
+                    break
+                ids = [row["id"] for row in rows]
+                if export:
+                    for row in rows:
+                        export.write(json.dumps({**row, "created_at": row["created_at"].isoformat()
+                                                 if row["created_at"] else None}) + "\n")
+                    # Flush before the delete commits so a crash never loses rows
+                    export.flush()
+                else:
+                    conn.execute(insert(archive), [
+                        {"id": row["id"], "user_id": row["user_id"], "message": row["message"],
+                         "is_read": True, "created_at": row["created_at"],
+                         "digest_key": row["digest_key"], "event_count": row["event_count"]}
+                        for row in rows
+                    ])
+                conn.execute(notifications.delete().where(notifications.c.id.in_(ids)))
+            report.rows_moved += len(rows)
+            report.batches += 1
+            after_id = ids[-1]
+    finally:
+        if export:
+            export.close()
+
+    if compact_after and report.rows_moved:
+        compact(engine)
+        report.compacted = True
+    report.bytes_after = storage_bytes(engine)
+    return report
+
+def main(argv=None):
+    from .database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.retention", description="Archive old read notifications")
+    parser.add_argument("--days", type=int, default=NOTIFICATION_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    parser.add_argument("--export", metavar="PATH", help="write rows to a .jsonl.gz file instead of notification_archive")
+    parser.add_argument("--no-compact", action="store_true", help="skip VACUUM afterwards")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    models.Base.metadata.create_all(bind=engine)
+    if args.dry_run:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=args.days)
+        print(f"{count_expired(engine, cutoff)} read notification(s) older than {cutoff:%Y-%m-%d %H:%M} would be archived")
+        return 0
+
+    report = archive_notifications(engine, days=args.days, batch_size=args.batch_size,
+                                   export_path=args.export, compact_after=not args.no_compact)
+    destination = args.export or "notification_archive"
+    print(f"Moved {report.rows_moved} notification(s) older than {report.cutoff:%Y-%m-%d %H:%M} "
+          f"to {destination} in {report.batches} batch(es)")
+    print(f"Storage: {report.bytes_before:,} -> {report.bytes_after:,} bytes "
+          f"({report.bytes_reclaimed:,} reclaimed{'' if report.compacted else ', not compacted'})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
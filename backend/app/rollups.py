@@ -0,0 +1,163 @@
+"""Dashboard rollups.
+
+`feedback_sentiment_daily` holds feedback counts per manager, UTC day and
+sentiment; `team_stats` holds one row of dashboard counters per manager.
+crud keeps both current in the same transaction as each write. This module
+recomputes them from the source tables after a bulk import or a manual data
+fix, or to add them to an existing database (migrations 0006 and 0008 do that
+once), and `check` reports any counter that has drifted from the source.
+
+Usage (from backend/):
+    python -m app.rollups rebuild                  # every manager
+    python -m app.rollups rebuild --manager 12     # one manager
+    python -m app.rollups check                    # exit status 1 on drift
+    python -m app.rollups check --fix              # rebuild drifted managers
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import Date, case, cast, false, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+
+feedbacks = models.Feedback.__table__
+sentiment_daily = models.FeedbackSentimentDaily.__table__
+team_stats = models.TeamStats.__table__
+users = models.User.__table__
+assignments = models.Assignment.__table__
+submissions = models.Submission.__table__
+
+TEAM_STATS_COLUMNS = [column.name for column in team_stats.columns if column.name != "manager_id"]
+
+@dataclass
+class StatsDrift:
+    manager_id: int
+    column: str
+    stored: int
+    actual: int
+
+def _utc_day(engine: Engine, column):
+    if engine.dialect.name == "postgresql":
+        return cast(func.timezone("UTC", column), Date)
+    # SQLite stores UTC text; date() gives the 'YYYY-MM-DD' form the Date type reads
+    return func.date(column)
+
+def rebuild_sentiment_rollup(engine: Engine, manager_id: Optional[int] = None) -> int:
+    """Recompute the rollup from feedbacks in one transaction. Returns the
+    number of rollup rows written."""
+    day = _utc_day(engine, feedbacks.c.created_at)
+    source = select(
+        feedbacks.c.manager_id, day, feedbacks.c.sentiment, func.count()
+    ).group_by(feedbacks.c.manager_id, day, feedbacks.c.sentiment)
+    clear = sentiment_daily.delete()
+    if manager_id is not None:
+        source = source.where(feedbacks.c.manager_id == manager_id)
+        clear = clear.where(sentiment_daily.c.manager_id == manager_id)
+
+    with engine.begin() as conn:
+        conn.execute(clear)
+        result = conn.execute(insert(sentiment_daily).from_select(
+            ["manager_id", "day", "sentiment", "feedback_count"], source
+        ))
+        return result.rowcount
+
+def _count_team_stats(conn: Connection, manager_id: Optional[int] = None) -> Dict[int, Dict[str, int]]:
+    """team_stats rows as they should be, counted from the source tables"""
+    def scoped(query, column):
+        return query if manager_id is None else query.where(column == manager_id)
+
+    stats: Dict[int, Dict[str, int]] = {}
+    def row(manager):
+        return stats.setdefault(manager, dict.fromkeys(TEAM_STATS_COLUMNS, 0))
+
+    members = select(users.c.manager_id, func.count()).where(users.c.manager_id.is_not(None))
+    for manager, count in conn.execute(scoped(members, users.c.manager_id).group_by(users.c.manager_id)):
+        row(manager)["team_size"] = count
+
+    unacknowledged = func.sum(case((func.coalesce(feedbacks.c.acknowledged, false()) == false(), 1), else_=0))
+    by_sentiment = select(feedbacks.c.manager_id, feedbacks.c.sentiment, func.count(), unacknowledged)
+    by_sentiment = scoped(by_sentiment, feedbacks.c.manager_id).group_by(feedbacks.c.manager_id, feedbacks.c.sentiment)
+    for manager, sentiment, count, open_count in conn.execute(by_sentiment):
+        row(manager)[f"feedback_{models.SentimentEnum(sentiment).value}"] = count
+        row(manager)["unacknowledged_feedback"] += open_count or 0
+
+    active = select(assignments.c.manager_id, func.count()).where(assignments.c.is_active == True)
+    for manager, count in conn.execute(scoped(active, assignments.c.manager_id).group_by(assignments.c.manager_id)):
+        row(manager)["active_assignments"] = count
+
+    received = select(assignments.c.manager_id, func.count()).select_from(
+        submissions.join(assignments, submissions.c.assignment_id == assignments.c.id)
+    ).where(assignments.c.is_active == True)
+    for manager, count in conn.execute(scoped(received, assignments.c.manager_id).group_by(assignments.c.manager_id)):
+        row(manager)["active_assignment_submissions"] = count
+    return stats
+
+def rebuild_team_stats(engine: Engine, manager_id: Optional[int] = None) -> int:
+    """Recompute team_stats from the source tables in one transaction. Returns
+    the number of rows written."""
+    clear = team_stats.delete()
+    if manager_id is not None:
+        clear = clear.where(team_stats.c.manager_id == manager_id)
+    with engine.begin() as conn:
+        stats = _count_team_stats(conn, manager_id)
+        conn.execute(clear)
+        if stats:
+            conn.execute(insert(team_stats), [{"manager_id": manager, **values} for manager, values in stats.items()])
+        return len(stats)
+
+def check_team_stats(engine: Engine, manager_id: Optional[int] = None) -> List[StatsDrift]:
+    """Compare team_stats with the source tables; a missing row counts as all zeros"""
+    stored_query = select(team_stats)
+    if manager_id is not None:
+        stored_query = stored_query.where(team_stats.c.manager_id == manager_id)
+    with engine.connect() as conn:
+        actual = _count_team_stats(conn, manager_id)
+        stored = {r.manager_id: r._mapping for r in conn.execute(stored_query)}
+
+    drift = []
+    for manager in sorted(set(actual) | set(stored)):
+        for column in TEAM_STATS_COLUMNS:
+            stored_value = stored[manager][column] if manager in stored else 0
+            actual_value = actual.get(manager, {}).get(column, 0)
+            if stored_value != actual_value:
+                drift.append(StatsDrift(manager, column, stored_value, actual_value))
+    return drift
+
+def main(argv=None):
+    from .database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.rollups", description="Rebuild dashboard rollups")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--manager", type=int, help="only rebuild or check this manager's rows")
+    parser.add_argument("--fix", action="store_true", help="with check: rebuild the managers that drifted")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    models.Base.metadata.create_all(bind=engine)
+    if args.command == "rebuild":
+        rows = rebuild_sentiment_rollup(engine, manager_id=args.manager)
+        print(f"Rebuilt feedback_sentiment_daily: {rows} row(s)")
+        rows = rebuild_team_stats(engine, manager_id=args.manager)
+        print(f"Rebuilt team_stats: {rows} row(s)")
+        return 0
+
+    drift = check_team_stats(engine, manager_id=args.manager)
+    for d in drift:
+        print(f"manager {d.manager_id}: {d.column} stored={d.stored} actual={d.actual}")
+    if not drift:
+        print("team_stats matches the source tables")
+        return 0
+    managers = sorted({d.manager_id for d in drift})
+    if not args.fix:
+        print(f"{len(drift)} drifted counter(s) across {len(managers)} manager(s); run with --fix to rebuild")
+        return 1
+    for manager in managers:
+        rebuild_team_stats(engine, manager_id=manager)
+    print(f"Rebuilt team_stats for {len(managers)} manager(s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
 from enum import Enum
-from datetime import datetime
+from datetime import date, datetime
 
 class RoleEnum(str, Enum):
     manager = "manager"
@@ -96,15 +96,49 @@ class TokenData(BaseModel):
     user_id: Optional[int] = None
     role: Optional[RoleEnum] = None
 
+class TrendBucketEnum(str, Enum):
+    day = "day"
+    week = "week"  # ISO weeks, starting Monday
+    month = "month"
+
+class SentimentTrendPoint(BaseModel):
+    period_start: date
+    positive: int = 0
+    neutral: int = 0
+    negative: int = 0
+
+class SentimentTrendResponse(BaseModel):
+    bucket: TrendBucketEnum
+    series: List[SentimentTrendPoint]
+
 class NotificationResponse(BaseModel):
     id: int
     message: str
     is_read: bool
+    event_count: int = 1  # > 1 for a digest of several events
     created_at: datetime
 
     class Config:
         orm_mode = True
 
+class UnreadCountResponse(BaseModel):
+    unread_count: int
+
+class NotificationBulkRead(BaseModel):
+    # Exactly one of these selects what to mark as read
+    all: bool = False
+    ids: Optional[List[int]] = None
+    # The newest notification the user has seen, as the X-Read-Cursor header of
+    # GET /notifications: it and everything older is marked, nothing newer
+    up_to_cursor: Optional[str] = None
+
+class NotificationBulkReadResponse(BaseModel):
+    updated: int
+
+class StreamTokenResponse(BaseModel):
+    token: str
+    expires_in: int
+
 class CommentBase(BaseModel):
     content: str
 
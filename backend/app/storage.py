@@ -0,0 +1,209 @@
+"""Where stored files live.
+
+`backend` is chosen by STORAGE_BACKEND when the app starts:
+
+- "local" (default) keeps files under UPLOAD_DIR, so every API worker needs
+  the same disk.
+- "s3" keeps them in an S3-compatible bucket (AWS S3, MinIO, ...), so
+  workers can run on any host behind a load balancer. Files go up as
+  multipart uploads through one pooled client per process. Downloads
+  redirect to a short-lived presigned URL by default, so file bytes never
+  pass through the API; with S3_PRESIGN_DOWNLOADS=false they are streamed
+  through instead.
+
+Uploads are always staged and hashed on local disk first (see `files`),
+because the blob key is the content's hash. A row's file_path records where
+its file went, a local path or s3://bucket/key, so rows written before a
+switch of backend keep being served from where they are.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from starlette.background import BackgroundTask
+from starlette.responses import RedirectResponse, Response, StreamingResponse
+
+from . import files
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # local / s3
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # e.g. http://minio:9000; unset for AWS
+S3_REGION = os.getenv("S3_REGION") or None
+S3_PRESIGN_DOWNLOADS = os.getenv("S3_PRESIGN_DOWNLOADS", "true").lower() in ("1", "true", "yes")
+S3_PRESIGN_EXPIRE_SECONDS = int(os.getenv("S3_PRESIGN_EXPIRE_SECONDS", "300"))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+S3_MULTIPART_CHUNK_SIZE = int(os.getenv("S3_MULTIPART_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+class Storage:
+    """A place to keep blobs. `upload` runs before the database transaction and
+    may be slow; `place` runs under the blob row lock and must be quick, so it
+    does no network I/O. `confirm` runs after the commit and `delete` only once
+    the blob row is gone, both outside any transaction."""
+
+    def owns(self, file_path: str) -> bool:
+        raise NotImplementedError
+
+    def upload(self, staged: files.StoredUpload, key: str):
+        """Copy a staged upload to `key` ahead of the transaction that references it"""
+
+    def place(self, staged: files.StoredUpload, key: str) -> str:
+        """Make sure `key` holds the upload and return the file_path to record for it"""
+        raise NotImplementedError
+
+    def confirm(self, staged: files.StoredUpload, key: str):
+        """Put the upload back at `key` if the blob was collected before its new reference committed"""
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def download(self, request: Request, file_path: str, filename: str, media_type: str) -> Response:
+        raise NotImplementedError
+
+class LocalStorage(Storage):
+    def path(self, key: str) -> Path:
+        return files.UPLOAD_DIR / key
+
+    def owns(self, file_path: str) -> bool:
+        return "://" not in file_path
+
+    def place(self, staged: files.StoredUpload, key: str) -> str:
+        target = self.path(key)
+        if target.exists():
+            # Keep the existing file (and so its ETag); the bytes are the same
+            files.discard(staged)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged.path, target)
+        return str(target)
+
+    def delete(self, key: str):
+        self.path(key).unlink(missing_ok=True)
+
+    def download(self, request: Request, file_path: str, filename: str, media_type: str) -> Response:
+        return files.file_response(request, file_path, filename, media_type)
+
+class S3Storage(Storage):
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 presign_downloads: bool = S3_PRESIGN_DOWNLOADS, presign_expire_seconds: int = S3_PRESIGN_EXPIRE_SECONDS,
+                 max_pool_connections: int = S3_MAX_POOL_CONNECTIONS, multipart_chunk_size: int = S3_MULTIPART_CHUNK_SIZE):
+        # Only needed with this backend, so a local-only install does not require boto3
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        if not bucket:
+            raise ValueError("S3_BUCKET is required with STORAGE_BACKEND=s3")
+        self.bucket = bucket
+        self.presign_downloads = presign_downloads
+        self.presign_expire_seconds = presign_expire_seconds
+        # boto3 clients are thread-safe; one per process shares its connection pool across requests
+        # SigV4 presigned URLs work with every region and with MinIO
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region, config=Config(
+            signature_version="s3v4", max_pool_connections=max_pool_connections,
+            retries={"max_attempts": 5, "mode": "standard"}))
+        # Files above one chunk go up as a multipart upload, streamed from the staged file
+        self.transfer = TransferConfig(multipart_threshold=multipart_chunk_size,
+                                       multipart_chunksize=multipart_chunk_size, max_concurrency=4)
+
+    @property
+    def prefix(self) -> str:
+        return f"s3://{self.bucket}/"
+
+    def owns(self, file_path: str) -> bool:
+        return file_path.startswith(self.prefix)
+
+    def _exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response["ResponseMetadata"]["HTTPStatusCode"] == 404:
+                return False
+            raise
+
+    def upload(self, staged: files.StoredUpload, key: str):
+        if not self._exists(key):
+            self.client.upload_file(str(staged.path), self.bucket, key, Config=self.transfer)
+
+    def place(self, staged: files.StoredUpload, key: str) -> str:
+        # Objects are content-addressed, so the one upload() sent is already right
+        return self.prefix + key
+
+    def confirm(self, staged: files.StoredUpload, key: str):
+        # The last reference may have been released and the object deleted
+        # between upload() and the commit; the staged file is still there
+        self.upload(staged, key)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def download(self, request: Request, file_path: str, filename: str, media_type: str) -> Response:
+        key = file_path[len(self.prefix):]
+        if self.presign_downloads:
+            url = self.client.generate_presigned_url("get_object", ExpiresIn=self.presign_expire_seconds, Params={
+                "Bucket": self.bucket, "Key": key,
+                "ResponseContentDisposition": files.content_disposition(filename),
+                "ResponseContentType": media_type,
+            })
+            return RedirectResponse(url, status_code=307, headers={"Cache-Control": "no-store"})
+        return self._proxy(request, key, filename, media_type)
+
+    def _proxy(self, request: Request, key: str, filename: str, media_type: str) -> Response:
+        from botocore.exceptions import ClientError
+
+        # S3 answers Range and If-None-Match itself; pass them on and relay the result
+        params = {"Bucket": self.bucket, "Key": key}
+        if "range" in request.headers:
+            params["Range"] = request.headers["range"]
+        if "if-none-match" in request.headers:
+            params["IfNoneMatch"] = request.headers["if-none-match"]
+        try:
+            obj = self.client.get_object(**params)
+        except ClientError as e:
+            status = e.response["ResponseMetadata"]["HTTPStatusCode"]
+            if status == 304:
+                return Response(status_code=304, headers={"ETag": request.headers["if-none-match"],
+                                                          "Cache-Control": files.CACHE_CONTROL})
+            if status == 416:
+                return Response(status_code=416)
+            if status == 404:
+                raise HTTPException(status_code=404, detail="File not found")
+            raise
+        headers = {
+            "Content-Length": str(obj["ContentLength"]),
+            "Content-Disposition": files.content_disposition(filename),
+            "Accept-Ranges": "bytes",
+            "ETag": obj["ETag"],
+            "Last-Modified": obj["LastModified"].strftime("%a, %d %b %Y %H:%M:%S GMT"),
+            "Cache-Control": files.CACHE_CONTROL,
+        }
+        if "ContentRange" in obj:
+            headers["Content-Range"] = obj["ContentRange"]
+        body = obj["Body"]
+        # A sync iterator, which StreamingResponse reads on the thread pool; closing
+        # the body hands its connection back to the pool if the client stops early
+        return StreamingResponse(body.iter_chunks(files.DownloadResponse.chunk_size), media_type=media_type,
+                                 status_code=206 if "ContentRange" in obj else 200, headers=headers,
+                                 background=BackgroundTask(body.close))
+
+LOCAL = LocalStorage()
+
+def build_backend(name: str = STORAGE_BACKEND) -> Storage:
+    if name == "local":
+        return LOCAL
+    if name == "s3":
+        return S3Storage(S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION)
+    raise ValueError(f"Unknown STORAGE_BACKEND {name!r}; expected 'local' or 's3'")
+
+backend = build_backend()
+
+def download(request: Request, file_path: str, filename: str, media_type: str) -> Response:
+    """Send a stored file from whichever storage its file_path names"""
+    for storage in (backend, LOCAL):
+        if storage.owns(file_path):
+            return storage.download(request, file_path, filename, media_type)
+    raise HTTPException(status_code=500, detail="File is kept in storage this server is not configured for")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark announcement creation latency against team size.
+
+Compares the old per-recipient fan-out (INSERT + COMMIT + REFRESH for every
+employee) with the batched path the notification dispatcher uses: one INSERT
+for all recipients and a single commit.
+
+Usage: python benchmarks/announcement_fanout.py [--sizes 10,50,200,1000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.database import build_engine
+
+def per_recipient_announcement(db, announcement, manager_id):
+    db_announcement = models.Announcement(manager_id=manager_id, title=announcement.title, content=announcement.content)
+    db.add(db_announcement)
+    db.commit()
+    db.refresh(db_announcement)
+    for employee in crud.get_employees_by_manager(db, manager_id):
+        crud.create_notification(db, employee.id, f"New announcement: '{announcement.title}'")
+    return db_announcement
+
+def bulk_announcement(db, announcement, manager_id):
+    db_announcement = crud.create_announcement(db, announcement, manager_id=manager_id)
+    employee_ids = crud.get_employee_ids_by_manager(db, manager_id)
+    crud.create_notifications(db, employee_ids, f"New announcement: '{announcement.title}'")
+    return db_announcement
+
+def seed_team(db, size):
+    manager = models.User(name="Manager", email="manager@example.com", password_hash="x", role=models.RoleEnum.manager)
+    db.add(manager)
+    db.commit()
+    db.add_all([
+        models.User(name=f"Employee {i}", email=f"employee{i}@example.com", password_hash="x",
+                    role=models.RoleEnum.employee, manager_id=manager.id)
+        for i in range(size)
+    ])
+    db.commit()
+    return manager.id
+
+def measure(create, size, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{tmp}/bench.db")
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        with Session() as db:
+            manager_id = seed_team(db, size)
+            timings = []
+            for i in range(repeat):
+                announcement = schemas.AnnouncementCreate(title=f"Update {i}", content="Benchmark")
+                start = time.perf_counter()
+                create(db, announcement, manager_id)
+                timings.append(time.perf_counter() - start)
+        engine.dispose()
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,50,200,1000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'team size':>10}{'per-recipient ms':>20}{'bulk ms':>12}{'speedup':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        old = measure(per_recipient_announcement, size, args.repeat)
+        new = measure(bulk_announcement, size, args.repeat)
+        print(f"{size:>10}{old:>20.1f}{new:>12.1f}{old / new:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
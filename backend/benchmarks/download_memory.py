@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for file downloads (GET /documents/{id}/download).
+
+Starts the API under uvicorn against a throwaway SQLite database and upload
+directory, then runs parallel downloads of one large PDF and reports the
+server's resident memory before and at its peak, plus download latency.
+A handler that buffers the file grows by roughly file size x concurrency;
+a streamed download stays near the idle footprint.
+
+Usage: python benchmarks/download_memory.py [--downloads 100] [--size-mb 10] [--port 8766]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, models
+from app.database import build_engine
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def seed(url, file_path, size):
+    with open(file_path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        f.write(os.urandom(size - 9))
+    engine = build_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        employee = models.User(name="Employee", email="employee@example.com", password_hash="x",
+                               role=models.RoleEnum.employee)
+        db.add(employee)
+        db.commit()
+        document = models.Document(employee_id=employee.id, title="Large", filename="large.pdf",
+                                   file_path=file_path, file_size=size)
+        db.add(document)
+        db.commit()
+        employee_id, document_id = employee.id, document.id
+    engine.dispose()
+    return employee_id, document_id
+
+def rss_kb(pid, field="VmRSS"):
+    # Linux only: VmRSS is current resident memory, VmHWM its high-water mark
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not reported for pid {pid}")
+
+async def wait_until_up(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(base_url + "/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+async def download(client, url, headers, latencies):
+    started = time.perf_counter()
+    received = 0
+    async with client.stream("GET", url, headers=headers) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            received += len(chunk)
+    latencies.append(time.perf_counter() - started)
+    return received
+
+async def sample_peak(pid, peak, stop):
+    while not stop.is_set():
+        peak[0] = max(peak[0], rss_kb(pid))
+        await asyncio.sleep(0.01)
+
+async def run(base_url, pid, document_id, employee_id, downloads, timeout):
+    url = f"{base_url}/documents/{document_id}/download"
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'user_id': employee_id})}"}
+    latencies = []
+    limits = httpx.Limits(max_connections=downloads, max_keepalive_connections=downloads)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(timeout), limits=limits) as client:
+        # One warm-up request so imports and the DB connection are not counted
+        await download(client, url, headers, [])
+        idle = rss_kb(pid)
+        peak, stop = [idle], asyncio.Event()
+        sampler = asyncio.create_task(sample_peak(pid, peak, stop))
+        started = time.perf_counter()
+        sizes = await asyncio.gather(*(download(client, url, headers, latencies) for _ in range(downloads)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+    return idle, peak[0], elapsed, sizes, sorted(latencies)
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--downloads", type=int, default=100)
+    parser.add_argument("--size-mb", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench.db"
+        employee_id, document_id = seed(url, os.path.join(tmp, "large.pdf"), size)
+        env = {**os.environ, "DATABASE_URL": url}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            asyncio.run(wait_until_up(base_url))
+            idle, peak, elapsed, sizes, latencies = asyncio.run(
+                run(base_url, server.pid, document_id, employee_id, args.downloads, args.timeout))
+        finally:
+            server.terminate()
+            server.wait()
+
+    complete = sum(1 for received in sizes if received == size)
+    print(f"downloads complete:  {complete}/{args.downloads} of {args.size_mb} MB in {elapsed:.1f}s "
+          f"({complete * args.size_mb / elapsed:.0f} MB/s)")
+    print(f"server RSS MB:       idle {idle / 1024:.0f}  peak {peak / 1024:.0f}  "
+          f"growth {(peak - idle) / 1024:.0f}")
+    print(f"latency ms:          p50 {percentile(latencies, 0.5):.0f}  "
+          f"p95 {percentile(latencies, 0.95):.0f}  max {latencies[-1] * 1000:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the manager dashboard query at a realistic feedback volume.
+
+Seeds one manager with a team and --feedbacks feedback rows (with full-size
+text columns), then compares the old approach (load every team member and
+every feedback as ORM objects and count in Python) with the SQL aggregates
+the endpoint now uses, with and without a date range.
+
+Usage: python benchmarks/manager_dashboard.py [--feedbacks 100000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import build_engine
+
+TEAM_SIZE = 50
+
+def seed(db, feedbacks):
+    manager = models.User(name="Manager", email="manager@example.com", password_hash="x", role=models.RoleEnum.manager)
+    db.add(manager)
+    db.commit()
+    db.execute(insert(models.User), [
+        {"name": f"Employee {i}", "email": f"employee{i}@example.com", "password_hash": "x",
+         "role": models.RoleEnum.employee, "manager_id": manager.id}
+        for i in range(TEAM_SIZE)
+    ])
+    employee_ids = crud.get_employee_ids_by_manager(db, manager.id)
+    rng = random.Random(42)
+    start = datetime(2023, 1, 1)
+    batch = []
+    for i in range(feedbacks):
+        batch.append({
+            "employee_id": rng.choice(employee_ids), "manager_id": manager.id,
+            "strengths": "Consistently strong delivery. " * 20,
+            "areas_to_improve": "Could share progress earlier. " * 20,
+            "sentiment": rng.choice(list(models.SentimentEnum)),
+            "created_at": start + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+        })
+        if len(batch) == 10000:
+            db.execute(insert(models.Feedback), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Feedback), batch)
+    db.commit()
+    return manager.id
+
+def python_counts(db, manager_id):
+    team = db.query(models.User).filter(models.User.manager_id == manager_id).all()
+    feedbacks = crud.get_feedback_for_manager(db, manager_id)
+    sentiment_counts = {s.value: 0 for s in models.SentimentEnum}
+    for fb in feedbacks:
+        sentiment_counts[fb.sentiment.value] += 1
+    return len(team), len(feedbacks), sentiment_counts
+
+def sql_counts(db, manager_id, start=None, end=None):
+    counts = crud.get_feedback_sentiment_counts(db, manager_id, start=start, end=end)
+    return crud.get_team_size(db, manager_id), sum(counts.values()), counts
+
+def measure(fn, db, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.expunge_all()
+        start = time.perf_counter()
+        result = fn(db)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--feedbacks", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{tmp}/bench.db")
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        with Session() as db:
+            manager_id = seed(db, args.feedbacks)
+            old_ms, old = measure(lambda db: python_counts(db, manager_id), db, args.repeat)
+            new_ms, new = measure(lambda db: sql_counts(db, manager_id), db, args.repeat)
+            assert old == new, (old, new)
+            month_ms, _ = measure(lambda db: sql_counts(db, manager_id, datetime(2024, 6, 1), datetime(2024, 7, 1)),
+                                  db, args.repeat)
+        engine.dispose()
+
+    print(f"{args.feedbacks} feedbacks, team of {TEAM_SIZE}")
+    print(f"{'ORM load + Python count':<30}{old_ms:>10.1f} ms")
+    print(f"{'SQL COUNT / GROUP BY':<30}{new_ms:>10.1f} ms  ({old_ms / new_ms:.0f}x)")
+    print(f"{'  one-month range':<30}{month_ms:>10.1f} ms")
+
+if __name__ == "__main__":
+    main()
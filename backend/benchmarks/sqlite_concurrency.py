@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark SQLite read/write concurrency with and without the WAL tuning profile.
+
+Runs a handful of writer threads inserting notifications (one commit each, like
+crud.create_notification) while reader threads list notifications, and reports
+throughput plus "database is locked" errors for each profile.
+
+Usage: python benchmarks/sqlite_concurrency.py [--seconds 5] [--writers 4] [--readers 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import build_engine
+
+def run_profile(tuned: bool, seconds: float, writers: int, readers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        # Default profile mirrors the old engine: rollback journal, 5s driver timeout
+        engine = build_engine(f"sqlite:///{tmp}/bench.db", sqlite_tuning=tuned)
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        with Session() as db:
+            user = models.User(name="Bench", email="bench@example.com", password_hash="x", role=models.RoleEnum.employee)
+            db.add(user)
+            db.commit()
+            user_id = user.id
+
+        stats = {"writes": 0, "reads": 0, "locked": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def writer():
+            while time.perf_counter() < deadline:
+                db = Session()
+                try:
+                    db.add(models.Notification(user_id=user_id, message="bench"))
+                    db.commit()
+                    key = "writes"
+                except OperationalError:
+                    db.rollback()
+                    key = "locked"
+                finally:
+                    db.close()
+                with lock:
+                    stats[key] += 1
+
+        def reader():
+            while time.perf_counter() < deadline:
+                db = Session()
+                try:
+                    db.query(models.Notification).filter(models.Notification.user_id == user_id).order_by(
+                        models.Notification.created_at.desc()).limit(50).all()
+                    key = "reads"
+                except OperationalError:
+                    key = "locked"
+                finally:
+                    db.close()
+                with lock:
+                    stats[key] += 1
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    stats["writes_per_sec"] = stats["writes"] / seconds
+    stats["reads_per_sec"] = stats["reads"] / seconds
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'writes/s':>12}{'reads/s':>12}{'locked':>10}")
+    for name, tuned in (("default", False), ("wal", True)):
+        stats = run_profile(tuned, args.seconds, args.writers, args.readers)
+        print(f"{name:<10}{stats['writes_per_sec']:>12.1f}{stats['reads_per_sec']:>12.1f}{stats['locked']:>10}")
+
+if __name__ == "__main__":
+    main()
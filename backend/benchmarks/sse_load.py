@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Load test for the notification stream (GET /notifications/stream).
+
+Starts the API under uvicorn against a throwaway SQLite database, connects
+one SSE client per employee, posts a team announcement and measures how long
+each subscriber waits for its event.
+
+Usage: python benchmarks/sse_load.py [--subscribers 2000] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, models
+from app.database import build_engine
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def seed(url, subscribers):
+    engine = build_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        manager = models.User(name="Manager", email="manager@example.com", password_hash="x", role=models.RoleEnum.manager)
+        db.add(manager)
+        db.commit()
+        db.add_all([
+            models.User(name=f"Employee {i}", email=f"employee{i}@example.com", password_hash="x",
+                        role=models.RoleEnum.employee, manager_id=manager.id)
+            for i in range(subscribers)
+        ])
+        db.commit()
+        manager_id = manager.id
+        employee_ids = [u.id for u in db.query(models.User).filter(models.User.manager_id == manager_id)]
+    engine.dispose()
+    return manager_id, employee_ids
+
+def token_for(user_id):
+    return auth.create_access_token({"user_id": user_id})
+
+async def wait_until_up(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(base_url + "/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+async def subscriber(host, port, user_id, connected, started, latencies):
+    # Raw HTTP/1.1 instead of httpx: thousands of httpx streams in one process
+    # cost more CPU than the server does, which would swamp the measurement
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET /notifications/stream?token={auth.create_stream_token(user_id)} HTTP/1.1\r\n"
+                     f"Host: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        if not head.startswith(b"HTTP/1.1 200"):
+            raise RuntimeError(head.split(b"\r\n", 1)[0].decode())
+        connected.release()
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"data:"):
+                latencies.append(time.perf_counter() - started[0])
+                return
+    finally:
+        writer.close()
+
+async def run(host, port, manager_id, employee_ids, timeout):
+    base_url = f"http://{host}:{port}"
+    connected = asyncio.Semaphore(0)
+    started = [0.0]
+    latencies = []
+    connect_start = time.perf_counter()
+    tasks = [asyncio.create_task(subscriber(host, port, user_id, connected, started, latencies))
+             for user_id in employee_ids]
+    for _ in employee_ids:
+        await connected.acquire()
+    connect_time = time.perf_counter() - connect_start
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(timeout)) as client:
+        metrics = (await client.get(base_url + "/metrics/notifications",
+                                    headers={"Authorization": f"Bearer {token_for(manager_id)}"})).json()
+        started[0] = time.perf_counter()
+        response = await client.post(
+            base_url + "/announcements/",
+            json={"title": "Load test", "content": "Streaming"},
+            headers={"Authorization": f"Bearer {token_for(manager_id)}"},
+        )
+        response.raise_for_status()
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    return connect_time, metrics["stream_subscribers"], sorted(latencies)
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    # Each subscriber needs a socket on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, args.subscribers * 2 + 256))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench.db"
+        manager_id, employee_ids = seed(url, args.subscribers)
+        env = {**os.environ, "DATABASE_URL": url}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            asyncio.run(wait_until_up(f"http://127.0.0.1:{args.port}"))
+            connect_time, subscribed, latencies = asyncio.run(
+                run("127.0.0.1", args.port, manager_id, employee_ids, args.timeout))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"subscribers connected: {subscribed} in {connect_time:.1f}s")
+    print(f"events delivered:      {len(latencies)}/{len(employee_ids)}")
+    if latencies:
+        print(f"delivery latency ms:   p50 {percentile(latencies, 0.5):.1f}  "
+              f"p95 {percentile(latencies, 0.95):.1f}  max {latencies[-1] * 1000:.1f}")
+
+if __name__ == "__main__":
+    main()
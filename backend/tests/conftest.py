@@ -1,27 +1,26 @@
 import pytest
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
 import os
 import sys
 
 # Add the parent directory to the path to allow imports from `app`
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Write notifications on the request's session so tests can assert on them directly
+os.environ.setdefault("NOTIFICATION_DELIVERY", "sync")
+
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, get_db, build_engine
 from app.models import * # Import all models to ensure they are registered with Base
 
 # --- Test Database Setup ---
 # Use an in-memory SQLite database for testing
 TEST_DATABASE_URL = "sqlite:///:memory:"
 
-engine = create_engine(
-    TEST_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool, # Use a static pool for in-memory DB
-)
+engine = build_engine(TEST_DATABASE_URL) # Shares one connection via StaticPool
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -57,6 +56,41 @@ def test_client(db_session):
     # Clean up dependency override
     app.dependency_overrides.clear() 
 
+@pytest.fixture
+def make_team():
+    """
+    Creates a manager with `size` employees reporting to them: `manager, employees = make_team(db, size)`.
+    """
+    def create(db, size=1):
+        manager = User(name="Manager", email="manager@example.com", password_hash="x", role=RoleEnum.manager)
+        db.add(manager)
+        db.commit()
+        employees = [
+            User(name=f"Employee {i}", email=f"employee{i}@example.com", password_hash="x",
+                 role=RoleEnum.employee, manager_id=manager.id)
+            for i in range(size)
+        ]
+        db.add_all(employees)
+        db.commit()
+        return manager, employees
+    return create
+
+@pytest.fixture
+def count_queries():
+    """
+    Counts the SQL statements run inside a `with count_queries() as statements:` block.
+    """
+    @contextmanager
+    def counter():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+    return counter
+
     #[+] Running 4/4
  #✔ backend                                   Built                                                     0.0s 
  #✔ frontend                                  Built                                                     0.0s 
@@ -0,0 +1,87 @@
+import hashlib
+
+from app import blobs, files, models
+
+HANDBOOK = b"%PDF-1.4 handbook"
+TEMPLATE = b"%PDF-1.4 template"
+
+def _sha(content):
+    return hashlib.sha256(content).hexdigest()
+
+def _seed(db, make_team, root):
+    manager, (employee,) = make_team(db)
+
+    # A blob stored flat, as before sharding, shared by two rows
+    flat = root / "blobs" / _sha(HANDBOOK)
+    flat.parent.mkdir(parents=True)
+    flat.write_bytes(HANDBOOK)
+    db.add(models.Blob(sha256=_sha(HANDBOOK), size=len(HANDBOOK), ref_count=2))
+    # Files uploaded before the blob store, two of them with the same bytes
+    (root / "assignments").mkdir()
+    (root / "assignments" / "task.pdf").write_bytes(TEMPLATE)
+    (root / "1_copy.pdf").write_bytes(TEMPLATE)
+    (root / "2_handbook.pdf").write_bytes(HANDBOOK)
+    db.flush()
+
+    assignment = models.Assignment(manager_id=manager.id, title="Task", filename="task.pdf",
+                                   file_path=str(root / "assignments" / "task.pdf"), file_size=1)
+    db.add(assignment)
+    db.flush()
+    db.add_all([
+        models.Document(employee_id=employee.id, title="Shared", filename="h.pdf", file_path=str(flat),
+                        file_size=len(HANDBOOK), blob_sha256=_sha(HANDBOOK)),
+        models.Submission(assignment_id=assignment.id, employee_id=employee.id, title="Shared", filename="h.pdf",
+                          file_path=str(flat), file_size=len(HANDBOOK), blob_sha256=_sha(HANDBOOK)),
+        models.Document(employee_id=employee.id, title="Copy", filename="copy.pdf",
+                        file_path=str(root / "1_copy.pdf"), file_size=len(TEMPLATE)),
+        models.Document(employee_id=employee.id, title="Handbook", filename="handbook.pdf",
+                        file_path=str(root / "2_handbook.pdf"), file_size=len(HANDBOOK)),
+        models.Document(employee_id=employee.id, title="Gone", filename="gone.pdf",
+                        file_path=str(root / "gone.pdf"), file_size=1),
+    ])
+    db.commit()
+
+def test_migrate_layout_moves_files_and_rewrites_paths(db_session, tmp_path, monkeypatch, make_team):
+    """
+    Tests that migrate shards flat blobs, adopts older uploads as deduplicated blobs, rewrites
+    file_path in batches, leaves rows whose file is missing alone and does nothing on a second run.
+    """
+    monkeypatch.setattr(files, "UPLOAD_DIR", tmp_path)
+    _seed(db_session, make_team, tmp_path)
+    engine = db_session.get_bind()
+    assert blobs.count_unmigrated(engine) == (1, 4)
+
+    report = blobs.migrate_layout(engine, batch_size=1)
+
+    assert (report.blobs_moved, report.files_adopted, report.rows_rewritten) == (1, 3, 5)
+    assert report.missing == [f"documents 4: {tmp_path / 'gone.pdf'}"]
+    stored = sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*") if p.is_file())
+    assert stored == sorted(f"blobs/{sha[:2]}/{sha[2:4]}/{sha}" for sha in (_sha(HANDBOOK), _sha(TEMPLATE)))
+
+    db_session.expire_all()
+    for model in (models.Document, models.Assignment, models.Submission):
+        for row in db_session.query(model).filter(model.blob_sha256.isnot(None)):
+            assert row.file_path == str(blobs.blob_path(row.blob_sha256))
+    counts = {b.sha256: b.ref_count for b in db_session.query(models.Blob)}
+    assert counts == {_sha(HANDBOOK): 3, _sha(TEMPLATE): 2}
+    assert blobs.check_ref_counts(engine) == []
+    assert blobs.count_unmigrated(engine) == (0, 1)
+
+    again = blobs.migrate_layout(engine, batch_size=1)
+    assert (again.blobs_moved, again.files_adopted, again.rows_rewritten) == (0, 0, 0)
+
+def test_gc_removes_only_unreferenced_blobs(db_session, tmp_path, monkeypatch):
+    """
+    Tests that gc removes blobs left with no references, row and file, and keeps referenced ones.
+    """
+    monkeypatch.setattr(files, "UPLOAD_DIR", tmp_path)
+    for content, ref_count in ((HANDBOOK, 1), (TEMPLATE, 0)):
+        path = blobs.blob_path(_sha(content))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        db_session.add(models.Blob(sha256=_sha(content), size=len(content), ref_count=ref_count))
+    db_session.commit()
+
+    assert blobs.collect_garbage(db_session.get_bind()) == 1
+    assert [b.sha256 for b in db_session.query(models.Blob)] == [_sha(HANDBOOK)]
+    assert blobs.blob_path(_sha(HANDBOOK)).exists() and not blobs.blob_path(_sha(TEMPLATE)).exists()
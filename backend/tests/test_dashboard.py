@@ -0,0 +1,193 @@
+from datetime import datetime
+
+from app import auth, crud, models, rollups, schemas
+
+def _seed_feedback(db, dated_sentiments):
+    manager = models.User(name="Manager", email="manager@example.com", password_hash="x", role=models.RoleEnum.manager)
+    db.add(manager)
+    db.commit()
+    employee = models.User(name="Employee", email="employee@example.com", password_hash="x",
+                           role=models.RoleEnum.employee, manager_id=manager.id)
+    db.add(employee)
+    db.commit()
+    db.add_all([
+        models.Feedback(employee_id=employee.id, manager_id=manager.id, strengths="s" * 1000,
+                        areas_to_improve="a" * 1000, sentiment=sentiment, created_at=created_at)
+        for created_at, sentiment in dated_sentiments
+    ])
+    db.commit()
+    return manager.id, employee.id
+
+def _headers(user_id):
+    return {"Authorization": f"Bearer {auth.create_access_token({'user_id': user_id})}"}
+
+def test_manager_dashboard_counts_in_sql(test_client, db_session, count_queries):
+    """
+    Tests that the manager dashboard aggregates sentiments without loading feedback rows.
+    """
+    manager_id, _ = _seed_feedback(db_session, [
+        (datetime(2024, 1, 10), models.SentimentEnum.positive),
+        (datetime(2024, 1, 20), models.SentimentEnum.positive),
+        (datetime(2024, 2, 5), models.SentimentEnum.negative),
+    ])
+
+    # Seeded behind crud's back, so fill team_stats the way migration 0008 does
+    rollups.rebuild_team_stats(db_session.get_bind())
+
+    with count_queries() as statements:
+        response = test_client.get("/dashboard/manager", headers=_headers(manager_id))
+    assert response.json() == {
+        "team_size": 1,
+        "feedback_count": 3,
+        "sentiment_trends": {"positive": 2, "neutral": 0, "negative": 1},
+        "unacknowledged_feedback": 3,
+        "active_assignments": 0,
+        "pending_submissions": 0,
+    }
+    assert len(statements) == 2  # auth, team_stats row
+    assert not any("strengths" in s for s in statements)
+
+def test_manager_dashboard_date_range(test_client, db_session):
+    """
+    Tests that start_date and end_date limit the feedback figures to a half-open range.
+    """
+    manager_id, _ = _seed_feedback(db_session, [
+        (datetime(2024, 1, 10), models.SentimentEnum.positive),
+        (datetime(2024, 2, 1), models.SentimentEnum.neutral),
+        (datetime(2024, 2, 5), models.SentimentEnum.negative),
+    ])
+    headers = _headers(manager_id)
+
+    january = test_client.get("/dashboard/manager", params={"start_date": "2024-01-01T00:00:00",
+                                                            "end_date": "2024-02-01T00:00:00"}, headers=headers)
+    assert january.json()["sentiment_trends"] == {"positive": 1, "neutral": 0, "negative": 0}
+
+    # A zoned bound is converted to UTC: 03:00+02:00 is 01:00Z, after the 00:00Z feedback
+    since = test_client.get("/dashboard/manager", params={"start_date": "2024-02-01T03:00:00+02:00"}, headers=headers)
+    assert since.json()["feedback_count"] == 1
+
+    bad = test_client.get("/dashboard/manager", params={"start_date": "2024-02-01T00:00:00",
+                                                        "end_date": "2024-01-01T00:00:00"}, headers=headers)
+    assert bad.status_code == 400
+
+def test_team_stats_follow_writes(db_session):
+    """
+    Tests that every crud write affecting the manager dashboard keeps team_stats equal to a recount.
+    """
+    db = db_session
+    manager_id, employee_id = _seed_feedback(db, [])
+    rollups.rebuild_team_stats(db.get_bind())
+    crud.create_user(db, schemas.UserCreate(name="Second", email="second@example.com", password="pw",
+                                            role="employee", manager_id=manager_id))
+    feedback = crud.create_feedback(db, schemas.FeedbackCreate(employee_id=employee_id, strengths="s",
+                                                               areas_to_improve="a", sentiment="positive"), manager_id)
+    crud.update_feedback(db, feedback, schemas.FeedbackUpdate(sentiment="negative"))
+    crud.update_feedback(db, feedback, schemas.FeedbackUpdate(acknowledged=True))
+    first = crud.create_assignment(db, {"title": "One", "filename": "a.pdf", "file_path": "a.pdf", "file_size": 1}, manager_id)
+    second = crud.create_assignment(db, {"title": "Two", "filename": "b.pdf", "file_path": "b.pdf", "file_size": 1}, manager_id)
+    for assignment_id in (first.id, second.id):
+        crud.create_submission(db, {"assignment_id": assignment_id, "title": "Mine", "filename": "s.pdf",
+                                    "file_path": "s.pdf", "file_size": 1}, employee_id)
+    assert rollups.check_team_stats(db.get_bind()) == []
+
+    stats = crud.get_team_stats(db, manager_id)
+    assert (stats["team_size"], stats["feedback_negative"], stats["unacknowledged_feedback"]) == (2, 1, 0)
+    assert (stats["active_assignments"], stats["pending_submissions"]) == (2, 2)
+
+    crud.update_assignment(db, first, schemas.AssignmentUpdate(is_active=False))
+    submission_id = db.query(models.Submission.id).filter(models.Submission.assignment_id == second.id).scalar()
+    crud.delete_submission(db, submission_id, employee_id)
+    third = crud.create_assignment(db, {"title": "Three", "filename": "c.pdf", "file_path": "c.pdf", "file_size": 1}, manager_id)
+    crud.delete_assignment(db, third.id, manager_id)
+    assert rollups.check_team_stats(db.get_bind()) == []
+    stats = crud.get_team_stats(db, manager_id)
+    assert (stats["active_assignments"], stats["active_assignment_submissions"], stats["pending_submissions"]) == (1, 0, 2)
+
+def test_team_stats_drift_check_and_rebuild(db_session):
+    """
+    Tests that the consistency check reports counters that no longer match the source tables and a rebuild repairs them.
+    """
+    manager_id, _ = _seed_feedback(db_session, [(datetime(2024, 1, 10), models.SentimentEnum.neutral)])
+    engine = db_session.get_bind()
+    # The seed bypassed crud, so the missing row shows up as drift from zero
+    assert {(d.column, d.stored, d.actual) for d in rollups.check_team_stats(engine)} == {
+        ("team_size", 0, 1), ("feedback_neutral", 0, 1), ("unacknowledged_feedback", 0, 1),
+    }
+    assert rollups.rebuild_team_stats(engine) == 1
+
+    db_session.query(models.TeamStats).filter(models.TeamStats.manager_id == manager_id).update({"team_size": 7})
+    db_session.commit()
+    assert rollups.check_team_stats(engine) == [rollups.StatsDrift(manager_id, "team_size", 7, 1)]
+    assert rollups.rebuild_team_stats(engine, manager_id=manager_id) == 1
+    assert rollups.check_team_stats(engine) == []
+
+def test_trends_follow_feedback_writes(test_client, db_session, count_queries):
+    """
+    Tests that creating and re-scoring feedback updates the rollup behind the trend endpoint.
+    """
+    manager_id, employee_id = _seed_feedback(db_session, [])
+    headers = _headers(manager_id)
+    for sentiment in ("positive", "positive", "negative"):
+        test_client.post("/feedback/", json={"employee_id": employee_id, "strengths": "s", "areas_to_improve": "a",
+                                             "sentiment": sentiment}, headers=headers)
+    feedback_id = db_session.query(models.Feedback.id).order_by(models.Feedback.id).first()[0]
+    test_client.patch(f"/feedback/{feedback_id}", json={"sentiment": "neutral"}, headers=headers)
+
+    with count_queries() as statements:
+        response = test_client.get("/dashboard/manager/trends", params={"bucket": "day"}, headers=headers)
+    series = response.json()["series"]
+    assert len(series) == 1
+    assert {k: series[0][k] for k in ("positive", "neutral", "negative")} == {"positive": 1, "neutral": 1, "negative": 1}
+    assert not any("FROM feedbacks" in s for s in statements)
+
+def test_trends_buckets_and_rebuild(test_client, db_session):
+    """
+    Tests weekly and monthly buckets with zero-filled gaps, after rebuilding the rollup from feedbacks.
+    """
+    manager_id, _ = _seed_feedback(db_session, [
+        (datetime(2024, 1, 2, 9), models.SentimentEnum.positive),   # Tuesday, week of Jan 1
+        (datetime(2024, 1, 7, 23), models.SentimentEnum.negative),  # Sunday, same week
+        (datetime(2024, 1, 22, 12), models.SentimentEnum.neutral),  # two weeks later
+        (datetime(2024, 3, 1, 8), models.SentimentEnum.positive),
+    ])
+    headers = _headers(manager_id)
+    # Inserted behind crud's back, so only a rebuild picks them up
+    assert test_client.get("/dashboard/manager/trends", headers=headers).json()["series"] == []
+    assert rollups.rebuild_sentiment_rollup(db_session.get_bind()) == 4
+
+    weekly = test_client.get("/dashboard/manager/trends", params={"bucket": "week", "end_date": "2024-02-01"},
+                             headers=headers).json()["series"]
+    assert [(p["period_start"], p["positive"], p["neutral"], p["negative"]) for p in weekly] == [
+        ("2024-01-01", 1, 0, 1), ("2024-01-08", 0, 0, 0), ("2024-01-15", 0, 0, 0),
+        ("2024-01-22", 0, 1, 0), ("2024-01-29", 0, 0, 0),
+    ]
+
+    monthly = test_client.get("/dashboard/manager/trends", params={"bucket": "month"}, headers=headers).json()["series"]
+    assert [(p["period_start"], p["positive"] + p["neutral"] + p["negative"]) for p in monthly] == [
+        ("2024-01-01", 3), ("2024-02-01", 0), ("2024-03-01", 1),
+    ]
+
+def test_employee_timeline_pages_and_summary(test_client, db_session, count_queries):
+    """
+    Tests keyset pages, the date range, and that summary mode never selects the text columns.
+    """
+    _, employee_id = _seed_feedback(db_session, [
+        (datetime(2024, 1, day), models.SentimentEnum.positive) for day in range(1, 8)
+    ])
+    headers = _headers(employee_id)
+
+    first = test_client.get("/dashboard/employee", params={"limit": 3}, headers=headers)
+    assert [fb["created_at"][:10] for fb in first.json()["feedback_timeline"]] == ["2024-01-07", "2024-01-06", "2024-01-05"]
+    assert "strengths" in first.json()["feedback_timeline"][0]
+    second = test_client.get("/dashboard/employee", params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]},
+                             headers=headers)
+    assert [fb["created_at"][:10] for fb in second.json()["feedback_timeline"]] == ["2024-01-04", "2024-01-03", "2024-01-02"]
+
+    with count_queries() as statements:
+        summary = test_client.get("/dashboard/employee", params={"summary": True, "start_date": "2024-01-03T00:00:00",
+                                                                 "end_date": "2024-01-05T00:00:00"}, headers=headers)
+    timeline = summary.json()["feedback_timeline"]
+    assert [fb["created_at"][:10] for fb in timeline] == ["2024-01-04", "2024-01-03"]
+    assert set(timeline[0]) == {"id", "sentiment", "created_at", "acknowledged"}
+    assert "X-Next-Cursor" not in summary.headers
+    assert not any("strengths" in s for s in statements)
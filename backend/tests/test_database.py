@@ -0,0 +1,38 @@
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from app.database import build_engine, normalize_database_url, is_sqlite_url
+
+def test_postgres_scheme_is_normalized():
+    """
+    Tests that provider-style postgres:// URLs are rewritten for SQLAlchemy.
+    """
+    url = normalize_database_url("postgres://user:pw@db:5432/feedback")
+    assert url == "postgresql+psycopg://user:pw@db:5432/feedback"
+    assert not is_sqlite_url(url)
+
+def test_in_memory_sqlite_uses_static_pool():
+    """
+    Tests that an in-memory SQLite engine shares a single connection.
+    """
+    engine = build_engine("sqlite:///:memory:")
+    assert isinstance(engine.pool, StaticPool)
+
+def test_postgres_engine_uses_tunable_queue_pool():
+    """
+    Tests that server databases get a bounded, pre-pinged connection pool.
+    """
+    engine = build_engine("postgresql://user:pw@localhost/feedback", pool_size=7, max_overflow=3)
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 7
+    assert engine.pool._max_overflow == 3
+    assert engine.pool._pre_ping is True
+
+def test_sqlite_file_engine_applies_wal_profile(tmp_path):
+    """
+    Tests that file-backed SQLite connections come up in WAL mode with the tuned pragmas.
+    """
+    engine = build_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
@@ -0,0 +1,86 @@
+import pytest
+
+from app import auth, models
+
+CONTENT = b"%PDF-1.4\n" + bytes(range(256)) * 400
+
+def _seed(db, make_team, tmp_path):
+    manager, (employee,) = make_team(db)
+    path = tmp_path / "report.pdf"
+    path.write_bytes(CONTENT)
+    assignment = models.Assignment(manager_id=manager.id, title="Report", filename="report.pdf",
+                                   file_path=str(path), file_size=len(CONTENT))
+    document = models.Document(employee_id=employee.id, title="Doc", filename="report.pdf",
+                               file_path=str(path), file_size=len(CONTENT))
+    db.add_all([assignment, document])
+    db.commit()
+    submission = models.Submission(assignment_id=assignment.id, employee_id=employee.id, title="Sub",
+                                   filename="report.pdf", file_path=str(path), file_size=len(CONTENT))
+    db.add(submission)
+    db.commit()
+    return {
+        "headers": {"Authorization": f"Bearer {auth.create_access_token({'user_id': employee.id})}"},
+        "document_id": document.id,
+        "assignment_id": assignment.id,
+        "submission_id": submission.id,
+    }
+
+DOWNLOADS = ["/documents/{document_id}/download", "/assignments/{assignment_id}/download",
+             "/submissions/{submission_id}/download"]
+
+@pytest.mark.parametrize("path", DOWNLOADS)
+def test_download_streams_file_with_validators(test_client, db_session, tmp_path, path, make_team):
+    """
+    Tests that a download sends the whole file with Content-Length, ETag, Last-Modified and Accept-Ranges.
+    """
+    seed = _seed(db_session, make_team, tmp_path)
+    response = test_client.get(path.format(**seed), headers=seed["headers"])
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert response.headers["content-disposition"] == 'attachment; filename="report.pdf"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"] and response.headers["last-modified"]
+
+@pytest.mark.parametrize("path", DOWNLOADS)
+def test_download_range_and_conditional_requests(test_client, db_session, tmp_path, path, make_team):
+    """
+    Tests that Range answers 206 or 416 and that a matching ETag or date answers 304 without a body.
+    """
+    seed = _seed(db_session, make_team, tmp_path)
+    url = path.format(**seed)
+    first = test_client.get(url, headers=seed["headers"])
+
+    partial = test_client.get(url, headers={**seed["headers"], "Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert partial.content == CONTENT[100:200]
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+
+    tail = test_client.get(url, headers={**seed["headers"], "Range": "bytes=-10"})
+    assert tail.status_code == 206 and tail.content == CONTENT[-10:]
+
+    beyond = test_client.get(url, headers={**seed["headers"], "Range": f"bytes={len(CONTENT)}-"})
+    assert beyond.status_code == 416
+
+    by_etag = test_client.get(url, headers={**seed["headers"], "If-None-Match": first.headers["etag"]})
+    assert by_etag.status_code == 304
+    assert by_etag.content == b""
+    assert by_etag.headers["etag"] == first.headers["etag"]
+
+    by_date = test_client.get(url, headers={**seed["headers"], "If-Modified-Since": first.headers["last-modified"]})
+    assert by_date.status_code == 304
+
+    stale = test_client.get(url, headers={**seed["headers"], "If-None-Match": '"stale"',
+                                          "If-Modified-Since": first.headers["last-modified"]})
+    assert stale.status_code == 200 and stale.content == CONTENT
+
+def test_download_missing_or_empty_file_is_404(test_client, db_session, tmp_path, make_team):
+    """
+    Tests that a download answers 404 when the stored file is gone or empty.
+    """
+    seed = _seed(db_session, make_team, tmp_path)
+    url = f"/documents/{seed['document_id']}/download"
+    (tmp_path / "report.pdf").write_bytes(b"")
+    assert test_client.get(url, headers=seed["headers"]).json()["detail"] == "File is empty"
+    (tmp_path / "report.pdf").unlink()
+    assert test_client.get(url, headers=seed["headers"]).json()["detail"] == "File not found"
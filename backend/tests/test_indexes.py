@@ -0,0 +1,107 @@
+import inspect
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import crud
+from app.pagination import PageRequest, encode_cursor
+
+# Arguments for every crud.get_* function; ids refer to the rows seeded below
+GETTER_ARGS = {
+    "get_user_by_email": {"email": "employee0@example.com"},
+    "get_user_by_id": {"user_id": 2},
+    "get_feedback_for_employee": {"employee_id": 2},
+    "get_feedback_for_manager": {"manager_id": 1},
+    "get_feedback_timeline": {"employee_id": 2},
+    "get_feedback_by_id": {"feedback_id": 1},
+    "get_team_size": {"manager_id": 1},
+    "get_team_stats": {"manager_id": 1},
+    "get_feedback_sentiment_counts": {"manager_id": 1},
+    "get_sentiment_rollup": {"manager_id": 1, "start": date(2024, 1, 1), "end": date(2024, 7, 1)},
+    "get_notifications_for_user": {"user_id": 2},
+    "get_notifications_since": {"user_id": 2, "after_id": 10},
+    "get_open_digests": {"digest_key": "assignment:1:comments", "user_ids": [1, 2], "since": datetime(2024, 1, 1)},
+    "get_peer_feedback_for_employee": {"employee_id": 2},
+    "get_peer_feedback_by_id": {"feedback_id": 1},
+    "get_team_members_for_peer_feedback": {"employee_id": 2},
+    "get_employees_by_manager": {"manager_id": 1},
+    "get_employee_ids_by_manager": {"manager_id": 1},
+    "get_comments_for_feedback": {"feedback_id": 1},
+    "get_comment_by_id": {"comment_id": 1},
+    "get_announcements_for_team": {"manager_id": 1},
+    "get_announcement_by_id": {"announcement_id": 1},
+    "get_announcements_for_employee": {"employee_id": 2},
+    "get_documents_for_employee": {"employee_id": 2},
+    "get_public_documents_for_team": {"manager_id": 1},
+    "get_document_by_id": {"document_id": 1},
+    "get_assignments_for_team": {"manager_id": 1},
+    "get_assignments_with_submission_counts": {"manager_id": 1},
+    "get_assignments_for_employee": {"employee_id": 2},
+    "get_assignment_by_id": {"assignment_id": 1},
+    "get_submissions_for_assignment": {"assignment_id": 1},
+    "get_submission_by_employee_and_assignment": {"employee_id": 2, "assignment_id": 1},
+    "get_submissions_by_employee": {"employee_id": 2},
+    "get_submission_by_id": {"submission_id": 1},
+    "get_comments_for_assignment": {"assignment_id": 1},
+    "get_assignment_comment_by_id": {"comment_id": 1},
+}
+
+# Extra argument combinations whose query shape differs from the defaults
+VARIANT_ARGS = [
+    ("get_feedback_timeline", {"employee_id": 2, "limit": 21, "summary": True, "before": (datetime(2024, 3, 1), 7),
+                               "start": datetime(2024, 1, 1), "end": datetime(2024, 6, 1)}),
+    ("get_feedback_sentiment_counts", {"manager_id": 1, "start": datetime(2024, 1, 1), "end": datetime(2024, 2, 1)}),
+    ("get_notifications_for_user", {"user_id": 2, "limit": 51, "unread_only": True,
+                                    "before": (datetime(2024, 1, 1), 10)}),
+    ("get_feedback_for_employee", {"employee_id": 2, "page": PageRequest(
+        cursor=encode_cursor(datetime(2024, 3, 1), 7), since=datetime(2024, 1, 1), filters={"sentiment": "positive"})}),
+    ("get_peer_feedback_for_employee", {"employee_id": 2, "page": PageRequest(
+        limit=20, cursor=encode_cursor(datetime(2024, 3, 1), 7), filters={"acknowledged": "false"})}),
+    ("get_public_documents_for_team", {"manager_id": 1, "page": PageRequest(
+        cursor=encode_cursor(datetime(2024, 3, 1), 7), until=datetime(2024, 6, 1))}),
+    ("get_assignments_with_submission_counts", {"manager_id": 1, "page": PageRequest(
+        sort="title", cursor=encode_cursor("Essay", 3))}),
+    ("get_comments_for_assignment", {"assignment_id": 1, "page": PageRequest(
+        cursor=encode_cursor(datetime(2024, 3, 1), 7), filters={"employee_id": "2"})}),
+]
+
+def _capture_statements(fn, db, kwargs):
+    engine = db.get_bind()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn(db, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+def test_every_getter_is_covered():
+    """
+    Tests that new crud.get_* functions are added to the query plan check.
+    """
+    getters = {
+        name for name, fn in inspect.getmembers(crud, inspect.isfunction)
+        if name.startswith("get_") and fn.__module__ == crud.__name__
+    }
+    assert getters == set(GETTER_ARGS)
+
+@pytest.mark.parametrize("name, kwargs", sorted(GETTER_ARGS.items()) + VARIANT_ARGS)
+def test_getter_query_plans_use_indexes(db_session, name, kwargs, make_team):
+    """
+    Tests that each crud.get_* query is answered by an index rather than a full table scan.
+    """
+    make_team(db_session)  # manager 1, employee 2
+    statements = _capture_statements(getattr(crud, name), db_session, kwargs)
+    assert statements
+
+    with db_session.get_bind().connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            details = [row[-1] for row in plan]
+            full_scans = [d for d in details if d.startswith("SCAN") and "INDEX" not in d]
+            assert not full_scans, f"{name} scans without an index: {details}"
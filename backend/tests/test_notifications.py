@@ -0,0 +1,440 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, crud, deps, models, realtime
+from app.database import build_engine
+from app.notifications import NotificationDispatcher
+
+def test_bulk_notifications_use_one_insert(db_session, make_team, count_queries):
+    """
+    Tests that fanning a notification out to a team issues a single INSERT and commit.
+    """
+    manager, employees = make_team(db_session, 25)
+    with count_queries() as statements:
+        created = crud.create_notifications(db_session, [e.id for e in employees], "Hello team")
+
+    assert created == 25
+    assert len([s for s in statements if s.startswith("INSERT INTO notifications")]) == 1
+    assert db_session.query(models.Notification).count() == 25
+
+def test_bulk_notifications_skip_duplicate_recipients(db_session, make_team):
+    """
+    Tests that a recipient listed twice only receives one notification.
+    """
+    manager, employees = make_team(db_session, 2)
+    created = crud.create_notifications(db_session, [employees[0].id, employees[0].id, employees[1].id], "Hi")
+    assert created == 2
+
+def _auth_headers(test_client, email, password="testpassword123"):
+    response = test_client.post("/auth/login", data={"username": email, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_announcement_notifies_each_team_member_once(test_client, db_session):
+    """
+    Tests that creating an announcement produces exactly one notification per recipient.
+    """
+    manager = test_client.post("/auth/register", json={
+        "name": "Manager", "email": "manager@example.com", "password": "testpassword123", "role": "manager"
+    }).json()
+    employee_ids = [
+        test_client.post("/auth/register", json={
+            "name": f"Employee {i}", "email": f"employee{i}@example.com", "password": "testpassword123",
+            "role": "employee", "manager_id": manager["id"]
+        }).json()["id"]
+        for i in range(3)
+    ]
+
+    response = test_client.post(
+        "/announcements/",
+        json={"title": "Quarterly goals", "content": "Please read."},
+        headers=_auth_headers(test_client, "manager@example.com"),
+    )
+    assert response.status_code == 200
+
+    notifications = db_session.query(models.Notification).all()
+    assert sorted(n.user_id for n in notifications) == sorted(employee_ids)
+
+@pytest.fixture
+def file_sessions(tmp_path):
+    # The worker thread needs its own connections, so use a file database
+    engine = build_engine(f"sqlite:///{tmp_path / 'dispatch.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+def test_background_dispatch_delivers_team_fan_out(file_sessions, make_team):
+    """
+    Tests that a queued team fan-out is written by the worker and reported in the metrics.
+    """
+    dispatcher = NotificationDispatcher(file_sessions, mode="background", durable=True)
+    dispatcher.start()
+    with file_sessions() as db:
+        manager, employees = make_team(db, 5)
+        employee_ids = [e.id for e in employees]
+        dispatcher.dispatch(db, "New assignment", team_of=manager.id, exclude=[employee_ids[0]])
+        db.commit()
+    assert dispatcher.join()
+    dispatcher.stop()
+
+    with file_sessions() as db:
+        recipients = sorted(n.user_id for n in db.query(models.Notification))
+        assert recipients == sorted(employee_ids[1:])
+        assert db.query(models.NotificationJob).one().status == "delivered"
+    metrics = dispatcher.metrics()
+    assert metrics["delivered"] == 1 and metrics["notifications_written"] == 4
+    assert metrics["queue_depth"] == 0
+
+def test_background_dispatch_retries_failed_delivery(file_sessions, monkeypatch, make_team):
+    """
+    Tests that a delivery that fails once is retried and then succeeds.
+    """
+    real_create = crud.create_notifications
+    calls = []
+
+    def flaky_create(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return real_create(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "create_notifications", flaky_create)
+    dispatcher = NotificationDispatcher(file_sessions, mode="background", durable=False, retry_backoff=0.01)
+    dispatcher.start()
+    with file_sessions() as db:
+        manager, employees = make_team(db, 1)
+        dispatcher.dispatch(db, "Ping", user_ids=[manager.id])
+        db.commit()
+    assert dispatcher.join()
+    dispatcher.stop()
+
+    assert dispatcher.metrics()["retried"] == 1
+    with file_sessions() as db:
+        assert db.query(models.Notification).count() == 1
+
+def test_durable_job_commits_with_the_callers_transaction(file_sessions, make_team):
+    """
+    Tests that a durable job is written in the caller's transaction: rolled back with it, and
+    handed to the worker only once the caller commits.
+    """
+    dispatcher = NotificationDispatcher(file_sessions, mode="background", durable=True)
+    dispatcher.start()
+    with file_sessions() as db:
+        manager, employees = make_team(db, 2)
+        dispatcher.dispatch(db, "Discarded", team_of=manager.id)
+        db.rollback()
+        assert dispatcher.metrics()["enqueued"] == 0
+
+        dispatcher.dispatch(db, "Kept", team_of=manager.id)
+        assert dispatcher.metrics()["enqueued"] == 0
+        db.commit()
+    assert dispatcher.join()
+    dispatcher.stop()
+
+    with file_sessions() as db:
+        assert [job.status for job in db.query(models.NotificationJob)] == ["delivered"]
+        assert {n.message for n in db.query(models.Notification)} == {"Kept"}
+    assert dispatcher.metrics()["enqueued"] == 1
+
+def test_durable_jobs_are_replayed_on_start(file_sessions, make_team):
+    """
+    Tests that jobs left pending by a previous process are delivered on startup.
+    """
+    with file_sessions() as db:
+        manager, employees = make_team(db, 3)
+        db.add(models.NotificationJob(payload=json.dumps({"message": "Left over", "user_ids": [], "team_of": manager.id, "exclude": []})))
+        db.commit()
+
+    dispatcher = NotificationDispatcher(file_sessions, mode="background", durable=True)
+    dispatcher.start()
+    assert dispatcher.join()
+    dispatcher.stop()
+
+    assert dispatcher.metrics()["recovered"] == 1
+    with file_sessions() as db:
+        assert db.query(models.Notification).count() == 3
+
+def test_notifications_are_cursor_paginated(test_client, db_session):
+    """
+    Tests keyset pagination over notifications, including rows that share a timestamp.
+    """
+    test_client.post("/auth/register", json={
+        "name": "Employee", "email": "employee@example.com", "password": "testpassword123", "role": "employee"
+    })
+    user = db_session.query(models.User).one()
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    for i in range(7):
+        # Pairs of notifications share a created_at second
+        db_session.add(models.Notification(user_id=user.id, message=f"n{i}", is_read=(i % 3 == 0),
+                                           created_at=base + timedelta(seconds=i // 2)))
+    db_session.commit()
+    headers = _auth_headers(test_client, "employee@example.com")
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = test_client.get("/notifications", params=params, headers=headers)
+        assert response.status_code == 200
+        seen += [n["message"] for n in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == ["n6", "n5", "n4", "n3", "n2", "n1", "n0"]
+
+    unread = test_client.get("/notifications", params={"unread_only": True}, headers=headers).json()
+    assert [n["message"] for n in unread] == ["n5", "n4", "n2", "n1"]
+
+    assert test_client.get("/notifications", params={"cursor": "garbage"}, headers=headers).status_code == 400
+
+def test_unread_counter_tracks_fan_out_and_reads(db_session, make_team):
+    """
+    Tests that the denormalized unread counter follows creation and mark-as-read.
+    """
+    manager, employees = make_team(db_session, 2)
+    crud.create_notifications(db_session, [e.id for e in employees], "First")
+    crud.create_notifications(db_session, [employees[0].id], "Second")
+    db_session.refresh(employees[0])
+    assert employees[0].unread_notification_count == 2
+
+    notification = crud.get_notifications_for_user(db_session, employees[0].id)[0]
+    crud.mark_notification_as_read(db_session, notification.id, employees[0].id)
+    crud.mark_notification_as_read(db_session, notification.id, employees[0].id)  # already read
+    db_session.refresh(employees[0])
+    assert employees[0].unread_notification_count == 1
+
+def test_unread_count_endpoint_supports_etags(test_client, db_session, count_queries):
+    """
+    Tests that polling the unread count returns 304 until the count changes, after only the auth lookup.
+    """
+    test_client.post("/auth/register", json={
+        "name": "Employee", "email": "employee@example.com", "password": "testpassword123", "role": "employee"
+    })
+    user = db_session.query(models.User).one()
+    headers = _auth_headers(test_client, "employee@example.com")
+
+    first = test_client.get("/notifications/unread-count", headers=headers)
+    assert first.json() == {"unread_count": 0}
+    etag = first.headers["ETag"]
+    with count_queries() as statements:
+        unchanged = test_client.get("/notifications/unread-count", headers={**headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert len(statements) == 1  # the user row loaded for auth
+
+    crud.create_notifications(db_session, [user.id], "Hello")
+    changed = test_client.get("/notifications/unread-count", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json() == {"unread_count": 1}
+
+def test_bulk_mark_as_read(test_client, db_session):
+    """
+    Tests marking notifications read by id list, up to a cursor, and all at once.
+    """
+    test_client.post("/auth/register", json={
+        "name": "Employee", "email": "employee@example.com", "password": "testpassword123", "role": "employee"
+    })
+    user = db_session.query(models.User).one()
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    for i in range(6):
+        crud.create_notification(db_session, user.id, f"n{i}")
+    for i, notification in enumerate(db_session.query(models.Notification).order_by(models.Notification.id)):
+        notification.created_at = base + timedelta(minutes=i)
+    db_session.commit()
+    ids = [n.id for n in db_session.query(models.Notification).order_by(models.Notification.id)]
+    headers = _auth_headers(test_client, "employee@example.com")
+
+    response = test_client.post("/notifications/read", json={"ids": [ids[5], ids[4]]}, headers=headers)
+    assert response.json() == {"updated": 2}
+
+    # The read cursor is the newest row shown (n5): it covers n0..n3 still unread,
+    # but not n6, which arrived after the page was fetched
+    page = test_client.get("/notifications", params={"limit": 4}, headers=headers)
+    crud.create_notification(db_session, user.id, "n6")
+    response = test_client.post("/notifications/read", json={"up_to_cursor": page.headers["X-Read-Cursor"]}, headers=headers)
+    assert response.json() == {"updated": 4}
+    older = test_client.get("/notifications", params={"cursor": page.headers["X-Next-Cursor"]}, headers=headers)
+    assert "X-Read-Cursor" not in older.headers
+
+    response = test_client.post("/notifications/read", json={"all": True}, headers=headers)
+    assert response.json() == {"updated": 1}
+    assert db_session.query(models.User).one().unread_notification_count == 0
+
+    assert test_client.post("/notifications/read", json={}, headers=headers).status_code == 400
+
+def test_stream_hub_publishes_only_committed_notifications(db_session, make_team):
+    """
+    Tests that live subscribers receive notifications after commit and nothing from a rollback.
+    """
+    manager, employees = make_team(db_session, 2)
+    employee_id = employees[0].id
+
+    async def scenario():
+        subscription = realtime.hub.subscribe(employee_id)
+        try:
+            crud.create_notifications(db_session, [employee_id], "Rolled back", commit=False)
+            db_session.rollback()
+            crud.create_notifications(db_session, [e.id for e in employees], "Committed")
+            payload = await asyncio.wait_for(subscription.queue.get(), timeout=1)
+            assert subscription.queue.empty()
+            return payload
+        finally:
+            realtime.hub.unsubscribe(subscription)
+
+    payload = asyncio.run(scenario())
+    assert payload["message"] == "Committed"
+    assert payload["user_id"] == employee_id
+    assert realtime.hub.subscriber_count() == 0
+
+def test_event_stream_replays_then_skips_duplicates(db_session, make_team):
+    """
+    Tests that a reconnecting stream replays rows after Last-Event-ID, drops their live copies and keeps late arrivals.
+    """
+    manager, employees = make_team(db_session, 1)
+    employee_id = employees[0].id
+    for i in range(3):
+        crud.create_notification(db_session, employee_id, f"n{i}")
+    first_id = crud.get_notifications_since(db_session, employee_id, 0)[0].id
+
+    async def scenario():
+        subscription = realtime.hub.subscribe(employee_id)
+        missed = crud.get_notifications_since(db_session, employee_id, first_id)
+        replay = [realtime.notification_event(n.id, n.user_id, n.message, n.created_at) for n in missed]
+        # Committed out of id order by a concurrent request, then already replayed, then new
+        subscription.deliver(realtime.notification_event(first_id, employee_id, "late", None))
+        subscription.deliver(replay[-1])
+        subscription.deliver(realtime.notification_event(replay[-1]["id"] + 1, employee_id, "live", None))
+
+        async def connected():
+            return False
+
+        stream = realtime.event_stream(subscription, replay, connected, heartbeat=0.05)
+        frames = [await stream.__anext__() for _ in range(5)]
+        await stream.aclose()
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert [json.loads(f.split("data: ")[1])["message"] for f in frames[:4]] == ["n1", "n2", "late", "live"]
+    assert frames[4] == ": keep-alive\n\n"
+    assert realtime.hub.subscriber_count() == 0
+
+def test_stream_requires_token(test_client, db_session, make_team):
+    """
+    Tests that the notification stream only takes short-lived stream tokens in the URL, and only for streams.
+    """
+    manager, employees = make_team(db_session, 1)
+    access_token = auth.create_access_token({"user_id": employees[0].id})
+    assert test_client.get("/notifications/stream").status_code == 401
+    assert test_client.get("/notifications/stream", params={"token": "bogus"}).status_code == 401
+    # A full access token must not travel in a query string
+    assert test_client.get("/notifications/stream", params={"token": access_token}).status_code == 401
+
+    response = test_client.post("/notifications/stream-token", headers={"Authorization": f"Bearer {access_token}"})
+    stream_token = response.json()["token"]
+    assert response.json()["expires_in"] == auth.STREAM_TOKEN_EXPIRE_SECONDS
+    assert deps.get_stream_token(None, stream_token) == stream_token
+    assert deps.get_stream_user(db_session, stream_token).id == employees[0].id
+    # ...and a stream token is no good anywhere else
+    assert test_client.get("/users/me", headers={"Authorization": f"Bearer {stream_token}"}).status_code == 401
+
+def test_digest_folds_repeated_events_per_recipient(db_session, make_team):
+    """
+    Tests that events with the same digest key become one unread notification counting them.
+    """
+    manager, employees = make_team(db_session, 2)
+    recipients = [e.id for e in employees]
+    digest = {"digest_key": "assignment:1:comments", "digest_message": "{count} new comments on 'X'",
+              "digest_window": timedelta(minutes=30)}
+    crud.create_notifications(db_session, recipients, "Comment 0", **digest)
+    first_id = db_session.query(models.Notification.id).filter(models.Notification.user_id == recipients[0]).scalar()
+    for i in range(1, 3):
+        crud.create_notifications(db_session, recipients, f"Comment {i}", **digest)
+
+    rows = db_session.query(models.Notification).filter(models.Notification.user_id == recipients[0]).all()
+    assert [(n.message, n.event_count) for n in rows] == [("3 new comments on 'X'", 3)]
+    # Updated in place, so a client holding the first id can still mark it read
+    assert rows[0].id == first_id
+    assert db_session.query(models.Notification).count() == 2
+    assert db_session.query(models.User).filter(models.User.id == recipients[0]).one().unread_notification_count == 1
+
+    # Once read, the next event starts a new notification
+    crud.mark_notification_as_read(db_session, rows[0].id, recipients[0])
+    crud.create_notifications(db_session, recipients, "Comment 3", **digest)
+    messages = [n.message for n in crud.get_notifications_for_user(db_session, recipients[0])]
+    assert sorted(messages) == ["3 new comments on 'X'", "Comment 3"]
+    assert db_session.query(models.User).filter(models.User.id == recipients[0]).one().unread_notification_count == 1
+
+def test_digest_window_expires(db_session, make_team):
+    """
+    Tests that an unread digest older than the window is left alone.
+    """
+    manager, employees = make_team(db_session, 1)
+    digest = {"digest_key": "feedback:1:comments", "digest_message": "{count} new comments",
+              "digest_window": timedelta(minutes=30)}
+    crud.create_notifications(db_session, [employees[0].id], "First", **digest)
+    old = db_session.query(models.Notification).one()
+    old.created_at = datetime.now(timezone.utc) - timedelta(hours=2)
+    db_session.commit()
+
+    crud.create_notifications(db_session, [employees[0].id], "Second", **digest)
+    assert sorted(n.event_count for n in db_session.query(models.Notification)) == [1, 1]
+
+def test_assignment_comments_are_digested(test_client, db_session):
+    """
+    Tests that a burst of assignment comments leaves each team member one digest notification.
+    """
+    manager = test_client.post("/auth/register", json={
+        "name": "Manager", "email": "manager@example.com", "password": "testpassword123", "role": "manager"
+    }).json()
+    for i in range(3):
+        test_client.post("/auth/register", json={
+            "name": f"Employee {i}", "email": f"employee{i}@example.com", "password": "testpassword123",
+            "role": "employee", "manager_id": manager["id"]
+        })
+    assignment = models.Assignment(manager_id=manager["id"], title="Report", filename="x.pdf", file_path="x.pdf", file_size=1)
+    db_session.add(assignment)
+    db_session.commit()
+    assignment_id = assignment.id
+    db_session.query(models.Notification).delete()
+    db_session.commit()
+
+    headers = _auth_headers(test_client, "manager@example.com")
+    for i in range(4):
+        response = test_client.post("/assignment-comments/", json={"assignment_id": assignment_id, "content": f"c{i}"},
+                                    headers=headers)
+        assert response.status_code == 200
+
+    rows = db_session.query(models.Notification).all()
+    assert len(rows) == 3
+    assert {n.message for n in rows} == {"4 new comments on assignment 'Report'"}
+
+def test_recovered_job_lag_reads_stored_time_as_utc(monkeypatch):
+    """
+    Tests that a recovered job's enqueue time treats the naive stored timestamp as UTC whatever the host timezone.
+    """
+    import time
+    from app.notifications import FanOutJob
+
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        record = models.NotificationJob(id=1, attempts=0, payload=json.dumps({"message": "m", "user_ids": [1]}),
+                                        created_at=datetime(2024, 1, 1, 12, 0))
+        job = FanOutJob.from_record(record)
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+    assert job.enqueued_at == datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+def test_notification_metrics_require_manager(test_client, db_session, make_team):
+    """
+    Tests that the delivery metrics are only served to managers.
+    """
+    manager, employees = make_team(db_session, 1)
+    employee = {"Authorization": f"Bearer {auth.create_access_token({'user_id': employees[0].id})}"}
+    manager = {"Authorization": f"Bearer {auth.create_access_token({'user_id': manager.id})}"}
+    assert test_client.get("/metrics/notifications").status_code == 401
+    assert test_client.get("/metrics/notifications", headers=employee).status_code == 403
+    response = test_client.get("/metrics/notifications", headers=manager)
+    assert response.status_code == 200 and "stream_subscribers" in response.json()
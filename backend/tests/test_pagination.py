@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import pytest
+
+from app import auth, models
+
+def _seed(db, make_team, count):
+    manager, (employee,) = make_team(db)
+    feedback = models.Feedback(employee_id=employee.id, manager_id=manager.id, strengths="s",
+                               areas_to_improve="a", sentiment=models.SentimentEnum.positive)
+    assignment = models.Assignment(manager_id=manager.id, title="Report", filename="a.pdf", file_path="a.pdf", file_size=1)
+    db.add_all([feedback, assignment])
+    db.commit()
+    # Rows share created_at within a second, so pages must break ties on id
+    for i in range(count):
+        db.add_all([
+            models.Feedback(employee_id=employee.id, manager_id=manager.id, strengths="s", areas_to_improve="a",
+                            sentiment=models.SentimentEnum.negative if i % 2 else models.SentimentEnum.neutral),
+            models.Announcement(manager_id=manager.id, title=f"News {i}", content="c"),
+            models.Assignment(manager_id=manager.id, title=f"Task {i}", filename="t.pdf", file_path="t.pdf", file_size=1),
+            models.Document(employee_id=employee.id, title=f"Doc {count - i}", filename="d.pdf", file_path="d.pdf",
+                            file_size=1, is_public=i % 2 == 0, created_at=datetime(2024, 1, 1 + i)),
+            models.Submission(assignment_id=assignment.id, employee_id=employee.id, title=f"Sub {i}",
+                              filename="s.pdf", file_path="s.pdf", file_size=1),
+            models.Comment(feedback_id=feedback.id, employee_id=employee.id, content=f"c{i}"),
+            models.AssignmentComment(assignment_id=assignment.id, employee_id=employee.id, content=f"c{i}"),
+            models.PeerFeedback(from_employee_id=manager.id, to_employee_id=employee.id, strengths="s",
+                                areas_to_improve="a", sentiment=models.SentimentEnum.neutral),
+        ])
+    db.commit()
+    return {
+        "manager": {"Authorization": f"Bearer {auth.create_access_token({'user_id': manager.id})}"},
+        "employee": {"Authorization": f"Bearer {auth.create_access_token({'user_id': employee.id})}"},
+        "employee_id": employee.id,
+        "feedback_id": feedback.id,
+        "assignment_id": assignment.id,
+    }
+
+# (role, path, rows expected) after _seed(db, make_team, 7)
+LIST_ENDPOINTS = [
+    ("manager", "/feedback/employee/{employee_id}", 8),
+    ("employee", "/documents/my", 7),
+    ("manager", "/documents/team", 4),  # public documents only
+    ("manager", "/assignments/team", 8),
+    ("employee", "/assignments/my", 8),
+    ("employee", "/submissions/my", 7),
+    ("manager", "/submissions/assignment/{assignment_id}", 7),
+    ("manager", "/announcements/team", 7),
+    ("employee", "/announcements/my", 7),
+    ("employee", "/peer-feedback/received", 7),
+    ("employee", "/comments/feedback/{feedback_id}", 7),
+    ("manager", "/assignment-comments/assignment/{assignment_id}", 7),
+]
+
+@pytest.mark.parametrize("role, path, expected", LIST_ENDPOINTS)
+def test_list_endpoints_page_with_cursor(test_client, db_session, role, path, expected, make_team):
+    """
+    Tests that following X-Next-Cursor walks a list in pages without skipping or repeating rows.
+    """
+    seed = _seed(db_session, make_team, 7)
+    url = path.format(**seed)
+    everything = test_client.get(url, headers=seed[role])
+    assert everything.status_code == 200
+    assert "X-Next-Cursor" not in everything.headers
+    assert len(everything.json()) == expected
+
+    seen, cursor = [], None
+    for _ in range(expected):  # bounded, so a cursor that fails to advance fails instead of hanging
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = test_client.get(url, params=params, headers=seed[role])
+        assert response.status_code == 200
+        assert len(response.json()) <= 3
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert cursor is None
+    assert seen == [item["id"] for item in everything.json()]
+
+def test_list_sort_filters_and_time_range(test_client, db_session, make_team):
+    """
+    Tests sorting by another field, exact-match filters and the [since, until) range on one list.
+    """
+    seed = _seed(db_session, make_team, 6)
+    headers = seed["employee"]
+
+    newest_first = test_client.get("/documents/my", headers=headers).json()
+    assert [d["created_at"][:10] for d in newest_first][:2] == ["2024-01-06", "2024-01-05"]
+
+    by_title = test_client.get("/documents/my", params={"sort": "title", "limit": 4}, headers=headers)
+    assert [d["title"] for d in by_title.json()] == ["Doc 1", "Doc 2", "Doc 3", "Doc 4"]
+    rest = test_client.get("/documents/my", params={"sort": "title", "cursor": by_title.headers["X-Next-Cursor"]},
+                           headers=headers)
+    assert [d["title"] for d in rest.json()] == ["Doc 5", "Doc 6"]
+
+    public = test_client.get("/documents/my", params={"is_public": "true"}, headers=headers).json()
+    assert len(public) == 3 and all(d["is_public"] for d in public)
+
+    # A filter of another list is not this one's concern
+    unrelated = test_client.get("/documents/my", params={"sentiment": "positive"}, headers=headers)
+    assert unrelated.status_code == 200 and len(unrelated.json()) == 6
+
+    january = test_client.get("/documents/my", params={"since": "2024-01-02T00:00:00", "until": "2024-01-04T00:00:00"},
+                              headers=headers).json()
+    assert [d["created_at"][:10] for d in january] == ["2024-01-03", "2024-01-02"]
+
+    negative = test_client.get(f"/feedback/employee/{seed['employee_id']}", params={"sentiment": "negative"},
+                               headers=seed["manager"]).json()
+    assert len(negative) == 3 and {f["sentiment"] for f in negative} == {"negative"}
+
+@pytest.mark.parametrize("params", [
+    {"sort": "file_path"},
+    {"cursor": "not-a-cursor"},
+    {"is_public": "maybe"},
+    {"since": "2024-02-01T00:00:00", "until": "2024-01-01T00:00:00"},
+])
+def test_list_rejects_unknown_sort_filter_and_cursor(test_client, db_session, params, make_team):
+    """
+    Tests that a list answers 400 for sorts, filter values and cursors it does not accept.
+    """
+    seed = _seed(db_session, make_team, 1)
+    response = test_client.get("/documents/my", params=params, headers=seed["employee"])
+    assert response.status_code == 400
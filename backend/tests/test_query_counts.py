@@ -0,0 +1,69 @@
+import pytest
+
+from app import auth, models
+
+def _seed(db, make_team, team_size):
+    manager, employees = make_team(db, team_size)
+    reader = employees[0]
+    feedback = models.Feedback(employee_id=reader.id, manager_id=manager.id, strengths="s",
+                               areas_to_improve="a", sentiment=models.SentimentEnum.positive)
+    assignment = models.Assignment(manager_id=manager.id, title="Report", filename="a.pdf", file_path="a.pdf", file_size=1)
+    db.add_all([feedback, assignment])
+    db.commit()
+    for i, employee in enumerate(employees):
+        db.add_all([
+            models.Announcement(manager_id=manager.id, title=f"News {i}", content="c"),
+            models.Assignment(manager_id=manager.id, title=f"Task {i}", filename="t.pdf", file_path="t.pdf", file_size=1),
+            models.Document(employee_id=employee.id, title=f"Doc {i}", filename="d.pdf", file_path="d.pdf",
+                            file_size=1, is_public=True),
+            models.Submission(assignment_id=assignment.id, employee_id=employee.id, title=f"Sub {i}",
+                              filename="s.pdf", file_path="s.pdf", file_size=1),
+            models.Comment(feedback_id=feedback.id, employee_id=employee.id, content=f"c{i}"),
+            models.AssignmentComment(assignment_id=assignment.id, employee_id=employee.id, content=f"c{i}"),
+            models.PeerFeedback(from_employee_id=employee.id, to_employee_id=reader.id, strengths="s",
+                                areas_to_improve="a", sentiment=models.SentimentEnum.neutral),
+        ])
+    db.commit()
+    return {
+        "manager": auth.create_access_token({"user_id": manager.id}),
+        "employee": auth.create_access_token({"user_id": reader.id}),
+        "feedback_id": feedback.id,
+        "assignment_id": assignment.id,
+    }
+
+LIST_ENDPOINTS = [
+    ("manager", "/documents/team"),
+    ("manager", "/assignments/team"),
+    ("employee", "/announcements/my"),
+    ("employee", "/assignments/my"),
+    ("manager", "/submissions/assignment/{assignment_id}"),
+    ("employee", "/comments/feedback/{feedback_id}"),
+    ("manager", "/assignment-comments/assignment/{assignment_id}"),
+    ("employee", "/peer-feedback/received"),
+]
+
+MAX_QUERIES = 5
+
+@pytest.mark.parametrize("role, path", LIST_ENDPOINTS)
+def test_list_endpoints_run_constant_queries(test_client, db_session, count_queries, role, path, make_team):
+    """
+    Tests that list endpoints load related user names in a fixed number of queries, whatever the row count.
+    """
+    seeded = _seed(db_session, make_team, team_size=12)
+    url = path.format(**seeded)
+    headers = {"Authorization": f"Bearer {seeded[role]}"}
+
+    with count_queries() as statements:
+        response = test_client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) >= 12
+    assert len(statements) <= MAX_QUERIES, "\n".join(statements)
+
+def test_team_assignments_report_submission_counts(test_client, db_session, make_team):
+    """
+    Tests that submission counts for team assignments come back correct from the aggregate query.
+    """
+    seeded = _seed(db_session, make_team, team_size=3)
+    response = test_client.get("/assignments/team", headers={"Authorization": f"Bearer {seeded['manager']}"})
+    counts = {a["title"]: a["submission_count"] for a in response.json()}
+    assert counts == {"Report": 3, "Task 0": 0, "Task 1": 0, "Task 2": 0}
@@ -0,0 +1,72 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, select, func, update
+
+from app import models, retention
+from app.database import build_engine
+from app.models import Base
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+@pytest.fixture
+def file_engine(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [{"name": "Employee", "email": "employee@example.com",
+                                                      "password_hash": "x", "role": "employee"}])
+        old, recent = NOW - timedelta(days=120), NOW - timedelta(days=5)
+        rows = [{"user_id": 1, "message": f"old read {i} " + "x" * 500, "is_read": True, "created_at": old}
+                for i in range(250)]
+        rows += [{"user_id": 1, "message": "old unread", "is_read": False, "created_at": old},
+                 {"user_id": 1, "message": "recent read", "is_read": True, "created_at": recent}]
+        conn.execute(insert(models.Notification.__table__), rows)
+    yield engine
+    engine.dispose()
+
+def _count(engine, model):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+def test_retention_archives_old_read_notifications_in_batches(file_engine):
+    """
+    Tests that only old read notifications move to the archive, batch by batch, and space is reclaimed,
+    with digests keeping their key and event count.
+    """
+    with file_engine.begin() as conn:
+        conn.execute(update(models.Notification.__table__).where(models.Notification.id == 1)
+                     .values(digest_key="assignment:1:comments", event_count=3))
+    report = retention.archive_notifications(file_engine, days=90, batch_size=100, now=NOW)
+
+    assert report.rows_moved == 250
+    assert report.batches == 3
+    assert report.compacted and report.bytes_reclaimed > 0
+    assert _count(file_engine, models.NotificationArchive) == 250
+    with file_engine.connect() as conn:
+        digest = conn.execute(select(models.NotificationArchive.digest_key, models.NotificationArchive.event_count)
+                              .where(models.NotificationArchive.id == 1)).one()
+    assert tuple(digest) == ("assignment:1:comments", 3)
+    with file_engine.connect() as conn:
+        left = conn.execute(select(models.Notification.message).order_by(models.Notification.id)).scalars().all()
+    assert left == ["old unread", "recent read"]
+
+    # Nothing left to move on a second run
+    assert retention.archive_notifications(file_engine, days=90, now=NOW).rows_moved == 0
+
+def test_retention_exports_to_gzip(file_engine, tmp_path):
+    """
+    Tests that rows can be exported to a gzipped JSON-lines file instead of the archive table.
+    """
+    path = tmp_path / "export.jsonl.gz"
+    report = retention.archive_notifications(file_engine, days=90, export_path=str(path),
+                                             compact_after=False, now=NOW)
+
+    with gzip.open(path, "rt") as f:
+        exported = [json.loads(line) for line in f]
+    assert report.rows_moved == len(exported) == 250
+    assert not report.compacted
+    assert _count(file_engine, models.NotificationArchive) == 0
+    assert _count(file_engine, models.Notification) == 2
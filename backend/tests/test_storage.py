@@ -0,0 +1,114 @@
+import hashlib
+import io
+
+import pytest
+from sqlalchemy import event
+
+pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from app import auth, blobs, crud, files, models, storage
+
+PDF = b"%PDF-1.4\n" + b"x" * 5000
+BUCKET = "feedback-uploads"
+
+@pytest.fixture
+def s3(tmp_path, monkeypatch):
+    """
+    Points the storage backend at a moto-mocked S3 bucket, with a small multipart chunk size.
+    """
+    for name, value in {"AWS_ACCESS_KEY_ID": "testing", "AWS_SECRET_ACCESS_KEY": "testing",
+                        "AWS_SESSION_TOKEN": "testing", "AWS_DEFAULT_REGION": "us-east-1"}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(files, "UPLOAD_DIR", tmp_path)
+    with moto.mock_aws():
+        backend = storage.S3Storage(BUCKET, region="us-east-1", multipart_chunk_size=5 * 1024 * 1024)
+        backend.client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(storage, "backend", backend)
+        yield backend
+
+def _employee_headers(db, make_team):
+    manager, (employee,) = make_team(db)
+    return {"Authorization": f"Bearer {auth.create_access_token({'user_id': employee.id})}"}
+
+def _upload(test_client, headers, content=PDF):
+    response = test_client.post("/documents/upload", headers=headers, data={"title": "Report"},
+                                files={"file": ("report.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def test_s3_upload_redirects_downloads_and_deletes_with_last_reference(test_client, db_session, s3, tmp_path, make_team):
+    """
+    Tests that an upload goes to the bucket under its blob key, that a download redirects to a
+    presigned URL and that deleting the last reference deletes the object.
+    """
+    headers = _employee_headers(db_session, make_team)
+    key = blobs.blob_key(hashlib.sha256(PDF).hexdigest())
+    document_id = _upload(test_client, headers)
+
+    assert s3.client.get_object(Bucket=BUCKET, Key=key)["Body"].read() == PDF
+    assert db_session.get(models.Document, document_id).file_path == f"s3://{BUCKET}/{key}"
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+    response = test_client.get(f"/documents/{document_id}/download", headers=headers, follow_redirects=False)
+    assert response.status_code == 307
+    location = response.headers["location"]
+    assert key in location and "X-Amz-Signature=" in location
+    assert "response-content-disposition=attachment" in location
+
+    assert test_client.delete(f"/documents/{document_id}", headers=headers).status_code == 200
+    assert s3.client.list_objects_v2(Bucket=BUCKET).get("KeyCount") == 0
+
+def test_s3_proxied_download_relays_range_and_etag(test_client, db_session, s3, make_team):
+    """
+    Tests that with presigning off a download streams through the API with Range and If-None-Match handled by S3.
+    """
+    s3.presign_downloads = False
+    headers = _employee_headers(db_session, make_team)
+    document_id = _upload(test_client, headers)
+    url = f"/documents/{document_id}/download"
+
+    full = test_client.get(url, headers=headers)
+    assert full.status_code == 200 and full.content == PDF
+    assert full.headers["content-disposition"] == 'attachment; filename="report.pdf"'
+
+    partial = test_client.get(url, headers={**headers, "Range": "bytes=0-4"})
+    assert partial.status_code == 206 and partial.content == b"%PDF-"
+    assert partial.headers["content-range"] == f"bytes 0-4/{len(PDF)}"
+
+    cached = test_client.get(url, headers={**headers, "If-None-Match": full.headers["etag"]})
+    assert cached.status_code == 304
+
+def test_s3_large_upload_is_multipart(test_client, db_session, s3, make_team):
+    """
+    Tests that a file above the multipart chunk size is sent as a multipart upload.
+    """
+    headers = _employee_headers(db_session, make_team)
+    content = b"%PDF-1.4\n" + bytes(range(256)) * (24 * 1024)  # 6 MB
+    _upload(test_client, headers, content)
+    head = s3.client.head_object(Bucket=BUCKET, Key=blobs.blob_key(hashlib.sha256(content).hexdigest()))
+    # Multipart objects get an ETag of the form "<md5 of part md5s>-<part count>"
+    assert head["ETag"].strip('"').endswith("-2")
+
+def test_s3_commit_puts_back_an_object_collected_during_the_upload(db_session, s3, make_team):
+    """
+    Tests that no S3 request is made inside the transaction and that an object deleted between the
+    pre-transaction upload and the commit is uploaded again once the new reference has committed.
+    """
+    _employee_headers(db_session, make_team)
+    employee = db_session.query(models.User).filter(models.User.role == models.RoleEnum.employee).one()
+    staged = files._stage(io.BytesIO(PDF), blobs.blob_dir(), "application/pdf", files.MAX_UPLOAD_BYTES)
+    key = blobs.blob_key(staged.sha256)
+    s3.upload(staged, key)
+    # The blob's previous last reference is collected while this upload is in flight
+    s3.client.delete_object(Bucket=BUCKET, Key=key)
+
+    requests = []
+    s3.client.meta.events.register("before-call.s3", lambda model, **kwargs: requests.append(model.name))
+    at_commit = []
+    event.listen(db_session, "before_commit", lambda session: at_commit.append(list(requests)))
+    crud.create_document(db_session, {"title": "Report", "filename": "report.pdf", "upload": staged}, employee.id)
+
+    assert at_commit == [[]]
+    assert requests == ["HeadObject", "PutObject"]
+    assert s3.client.get_object(Bucket=BUCKET, Key=key)["Body"].read() == PDF
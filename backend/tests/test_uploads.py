@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from app import auth, blobs, crud, files, models
+
+PDF = b"%PDF-1.4\n" + b"x" * 5000
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(files, "UPLOAD_DIR", tmp_path)
+    return tmp_path
+
+def _employee_headers(db, make_team):
+    manager, (employee,) = make_team(db)
+    return {"Authorization": f"Bearer {auth.create_access_token({'user_id': employee.id})}"}
+
+def _stored_files(directory):
+    return sorted(p.name for p in directory.rglob("*") if p.is_file())
+
+def test_upload_stores_file_atomically(test_client, db_session, upload_dir, make_team):
+    """
+    Tests that an upload lands under its content hash with the streamed size and no temporary file left over.
+    """
+    headers = _employee_headers(db_session, make_team)
+    response = test_client.post("/documents/upload", headers=headers, data={"title": "Report"},
+                                files={"file": ("../../report.pdf", PDF, "application/pdf")})
+    assert response.status_code == 200
+    assert response.json()["file_size"] == len(PDF)
+    assert response.json()["filename"] == "report.pdf"
+    assert _stored_files(upload_dir) == [hashlib.sha256(PDF).hexdigest()]
+    assert blobs.blob_path(hashlib.sha256(PDF).hexdigest()).read_bytes() == PDF
+
+@pytest.mark.parametrize("content, detail", [
+    (b"<html>not a pdf</html>", "File content does not match its type"),
+    (b"", "File is empty"),
+])
+def test_upload_rejects_bad_content_without_leaving_files(test_client, db_session, upload_dir, content, detail, make_team):
+    """
+    Tests that a file whose bytes do not match its type, or an empty one, is refused and nothing is kept.
+    """
+    headers = _employee_headers(db_session, make_team)
+    response = test_client.post("/documents/upload", headers=headers, data={"title": "Report"},
+                                files={"file": ("report.pdf", content, "application/pdf")})
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert _stored_files(upload_dir) == []
+
+def test_upload_with_oversized_content_length_is_refused_before_parsing(test_client, db_session, upload_dir, make_team):
+    """
+    Tests that a body declaring more than the upload limit is answered 413 without reaching the endpoint.
+    """
+    headers = _employee_headers(db_session, make_team)
+    too_big = b"%PDF-" + b"x" * (files.MAX_UPLOAD_BYTES + files.FORM_OVERHEAD_BYTES)
+    response = test_client.post("/documents/upload", headers=headers, data={"title": "Report"},
+                                files={"file": ("report.pdf", too_big, "application/pdf")})
+    assert response.status_code == 413
+    assert _stored_files(upload_dir) == []
+
+def test_stage_upload_stops_at_the_limit_and_hashes(tmp_path):
+    """
+    Tests that stage_upload cuts a file off once it passes the limit and reports the SHA-256 of what it kept.
+    """
+    def upload():
+        return UploadFile(io.BytesIO(PDF), filename="report.pdf", headers=Headers({"content-type": "application/pdf"}))
+
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(files.stage_upload(upload(), tmp_path, max_bytes=1000))
+    assert rejected.value.status_code == 400
+    assert _stored_files(tmp_path) == []
+
+    staged = asyncio.run(files.stage_upload(upload(), tmp_path / "sub"))
+    assert staged.size == len(PDF)
+    assert staged.sha256 == hashlib.sha256(PDF).hexdigest()
+    assert staged.path.parent == tmp_path / "sub" and staged.path.read_bytes() == PDF
+
+def test_identical_uploads_share_one_blob_until_the_last_delete(test_client, db_session, upload_dir, make_team):
+    """
+    Tests that the same bytes uploaded as an assignment, a document and a submission are stored once and
+    that the file is removed only when the last row pointing at it is deleted.
+    """
+    headers = _employee_headers(db_session, make_team)
+    manager = db_session.query(models.User).filter(models.User.role == models.RoleEnum.manager).one()
+    manager_headers = {"Authorization": f"Bearer {auth.create_access_token({'user_id': manager.id})}"}
+    sha256 = hashlib.sha256(PDF).hexdigest()
+
+    assignment = test_client.post("/assignments/upload", headers=manager_headers, data={"title": "Task"},
+                                  files={"file": ("template.pdf", PDF, "application/pdf")}).json()
+    document = test_client.post("/documents/upload", headers=headers, data={"title": "Copy"},
+                                files={"file": ("mine.pdf", PDF, "application/pdf")}).json()
+    submission = test_client.post("/submissions/upload", headers=headers,
+                                  data={"title": "Done", "assignment_id": str(assignment["id"])},
+                                  files={"file": ("done.pdf", PDF, "application/pdf")}).json()
+    assert _stored_files(upload_dir) == [sha256]
+
+    stats = blobs.blob_stats(db_session.get_bind())
+    assert (stats.blobs, stats.references) == (1, 3)
+    assert stats.bytes_saved == 2 * len(PDF) and stats.dedup_ratio == 3.0
+    assert blobs.check_ref_counts(db_session.get_bind()) == []
+
+    download = test_client.get(f"/documents/{document['id']}/download", headers=headers)
+    assert download.content == PDF and download.headers["content-disposition"] == 'attachment; filename="mine.pdf"'
+
+    assert test_client.delete(f"/documents/{document['id']}", headers=headers).status_code == 200
+    assert test_client.delete(f"/submissions/{submission['id']}", headers=headers).status_code == 200
+    assert _stored_files(upload_dir) == [sha256]
+    assert test_client.delete(f"/assignments/{assignment['id']}", headers=manager_headers).status_code == 200
+    assert _stored_files(upload_dir) == []
+    assert db_session.query(models.Blob).count() == 0
+
+def test_blob_files_change_only_with_the_transaction_outcome(db_session, upload_dir, make_team):
+    """
+    Tests that a rolled back upload leaves no file behind, that a rolled back delete keeps the file
+    its row still points at and that the file goes once the delete commits.
+    """
+    _employee_headers(db_session, make_team)
+    employee = db_session.query(models.User).filter(models.User.role == models.RoleEnum.employee).one()
+    sha256 = hashlib.sha256(PDF).hexdigest()
+
+    def stage():
+        return asyncio.run(files.stage_upload(UploadFile(io.BytesIO(PDF), filename="report.pdf",
+                                                         headers=Headers({"content-type": "application/pdf"})),
+                                              blobs.blob_dir()))
+
+    crud.create_document(db_session, {"title": "Report", "filename": "report.pdf", "mime_type": "application/pdf",
+                                      "upload": stage()}, employee.id)
+    document = db_session.query(models.Document).one()
+
+    blobs.place(db_session, stage())
+    db_session.rollback()
+    # Already referenced by a committed row, so the rollback keeps it
+    assert _stored_files(upload_dir) == [sha256]
+
+    db_session.delete(document)
+    crud._release_file(db_session, document)
+    db_session.rollback()
+    assert _stored_files(upload_dir) == [sha256]
+    assert db_session.get(models.Blob, sha256).ref_count == 1
+
+    assert crud.delete_document(db_session, document.id, employee.id)
+    assert _stored_files(upload_dir) == []
+    assert db_session.query(models.Blob).count() == 0
+
+    blobs.place(db_session, stage())
+    assert _stored_files(upload_dir) == [sha256]
+    db_session.rollback()
+    assert _stored_files(upload_dir) == []
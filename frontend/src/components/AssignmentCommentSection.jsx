@@ -1,10 +1,13 @@
 import React, { useState, useEffect } from 'react';
 import axios from '../api/axios';
+import usePagedList from '../hooks/usePagedList';
+import LoadMoreButton from './LoadMoreButton';
 import { Card, CardContent, TextField, Button, Typography, Stack, Box, Divider } from '@mui/material';
 import { toast } from 'react-toastify';
 
 const AssignmentCommentSection = ({ assignmentId, currentUser }) => {
-  const [comments, setComments] = useState([]);
+  // Newest first, so a long thread opens on its latest comments
+  const comments = usePagedList(() => toast.error('Failed to load comments'), { sort: '-created_at' });
   const [newComment, setNewComment] = useState('');
   const [loading, setLoading] = useState(false);
   const [editingComment, setEditingComment] = useState(null);
@@ -16,14 +19,7 @@ const AssignmentCommentSection = ({ assignmentId, currentUser }) => {
     }
   }, [assignmentId]);
 
-  const fetchComments = async () => {
-    try {
-      const response = await axios.get(`/assignment-comments/assignment/${assignmentId}`);
-      setComments(response.data);
-    } catch (err) {
-      toast.error('Failed to load comments');
-    }
-  };
+  const fetchComments = () => comments.load(`/assignment-comments/assignment/${assignmentId}`);
 
   const handleSubmitComment = async (e) => {
     e.preventDefault();
@@ -106,11 +102,11 @@ const AssignmentCommentSection = ({ assignmentId, currentUser }) => {
         </Box>
         <Divider sx={{ mb: 2 }} />
         <Box>
-          {comments.length === 0 ? (
+          {comments.items.length === 0 ? (
             <Typography color="text.secondary">No comments yet. Be the first to start the discussion!</Typography>
           ) : (
             <Stack spacing={2}>
-              {comments.map((comment) => (
+              {comments.items.map((comment) => (
                 <Box key={comment.id} sx={{ bgcolor: '#f8f9fa', borderRadius: 2, p: 2 }}>
                   <Box display="flex" justifyContent="space-between" alignItems="center">
                     <Typography fontWeight={600}>{comment.employee_name}</Typography>
@@ -165,6 +161,7 @@ const AssignmentCommentSection = ({ assignmentId, currentUser }) => {
               ))}
             </Stack>
           )}
+          <LoadMoreButton list={comments} label="Load older comments" />
         </Box>
       </CardContent>
     </Card>
@@ -1,9 +1,11 @@
 import React, { useState, useEffect } from 'react';
 import ReactMarkdown from 'react-markdown';
 import axios from '../api/axios';
+import usePagedList from '../hooks/usePagedList';
 
 const CommentSection = ({ feedbackId, currentUserId }) => {
-  const [comments, setComments] = useState([]);
+  // Newest first, so a long thread opens on its latest comments
+  const comments = usePagedList(err => console.error('Failed to fetch comments:', err), { sort: '-created_at' });
   const [newComment, setNewComment] = useState('');
   const [editingComment, setEditingComment] = useState(null);
   const [editContent, setEditContent] = useState('');
@@ -13,14 +15,7 @@ const CommentSection = ({ feedbackId, currentUserId }) => {
     fetchComments();
   }, [feedbackId]);
 
-  const fetchComments = async () => {
-    try {
-      const response = await axios.get(`/comments/feedback/${feedbackId}`);
-      setComments(response.data);
-    } catch (err) {
-      console.error('Failed to fetch comments:', err);
-    }
-  };
+  const fetchComments = () => comments.load(`/comments/feedback/${feedbackId}`);
 
   const handleSubmitComment = async (e) => {
     e.preventDefault();
@@ -124,10 +119,10 @@ const CommentSection = ({ feedbackId, currentUserId }) => {
 
       {/* Display comments */}
       <div>
-        {comments.length === 0 ? (
+        {comments.items.length === 0 ? (
           <p style={{ color: '#6c757d', fontStyle: 'italic' }}>No comments yet. Be the first to comment!</p>
         ) : (
-          comments.map(comment => (
+          comments.items.map(comment => (
             <div
               key={comment.id}
               style={{
@@ -239,6 +234,21 @@ const CommentSection = ({ feedbackId, currentUserId }) => {
             </div>
           ))
         )}
+        {comments.hasMore && (
+          <button
+            onClick={comments.loadMore}
+            disabled={comments.loadingMore}
+            style={{
+              background: 'none',
+              color: '#007bff',
+              border: 'none',
+              padding: '0.25rem 0',
+              cursor: comments.loadingMore ? 'not-allowed' : 'pointer'
+            }}
+          >
+            Load older comments
+          </button>
+        )}
       </div>
     </div>
   );
@@ -0,0 +1,11 @@
+import React from 'react';
+import { Button } from '@mui/material';
+
+// Shown under a list from usePagedList while the API has more rows than it sent
+const LoadMoreButton = ({ list, label }) => (
+  list.hasMore ? (
+    <Button onClick={list.loadMore} disabled={list.loadingMore} variant="text">{label}</Button>
+  ) : null
+);
+
+export default LoadMoreButton;
@@ -24,11 +24,13 @@ const Navbar = () => {
   const { user, logout } = useContext(AuthContext);
   const navigate = useNavigate();
   const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
   const [openDialog, setOpenDialog] = useState(false);
   const [anchorEl, setAnchorEl] = useState(null);
 
   useEffect(() => {
     if (user?.role === 'manager' || user?.role === 'employee') {
+      let lastCount = null;
       const fetchNotifications = async () => {
         try {
           const res = await axios.get('/notifications');
@@ -37,9 +39,73 @@ const Navbar = () => {
           console.error('Failed to fetch notifications:', err);
         }
       };
-      fetchNotifications();
-      const interval = setInterval(fetchNotifications, 60000); // Poll every minute
-      return () => clearInterval(interval);
+      // Poll the cheap unread counter (304 when unchanged) and only reload the list when it moves
+      const pollUnreadCount = async () => {
+        try {
+          const res = await axios.get('/notifications/unread-count');
+          setUnreadCount(res.data.unread_count);
+          if (res.data.unread_count !== lastCount) {
+            lastCount = res.data.unread_count;
+            fetchNotifications();
+          }
+        } catch (err) {
+          console.error('Failed to fetch unread count:', err);
+        }
+      };
+      pollUnreadCount();
+      const interval = setInterval(pollUnreadCount, 60000); // Poll every minute
+
+      // Push new notifications as they happen; the poll above stays as a fallback.
+      // EventSource reconnects by itself and resumes from the last event id. It
+      // can only authenticate through the URL, so it gets a short-lived stream
+      // token; once that has expired a reconnect is refused and we open a new one.
+      let stream = null;
+      let closed = false;
+      let lastEventId = null;
+      const openStream = async () => {
+        try {
+          const { data } = await axios.post('/notifications/stream-token');
+          if (closed) return;
+          const params = new URLSearchParams({ token: data.token });
+          if (lastEventId) params.set('last_event_id', lastEventId);
+          stream = new EventSource(`${axios.defaults.baseURL}/notifications/stream?${params}`);
+        } catch (err) {
+          console.error('Failed to open notification stream:', err);
+          return;
+        }
+        stream.onerror = () => {
+          if (stream.readyState === EventSource.CLOSED && !closed) {
+            setTimeout(openStream, 5000);
+          }
+        };
+        stream.addEventListener('notification', (event) => {
+          lastEventId = event.lastEventId || lastEventId;
+          const notification = JSON.parse(event.data);
+          // A digest ("3 new comments on ...") is the same notification updated in place
+          setNotifications((prev) =>
+            notification.replaces
+              ? [notification, ...prev.filter((n) => n.id !== notification.replaces)]
+              : prev.some((n) => n.id === notification.id)
+                ? prev
+                : [notification, ...prev]
+          );
+          if (!notification.is_read && !notification.replaces) {
+            setUnreadCount((count) => {
+              lastCount = count + 1;
+              return lastCount;
+            });
+          }
+        });
+      };
+      if (localStorage.getItem('token') && window.EventSource) {
+        openStream();
+      }
+
+      return () => {
+        closed = true;
+        clearInterval(interval);
+        if (stream) stream.close();
+      };
     }
   }, [user]);
 
@@ -48,12 +114,11 @@ const Navbar = () => {
     navigate('/login');
   };
 
-  const unreadCount = notifications.filter(n => !n.is_read).length;
-
   const handleNotificationClick = async (notification) => {
     if (!notification.is_read) {
       await axios.post(`/notifications/${notification.id}/read`);
       setNotifications(notifications.map(n => n.id === notification.id ? { ...n, is_read: true } : n));
+      setUnreadCount(count => Math.max(count - 1, 0));
     }
     if (user?.role === 'employee') {
       navigate('/employee', { state: { defaultTab: 'announcements' } });
@@ -73,6 +138,7 @@ const Navbar = () => {
   const handleDismissNotification = async (notification) => {
     if (!notification.is_read) {
       await axios.post(`/notifications/${notification.id}/read`);
+      setUnreadCount(count => Math.max(count - 1, 0));
     }
     setNotifications(notifications.filter(n => n.id !== notification.id));
   };
@@ -0,0 +1,35 @@
+import { useState } from 'react';
+import axios from '../api/axios';
+
+// A list endpoint read one page at a time. `load` fetches the first page of `url`;
+// `loadMore` appends the page X-Next-Cursor points at, so nothing past the API's
+// page size (50 by default) is out of reach. `hasMore` is false on the last page.
+const usePagedList = (onError, params = {}) => {
+  const [items, setItems] = useState([]);
+  const [next, setNext] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const fetchPage = async (url, cursor = null) => {
+    try {
+      const res = await axios.get(url, { params: cursor ? { ...params, cursor } : params });
+      setItems(prev => (cursor ? [...prev, ...res.data] : res.data));
+      const nextCursor = res.headers['x-next-cursor'];
+      setNext(nextCursor ? { url, cursor: nextCursor } : null);
+    } catch (err) {
+      onError(err);
+    }
+  };
+
+  const load = (url) => fetchPage(url);
+
+  const loadMore = async () => {
+    if (!next) return;
+    setLoadingMore(true);
+    await fetchPage(next.url, next.cursor);
+    setLoadingMore(false);
+  };
+
+  return { items, load, loadMore, hasMore: next !== null, loadingMore };
+};
+
+export default usePagedList;
@@ -7,6 +7,8 @@ import DocumentUpload from '../components/DocumentUpload';
 import DocumentList from '../components/DocumentList';
 import AssignmentList from '../components/AssignmentList';
 import SubmissionUpload from '../components/SubmissionUpload';
+import LoadMoreButton from '../components/LoadMoreButton';
+import usePagedList from '../hooks/usePagedList';
 import { useLocation } from 'react-router-dom';
 import { AuthContext } from '../contexts/AuthContext';
 import { Tabs, Tab, Box, Paper, Card, CardContent, List, ListItem, Button, Typography, Divider, Stack } from '@mui/material';
@@ -15,57 +17,33 @@ import { toast } from 'react-toastify';
 const EmployeeDashboard = () => {
   const location = useLocation();
   const [timeline, setTimeline] = useState([]);
-  const [peerFeedbacks, setPeerFeedbacks] = useState([]);
-  const [announcements, setAnnouncements] = useState([]);
-  const [documents, setDocuments] = useState([]);
-  const [assignments, setAssignments] = useState([]);
+  const peerFeedbacks = usePagedList(err => console.error('Failed to fetch peer feedbacks:', err));
+  const announcements = usePagedList(err => console.error('Failed to load announcements:', err));
+  const documents = usePagedList(err => console.error('Failed to load documents:', err));
+  const assignments = usePagedList(err => console.error('Failed to load assignments:', err));
   const [loading, setLoading] = useState(true);
   const [selectedFeedback, setSelectedFeedback] = useState(null);
   const [activeTab, setActiveTab] = useState(location.state?.defaultTab || 'manager');
   const { user } = useContext(AuthContext);
 
-  const fetchTimeline = async () => {
+  const [timelineCursor, setTimelineCursor] = useState(null);
+
+  // The timeline is paged newest first; X-Next-Cursor points at the next (older) page
+  const fetchTimeline = async (cursor = null) => {
     setLoading(true);
-    const res = await axios.get('/dashboard/employee');
-    setTimeline(res.data.feedback_timeline);
+    const res = await axios.get('/dashboard/employee', { params: cursor ? { cursor } : {} });
+    setTimeline(prev => (cursor ? [...prev, ...res.data.feedback_timeline] : res.data.feedback_timeline));
+    setTimelineCursor(res.headers['x-next-cursor'] || null);
     setLoading(false);
   };
 
-  const fetchPeerFeedbacks = async () => {
-    try {
-      const res = await axios.get('/peer-feedback/received');
-      setPeerFeedbacks(res.data);
-    } catch (err) {
-      console.error('Failed to fetch peer feedbacks:', err);
-    }
-  };
+  const fetchPeerFeedbacks = () => peerFeedbacks.load('/peer-feedback/received');
 
-  const loadAnnouncements = async () => {
-    try {
-      const res = await axios.get('/announcements/my');
-      setAnnouncements(res.data);
-    } catch (err) {
-      console.error('Failed to load announcements:', err);
-    }
-  };
+  const loadAnnouncements = () => announcements.load('/announcements/my');
 
-  const loadDocuments = async () => {
-    try {
-      const res = await axios.get('/documents/my');
-      setDocuments(res.data);
-    } catch (err) {
-      console.error('Failed to load documents:', err);
-    }
-  };
+  const loadDocuments = () => documents.load('/documents/my');
 
-  const loadAssignments = async () => {
-    try {
-      const res = await axios.get('/assignments/my');
-      setAssignments(res.data);
-    } catch (err) {
-      console.error('Failed to load assignments:', err);
-    }
-  };
+  const loadAssignments = () => assignments.load('/assignments/my');
 
   useEffect(() => {
     fetchTimeline();
@@ -163,6 +141,11 @@ const EmployeeDashboard = () => {
               </ListItem>
             ))}
           </List>
+          {timelineCursor && (
+            <Button onClick={() => fetchTimeline(timelineCursor)} disabled={loading} variant="text">
+              Load older feedback
+            </Button>
+          )}
         </Box>
       )}
 
@@ -170,11 +153,11 @@ const EmployeeDashboard = () => {
         <Box>
           <PeerFeedbackForm onSuccess={handlePeerFeedbackSuccess} />
           <Typography variant="h6" mt={3} mb={2}>Received Peer Feedback</Typography>
-          {peerFeedbacks.length === 0 ? (
+          {peerFeedbacks.items.length === 0 ? (
             <Typography>No peer feedback received yet.</Typography>
           ) : (
             <List>
-              {peerFeedbacks.map(fb => (
+              {peerFeedbacks.items.map(fb => (
                 <ListItem key={fb.id} sx={{ bgcolor: '#f8f9fa', mb: 1, borderRadius: 1, border: '1px solid #dee2e6', flexDirection: 'column', alignItems: 'flex-start' }}>
                   <Box width="100%" display="flex" justifyContent="space-between" alignItems="flex-start">
                     <Box flex={1}>
@@ -208,6 +191,7 @@ const EmployeeDashboard = () => {
               ))}
             </List>
           )}
+          <LoadMoreButton list={peerFeedbacks} label="Load older peer feedback" />
         </Box>
       )}
 
@@ -215,10 +199,11 @@ const EmployeeDashboard = () => {
         <Box>
           <Typography variant="h6" mb={2}>Team Announcements</Typography>
           <AnnouncementList 
-            announcements={announcements} 
+            announcements={announcements.items} 
             isManager={false} 
             onUpdate={loadAnnouncements} 
           />
+          <LoadMoreButton list={announcements} label="Load older announcements" />
         </Box>
       )}
 
@@ -226,11 +211,12 @@ const EmployeeDashboard = () => {
         <Box>
           <Typography variant="h6" mb={2}>My Assignments</Typography>
           <AssignmentList 
-            assignments={assignments} 
+            assignments={assignments.items} 
             isManager={false} 
             onUpdate={loadAssignments} 
             currentUser={user}
           />
+          <LoadMoreButton list={assignments} label="Load older assignments" />
         </Box>
       )}
 
@@ -240,10 +226,11 @@ const EmployeeDashboard = () => {
           <DocumentUpload onSuccess={loadDocuments} />
           <Typography variant="subtitle1" mt={2}>Uploaded Documents</Typography>
           <DocumentList 
-            documents={documents} 
+            documents={documents.items} 
             isManager={false} 
             onUpdate={loadDocuments} 
           />
+          <LoadMoreButton list={documents} label="Load older documents" />
         </Box>
       )}
 
@@ -8,6 +8,8 @@ import DocumentList from '../components/DocumentList';
 import AssignmentUpload from '../components/AssignmentUpload';
 import AssignmentList from '../components/AssignmentList';
 import SubmissionList from '../components/SubmissionList';
+import LoadMoreButton from '../components/LoadMoreButton';
+import usePagedList from '../hooks/usePagedList';
 import { Tabs, Tab, Box, Paper, Card, CardContent, List, ListItem, ListItemButton, ListItemText, Button, Typography, Divider, Stack } from '@mui/material';
 
 const FeedbackHistoryItem = ({ feedback, onUpdate }) => {
@@ -68,40 +70,19 @@ const ManagerDashboard = () => {
   const [dashboard, setDashboard] = useState(null);
   const [team, setTeam] = useState([]);
   const [selected, setSelected] = useState(null);
-  const [feedbacks, setFeedbacks] = useState([]);
-  const [announcements, setAnnouncements] = useState([]);
-  const [documents, setDocuments] = useState([]);
-  const [assignments, setAssignments] = useState([]);
+  const feedbacks = usePagedList(err => console.error("Failed to fetch feedback", err));
+  const announcements = usePagedList(err => console.error("Failed to fetch announcements", err));
+  const documents = usePagedList(err => console.error("Failed to fetch documents", err));
+  const assignments = usePagedList(err => console.error("Failed to fetch assignments", err));
   const [selectedAssignment, setSelectedAssignment] = useState(null);
-  const [submissions, setSubmissions] = useState([]);
+  const submissions = usePagedList(err => console.error('Failed to load submissions:', err));
   const [activeTab, setActiveTab] = useState('team');
 
-  const fetchAssignments = async () => {
-    try {
-      const res = await axios.get('/assignments/team');
-      setAssignments(res.data);
-    } catch (err) {
-      console.error("Failed to fetch assignments", err);
-    }
-  };
+  const fetchAssignments = () => assignments.load('/assignments/team');
 
-  const fetchAnnouncements = async () => {
-    try {
-      const res = await axios.get('/announcements/team');
-      setAnnouncements(res.data);
-    } catch (err) {
-      console.error("Failed to fetch announcements", err);
-    }
-  };
+  const fetchAnnouncements = () => announcements.load('/announcements/team');
 
-  const fetchDocuments = async () => {
-    try {
-      const res = await axios.get('/documents/team');
-      setDocuments(res.data);
-    } catch (err) {
-      console.error("Failed to fetch documents", err);
-    }
-  };
+  const fetchDocuments = () => documents.load('/documents/team');
 
   useEffect(() => {
     axios.get('/dashboard/manager').then(res => setDashboard(res.data));
@@ -111,19 +92,11 @@ const ManagerDashboard = () => {
     fetchAssignments();
   }, []);
 
-  const loadSubmissions = async (assignmentId) => {
-    try {
-      const res = await axios.get(`/submissions/assignment/${assignmentId}`);
-      setSubmissions(res.data);
-    } catch (err) {
-      console.error('Failed to load submissions:', err);
-    }
-  };
+  const loadSubmissions = (assignmentId) => submissions.load(`/submissions/assignment/${assignmentId}`);
 
   const selectMember = async (member) => {
     setSelected(member);
-    const res = await axios.get(`/feedback/employee/${member.id}`);
-    setFeedbacks(res.data);
+    await feedbacks.load(`/feedback/employee/${member.id}`);
   };
 
   const selectAssignment = async (assignment) => {
@@ -133,8 +106,7 @@ const ManagerDashboard = () => {
 
   const refreshFeedbacks = async () => {
     if (selected) {
-      const res = await axios.get(`/feedback/employee/${selected.id}`);
-      setFeedbacks(res.data);
+      await feedbacks.load(`/feedback/employee/${selected.id}`);
     }
   };
 
@@ -224,12 +196,13 @@ const ManagerDashboard = () => {
               <FeedbackForm employeeId={selected.id} onSuccess={refreshFeedbacks} />
               <Typography variant="subtitle1" sx={{ mt: 2 }}>Feedback History</Typography>
               <List>
-                {feedbacks.map(fb => (
+                {feedbacks.items.map(fb => (
                   <ListItem key={fb.id} disablePadding>
                     <FeedbackHistoryItem feedback={fb} onUpdate={refreshFeedbacks} />
                   </ListItem>
                 ))}
               </List>
+              <LoadMoreButton list={feedbacks} label="Load older feedback" />
             </Box>
           )}
         </Box>
@@ -242,14 +215,16 @@ const ManagerDashboard = () => {
           <AssignmentUpload onUploadSuccess={fetchAssignments} />
           <Divider sx={{ my: 3 }} />
           <Typography variant="h6" mb={2}>Current Assignments</Typography>
-          <AssignmentList assignments={assignments} onUpdate={fetchAssignments} />
+          <AssignmentList assignments={assignments.items} onUpdate={fetchAssignments} />
+          <LoadMoreButton list={assignments} label="Load older assignments" />
           {selectedAssignment && (
             <Box mt={4}>
               <Typography variant="subtitle1">Submissions for: {selectedAssignment.title}</Typography>
               <SubmissionList 
-                submissions={submissions} 
+                submissions={submissions.items} 
                 onUpdate={() => loadSubmissions(selectedAssignment.id)} 
               />
+              <LoadMoreButton list={submissions} label="Load more submissions" />
             </Box>
           )}
         </Box>
@@ -262,7 +237,8 @@ const ManagerDashboard = () => {
           <AnnouncementForm onNewAnnouncement={fetchAnnouncements} />
           <Divider sx={{ my: 3 }} />
           <Typography variant="h6" mb={2}>Past Announcements</Typography>
-          <AnnouncementList announcements={announcements} onUpdate={fetchAnnouncements}/>
+          <AnnouncementList announcements={announcements.items} onUpdate={fetchAnnouncements}/>
+          <LoadMoreButton list={announcements} label="Load older announcements" />
         </Box>
       )}
 
@@ -270,7 +246,8 @@ const ManagerDashboard = () => {
       {activeTab === 'documents' && (
         <Box>
           <Typography variant="h6" mb={2}>Team Documents</Typography>
-          <DocumentList documents={documents} onUpdate={fetchDocuments}/>
+          <DocumentList documents={documents.items} onUpdate={fetchDocuments}/>
+          <LoadMoreButton list={documents} label="Load older documents" />
         </Box>
       )}
     </Box>